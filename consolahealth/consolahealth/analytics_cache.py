@@ -0,0 +1,165 @@
+"""
+Versioned cache for computed analytics payloads (chart data, summaries).
+
+Entries are stored under keys that embed the current version of every data
+scope they depend on (e.g. ``students``, ``health``). Writes to those models
+bump the scope version through signals, so stale entries are never read
+again and simply expire. Hit/miss counters are kept in the same cache so
+they are shared by every worker using a shared backend.
+
+Async views use the a-prefixed variants (aget_or_compute() etc.), which go
+through the cache backend's async API and await an async compute function.
+
+Writers bump with bump_version_on_commit(), so no request can cache rows
+of an uncommitted transaction under the new version. Keys also name the
+database alias the payload was read from: the version is bumped when the
+primary commits, while a lagging replica may still return the old rows,
+and those must not be served to a browser pinned to the primary.
+
+Note: queryset.update() and bulk_create() do not send signals; code paths
+using them must bump the version themselves.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from consolahealth.routers import current_read_alias
+
+STATS_KEYS = ('hits', 'misses')
+
+
+def get_cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE_ALIAS', 'default')]
+
+
+def _version_key(scope):
+    return f'analytics:version:{scope}'
+
+
+def get_version(scope):
+    """Current version of a scope; seeded from the clock so an evicted counter never reuses an old value"""
+    cache = get_cache()
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(scope):
+    cache = get_cache()
+    key = _version_key(scope)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(*scopes):
+    """Invalidate every cached entry that depends on any of the given scopes"""
+    cache = get_cache()
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def bump_version_on_commit(*scopes, using=None):
+    """
+    bump_version() once the current transaction commits (at once outside
+    one). Bumping earlier lets a concurrent request cache the pre-commit
+    rows under the new version, where they stay until the entry expires.
+
+    Payloads are computed from the primary database (or its replica), so
+    writes to any other alias, e.g. a load test's scratch database, leave
+    them valid and bump nothing.
+    """
+    if using not in (None, DEFAULT_DB_ALIAS):
+        return
+    transaction.on_commit(lambda: bump_version(*scopes), using=using)
+
+
+def _record(stat):
+    cache = get_cache()
+    key = f'analytics:stats:{stat}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+async def _arecord(stat):
+    cache = get_cache()
+    key = f'analytics:stats:{stat}'
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, None)
+        await cache.aincr(key)
+
+
+def _entry_key(name, versions):
+    return f'analytics:{current_read_alias()}:{name}:' + '.'.join(f'{scope}{version}' for scope, version in versions)
+
+
+def _timeout(timeout):
+    if timeout is None:
+        timeout = getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 300)
+    return timeout
+
+
+def get_or_compute(name, compute, scopes, timeout=None):
+    """
+    Return the cached payload for `name`, computing and storing it on a miss.
+
+    `scopes` lists the data the payload depends on; `timeout` (seconds)
+    overrides ANALYTICS_CACHE_TIMEOUT for this entry.
+    """
+    cache = get_cache()
+    key = _entry_key(name, [(scope, get_version(scope)) for scope in scopes])
+
+    payload = cache.get(key)
+    if payload is not None:
+        _record('hits')
+        return payload
+
+    _record('misses')
+    payload = compute()
+    cache.set(key, payload, _timeout(timeout))
+    return payload
+
+
+async def aget_or_compute(name, compute, scopes, timeout=None):
+    """get_or_compute() for async views; `compute` is a coroutine function"""
+    cache = get_cache()
+    key = _entry_key(name, [(scope, await aget_version(scope)) for scope in scopes])
+
+    payload = await cache.aget(key)
+    if payload is not None:
+        await _arecord('hits')
+        return payload
+
+    await _arecord('misses')
+    payload = await compute()
+    await cache.aset(key, payload, _timeout(timeout))
+    return payload
+
+
+def stats():
+    """Hit/miss counters and hit ratio since the counters were last reset"""
+    values = get_cache().get_many([f'analytics:stats:{stat}' for stat in STATS_KEYS])
+    result = {stat: values.get(f'analytics:stats:{stat}', 0) for stat in STATS_KEYS}
+    total = result['hits'] + result['misses']
+    result['hit_ratio'] = round(result['hits'] / total, 4) if total else 0
+    return result
+
+
+def reset_stats():
+    get_cache().delete_many([f'analytics:stats:{stat}' for stat in STATS_KEYS])
@@ -3,6 +3,11 @@ ASGI config for consolahealth project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server so the async dashboard endpoints do not tie up
+a worker while they wait on the database, e.g.:
+
+    uvicorn consolahealth.asgi:application --workers 4
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -0,0 +1,34 @@
+"""
+Per-connection database tuning.
+
+Every new SQLite connection gets the pragmas of the SQLITE_PRAGMAS setting.
+The defaults switch the file to write-ahead logging, so readers no longer
+block the writer, and make a writer wait for the lock (busy_timeout)
+instead of failing at once with "database is locked". journal_mode=WAL is
+stored in the database file; the other pragmas last for the connection.
+
+PostgreSQL needs no hook; its persistence and pooling are configured in
+the DATABASES setting.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def sqlite_pragmas(connection):
+    """{pragma: value} currently in effect on an open SQLite connection"""
+    values = {}
+    with connection.cursor() as cursor:
+        for name in getattr(settings, 'SQLITE_PRAGMAS', {}):
+            cursor.execute(f'PRAGMA {name}')
+            values[name] = cursor.fetchone()[0]
+    return values
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
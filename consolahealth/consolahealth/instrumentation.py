@@ -0,0 +1,266 @@
+"""
+Per-view query and timing instrumentation.
+
+QueryInstrumentationMiddleware samples a fraction of requests
+(QUERY_INSTRUMENTATION_SAMPLE_RATE). For a sampled request it wraps every
+database connection with an execute wrapper that counts statements and
+times them, then:
+
+- adds a ``Server-Timing`` header (``db`` and ``total`` durations), and
+- adds the numbers to per-view totals, with the slowest statements, kept in
+  the analytics cache.
+
+The totals only cover every worker when the analytics cache is shared
+between processes (Redis, Memcached, the database cache). With the default
+LocMemCache each process keeps and reports its own figures, so a scrape
+sees whichever worker answered it; the
+consolahealth_instrumentation_per_process gauge says which case applies.
+
+Statements are recorded with their placeholders, never their parameters.
+Queries run while a streaming response is iterated happen after the
+middleware returns and are not counted.
+
+The totals are served in Prometheus text format by metrics_view, readable
+by staff users or with the QUERY_INSTRUMENTATION_METRICS_TOKEN bearer token.
+"""
+import heapq
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from consolahealth import analytics_cache
+
+VIEWS_KEY = 'instrumentation:views'
+COUNTERS = ('requests', 'queries', 'sql_us', 'total_us')
+# Longest SQL text kept for a slow statement
+SQL_MAX_LENGTH = 500
+
+
+def _key(view, stat):
+    return f'instrumentation:{view}:{stat}'
+
+
+def _slowest_limit():
+    return getattr(settings, 'QUERY_INSTRUMENTATION_SLOWEST', 5)
+
+
+class QueryRecorder:
+    """Execute wrapper counting and timing the statements run through it"""
+
+    def __init__(self, keep=5):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        # Min-heap of (duration, sql) holding the `keep` slowest statements
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            entry = (duration, sql[:SQL_MAX_LENGTH])
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, entry)
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def install(self):
+        """Wrap every connection of the current thread; close the returned stack to unwrap them"""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+
+def record(view, recorder, total):
+    """Add one request's figures to the totals of `view`"""
+    cache = analytics_cache.get_cache()
+    views = cache.get(VIEWS_KEY, [])
+    if view not in views:
+        cache.set(VIEWS_KEY, sorted({*views, view}), None)
+
+    values = {
+        'requests': 1,
+        'queries': recorder.count,
+        'sql_us': int(recorder.duration * 1_000_000),
+        'total_us': int(total * 1_000_000),
+    }
+    for stat, value in values.items():
+        key = _key(view, stat)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            cache.add(key, 0, None)
+            cache.incr(key, value)
+
+    # Racing workers may drop one update of these two; they are indicative only
+    max_key = _key(view, 'max_queries')
+    if recorder.count > (cache.get(max_key) or 0):
+        cache.set(max_key, recorder.count, None)
+    if recorder.slowest:
+        slowest_key = _key(view, 'slowest')
+        merged = heapq.nlargest(_slowest_limit(), [*cache.get(slowest_key, []), *recorder.slowest])
+        cache.set(slowest_key, merged, None)
+
+
+def stats():
+    """{view: {requests, queries, avg_queries, max_queries, sql_ms, total_ms, slowest}} since the last reset"""
+    cache = analytics_cache.get_cache()
+    result = {}
+    for view in cache.get(VIEWS_KEY, []):
+        values = cache.get_many([_key(view, stat) for stat in (*COUNTERS, 'max_queries', 'slowest')])
+        requests = values.get(_key(view, 'requests'), 0)
+        queries = values.get(_key(view, 'queries'), 0)
+        result[view] = {
+            'requests': requests,
+            'queries': queries,
+            'avg_queries': round(queries / requests, 2) if requests else 0,
+            'max_queries': values.get(_key(view, 'max_queries'), 0),
+            'sql_ms': values.get(_key(view, 'sql_us'), 0) / 1000,
+            'total_ms': values.get(_key(view, 'total_us'), 0) / 1000,
+            'slowest': [
+                (round(duration * 1000, 2), sql) for duration, sql in values.get(_key(view, 'slowest'), [])
+            ],
+        }
+    return result
+
+
+def reset_stats():
+    cache = analytics_cache.get_cache()
+    views = cache.get(VIEWS_KEY, [])
+    cache.delete_many([
+        _key(view, stat) for view in views for stat in (*COUNTERS, 'max_queries', 'slowest')
+    ])
+    cache.delete(VIEWS_KEY)
+
+
+class QueryInstrumentationMiddleware:
+    """Record query count, SQL time and slow statements for a sample of requests"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        rate = getattr(settings, 'QUERY_INSTRUMENTATION_SAMPLE_RATE', 0)
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder(keep=_slowest_limit())
+        start = time.perf_counter()
+        with recorder.install():
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        record(self.view_name(request), recorder, total)
+        return self.add_header(response, recorder, total)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder(keep=_slowest_limit())
+        start = time.perf_counter()
+        # Connections are per thread: wrap those of the thread that runs the
+        # request's (thread-sensitive) database code, not the event loop's
+        stack = await sync_to_async(recorder.install)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        total = time.perf_counter() - start
+        await sync_to_async(record)(self.view_name(request), recorder, total)
+        return self.add_header(response, recorder, total)
+
+    @staticmethod
+    def view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.view_name or match._func_path
+
+    @staticmethod
+    def add_header(response, recorder, total):
+        timing = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f'total;dur={total * 1000:.1f}'
+        )
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+        return response
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def per_process():
+    """Whether the analytics cache lives in this process, so the totals are this worker's alone"""
+    return isinstance(analytics_cache.get_cache(), (LocMemCache, DummyCache))
+
+
+def prometheus_text():
+    """Per-view totals and analytics cache counters in Prometheus text exposition format"""
+    view_stats = stats()
+    metrics = [
+        ('consolahealth_view_requests_total', 'counter', 'Sampled requests per view', 'requests', 1),
+        ('consolahealth_view_queries_total', 'counter', 'SQL statements run by sampled requests', 'queries', 1),
+        ('consolahealth_view_sql_seconds_total', 'counter', 'Time spent in SQL by sampled requests', 'sql_ms', 0.001),
+        ('consolahealth_view_duration_seconds_total', 'counter', 'Total time of sampled requests', 'total_ms', 0.001),
+        ('consolahealth_view_max_queries', 'gauge', 'Most SQL statements run by one sampled request', 'max_queries', 1),
+    ]
+    lines = []
+    for name, kind, help_text, stat, scale in metrics:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for view, values in view_stats.items():
+            value = f'{values[stat]}' if scale == 1 else f'{values[stat] * scale:.6f}'
+            lines.append(f'{name}{{view="{_label(view)}"}} {value}')
+
+    cache_stats = analytics_cache.stats()
+    for stat in analytics_cache.STATS_KEYS:
+        name = f'consolahealth_analytics_cache_{stat}_total'
+        lines += [f'# HELP {name} Analytics cache {stat}', f'# TYPE {name} counter', f'{name} {cache_stats[stat]}']
+
+    rate = getattr(settings, 'QUERY_INSTRUMENTATION_SAMPLE_RATE', 0)
+    lines += [
+        '# HELP consolahealth_instrumentation_sample_rate Fraction of requests instrumented',
+        '# TYPE consolahealth_instrumentation_sample_rate gauge',
+        f'consolahealth_instrumentation_sample_rate {rate:g}',
+        '# HELP consolahealth_instrumentation_per_process Whether the totals cover only the worker that answered (1) or all workers (0)',
+        '# TYPE consolahealth_instrumentation_per_process gauge',
+        f'consolahealth_instrumentation_per_process {int(per_process())}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: staff users, or the configured bearer token"""
+    token = getattr(settings, 'QUERY_INSTRUMENTATION_METRICS_TOKEN', '')
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        authorized = True
+    if not authorized:
+        return HttpResponseForbidden("Staff access or a metrics token is required.")
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
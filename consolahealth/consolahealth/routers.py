@@ -0,0 +1,143 @@
+"""
+Read-replica routing for the health and students apps.
+
+Views marked with ReplicaReadMixin (class-based) or @replica_reads
+(function views) read the health and students tables from the database
+alias named by ANALYTICS_READ_DATABASE, e.g. a streaming replica. All
+other reads, and every write, go to 'default' (objects explicitly saved
+to another database keep their related writes there). Without that alias
+in DATABASES everything stays on 'default'.
+
+Read-your-writes: a request that writes a routed model gets a cookie that
+keeps its browser reading from the primary for READ_YOUR_WRITES_SECONDS,
+longer than the replica is expected to lag. Reads after a write in the
+same request also go to the primary. The cookie only ever moves reads to
+the primary, so it needs no signing.
+
+ReplicaRoutingMiddleware keeps the routing state of the current request
+in a context variable, which sync_to_async and async_to_sync carry over
+to the threads and tasks serving the request.
+"""
+import contextvars
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ROUTED_APPS = {'health', 'students'}
+STICKY_COOKIE = 'read_primary'
+
+_state = contextvars.ContextVar('replica_routing', default=None)
+
+
+def replica_alias():
+    """The configured replica alias, or None when it is not in DATABASES"""
+    alias = getattr(settings, 'ANALYTICS_READ_DATABASE', None)
+    return alias if alias and alias in connections else None
+
+
+def current_read_alias():
+    """Alias the routed apps are read from right now: the replica inside a replica view, else 'default'"""
+    state = _state.get()
+    return (state.read_alias() if state is not None else None) or DEFAULT_DB_ALIAS
+
+
+class RoutingState:
+    """Routing decisions of one request; shared (not copied) by its threads and tasks"""
+
+    def __init__(self, sticky):
+        self.sticky = sticky
+        self.replica = False
+        self.wrote = False
+
+    def read_alias(self):
+        if self.replica and not self.sticky and not self.wrote:
+            return replica_alias()
+        return None
+
+
+class ReplicaReadMixin:
+    """Class-based views whose reads may be served by the replica"""
+    read_from_replica = True
+
+
+def replica_reads(view):
+    """Function views whose reads may be served by the replica"""
+    view.read_from_replica = True
+    return view
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or model._meta.app_label not in ROUTED_APPS:
+            return None
+        return state.read_alias()
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APPS:
+            return None
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Objects related to an instance of another database (e.g. a load
+        # test's scratch database) are written there; replica reads are not
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db not in (None, DEFAULT_DB_ALIAS, replica_alias()):
+            return instance._state.db
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Route the reads of replica views and pin writing browsers to the primary"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState(sticky=STICKY_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(response, state)
+
+    async def __acall__(self, request):
+        state = RoutingState(sticky=STICKY_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(response, state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is not None:
+            view = getattr(view_func, 'view_class', view_func)
+            state.replica = getattr(view, 'read_from_replica', False)
+
+    @staticmethod
+    def pin(response, state):
+        if state.wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=getattr(settings, 'READ_YOUR_WRITES_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
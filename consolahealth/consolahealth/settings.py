@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'consolahealth.instrumentation.QueryInstrumentationMiddleware',
+    'consolahealth.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -71,17 +74,132 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'consolahealth.wsgi.application'
 
+ASGI_APPLICATION = 'consolahealth.asgi.application'
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+# SQLite by default. DATABASE_ENGINE=postgresql switches to PostgreSQL, with
+# DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST and
+# DATABASE_PORT. There, DATABASE_POOL=1 (the default, needs psycopg 3 with
+# psycopg[pool]) reuses connections from a pool; with DATABASE_POOL=0 each
+# worker keeps its connection open for DATABASE_CONN_MAX_AGE seconds.
+# SQLITE_TUNING=0 drops the SQLite options and pragmas below, e.g. to compare
+# with the load_test_writes command on a scratch copy:
+#   DATABASE_NAME=scratch.sqlite3 python manage.py load_test_writes --database default
+
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite3')
+
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') == '1'
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASE_POOL = os.environ.get('DATABASE_POOL', '1') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'consolahealth'),
+            'USER': os.environ.get('DATABASE_USER', 'consolahealth'),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', 'localhost'),
+            'PORT': os.environ.get('DATABASE_PORT', '5432'),
+            # A pooled connection goes back to the pool after each request, so
+            # Django refuses persistent connections on top of the pool
+            'CONN_MAX_AGE': 0 if DATABASE_POOL else int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+                    'timeout': 10,
+                },
+            } if DATABASE_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Take the write lock when a transaction begins: a deferred
+                # transaction that later tries to write fails with "database is
+                # locked" without waiting for the busy timeout
+                'transaction_mode': 'IMMEDIATE',
+                # Seconds a statement waits for another connection's lock
+                'timeout': 20,
+            } if SQLITE_TUNING else {},
+        }
+    }
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Read replica: DATABASE_REPLICA_HOST (PostgreSQL, same credentials and
+# DATABASE_REPLICA_PORT) or DATABASE_REPLICA_NAME (SQLite file) adds a
+# 'replica' database. consolahealth.routers sends the reads of the
+# dashboard, records, history and report pages there; writes and all other
+# reads stay on 'default'. The test runner does not create it (a mirror);
+# run the tests without these variables.
+
+if DATABASE_ENGINE == 'postgresql' and os.environ.get('DATABASE_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DATABASE_REPLICA_HOST'],
+        'PORT': os.environ.get('DATABASE_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif DATABASE_ENGINE != 'postgresql' and os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_REPLICA_NAME'],
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['consolahealth.routers.PrimaryReplicaRouter']
+
+# Database alias the replica views read from, used when it is in DATABASES
+
+ANALYTICS_READ_DATABASE = 'replica'
+
+# Seconds a browser that saved something keeps reading from the primary;
+# longer than the replica's expected lag
+
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 10))
+
+# Pragmas set on every new SQLite connection (consolahealth.db). WAL lets the
+# pages keep reading while a check-up is saved. The journal mode is stored
+# in the file, so untuned connections switch it back to SQLite's default.
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Durable at each checkpoint rather than each commit; safe with WAL
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    # Negative: KiB of page cache (20 MB)
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+    'mmap_size': 134217728,
+} if SQLITE_TUNING else {'journal_mode': 'DELETE'}
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# The analytics cache holds computed dashboard/home payloads. Its backend can
+# be switched to FileBasedCache or DatabaseCache (run createcachetable) with
+# the ANALYTICS_CACHE_BACKEND and ANALYTICS_CACHE_LOCATION environment variables.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analytics': {
+        'BACKEND': os.environ.get('ANALYTICS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('ANALYTICS_CACHE_LOCATION', 'consolahealth-analytics'),
+    },
 }
 
+ANALYTICS_CACHE_ALIAS = 'analytics'
+
+# Default lifetime (seconds) of a cached analytics payload
+ANALYTICS_CACHE_TIMEOUT = int(os.environ.get('ANALYTICS_CACHE_TIMEOUT', 300))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -118,3 +236,66 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+
+# Student directory
+# Rows per page on the home page student table and its JSON endpoint
+
+STUDENTS_PAGE_SIZE = 25
+
+STUDENTS_MAX_PAGE_SIZE = 100
+
+# Suggestions returned by the student typeahead endpoint
+STUDENT_TYPEAHEAD_LIMIT = 10
+
+# Students diffed and written per transaction by the roster sync
+STUDENT_ROSTER_BATCH_SIZE = 1000
+
+
+# Health records list
+# Rows per page on the All Records view; ?page_size= may override up to the maximum
+
+HEALTH_RECORDS_PAGE_SIZE = 50
+
+HEALTH_RECORDS_MAX_PAGE_SIZE = 200
+
+# Rows validated and inserted per transaction by the check-up importer
+
+HEALTH_IMPORT_BATCH_SIZE = 500
+
+# Check-ups listed in the dashboard's recent check-ups widget
+
+HEALTH_DASHBOARD_RECENT = 10
+
+# Points per chart series on a student's history page; the JSON series
+# endpoint accepts ?points= up to the maximum
+
+HEALTH_HISTORY_CHART_POINTS = 200
+
+HEALTH_HISTORY_MAX_CHART_POINTS = 1000
+
+# Rows fetched per database round trip when streaming a records export
+
+HEALTH_EXPORT_CHUNK_SIZE = 2000
+
+# Above this many records the admin changelist shows the table's estimated
+# row count instead of counting it
+
+HEALTH_ADMIN_EXACT_COUNT_LIMIT = 100000
+
+
+# Request instrumentation
+# Fraction of requests whose query count, SQL time and slowest statements are
+# recorded per view and reported in a Server-Timing header (0 turns it off).
+# The per-view totals live in the analytics cache: they add up across workers
+# only with a shared backend, under LocMemCache each process counts its own.
+
+QUERY_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('QUERY_INSTRUMENTATION_SAMPLE_RATE', '0.1'))
+
+# Slowest statements kept per view
+
+QUERY_INSTRUMENTATION_SLOWEST = 5
+
+# Bearer token letting a Prometheus scraper read /metrics/ without a staff login
+
+QUERY_INSTRUMENTATION_METRICS_TOKEN = os.environ.get('QUERY_INSTRUMENTATION_METRICS_TOKEN', '')
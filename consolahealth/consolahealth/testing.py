@@ -0,0 +1,96 @@
+"""
+Helpers shared by the apps' test suites.
+"""
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    Query-count regression checks for TestCase subclasses.
+
+    assertQueryBudget() makes a request with the test data as it is, then
+    again after add_rows() has added `growth` more rows, and fails if either
+    request runs more queries than the budget or if the count grows with the
+    data (an N+1 pattern). Subclasses define add_rows(self, count).
+    """
+    growth = 10
+    add_rows = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not callable(cls.add_rows):
+            raise TypeError(f"{cls.__name__} must define add_rows(self, count) to use assertQueryBudget().")
+
+    def assertQueryBudget(self, budget, request):
+        """`request` is a callable making one request with self.client; returns the last response"""
+        counts = []
+        for attempt in range(2):
+            if attempt:
+                # Run the cache invalidations that follow the commit of real writes
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.add_rows(self.growth)
+            with CaptureQueriesContext(connection) as queries:
+                response = request()
+                # Streamed bodies query while they are read
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+            counts.append(len(queries))
+        self.assertEqual(
+            counts[0], counts[1],
+            f"Query count grows with the data ({counts[0]} -> {counts[1]} after adding {self.growth} rows)",
+        )
+        self.assertLessEqual(counts[1], budget, f"{counts[1]} queries exceed the budget of {budget}")
+        return response
+
+
+class SQLiteDatabaseMixin:
+    """
+    A second SQLite database, `database_alias`, for TestCase and
+    TransactionTestCase subclasses: a migrated temporary file named after
+    the alias, with the OPTIONS of the default database when that is SQLite
+    too.
+    """
+    database_alias = None
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        default = connections.settings[DEFAULT_DB_ALIAS]
+        options = default.get('OPTIONS', {}) if default['ENGINE'] == 'django.db.backends.sqlite3' else {}
+        # configure_settings() fills in the defaults of a DATABASES entry
+        connections.settings[cls.database_alias] = connections.configure_settings({
+            **connections.settings,
+            cls.database_alias: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(directory.name, f'{cls.database_alias}.sqlite3'),
+                'OPTIONS': options,
+            },
+        })[cls.database_alias]
+        cls.addClassCleanup(cls._remove_database)
+        call_command('migrate', database=cls.database_alias, verbosity=0)
+        cls.databases = {*cls.databases, cls.database_alias}
+        super().setUpClass()
+
+    @classmethod
+    def _remove_database(cls):
+        connections[cls.database_alias].close()
+        del connections[cls.database_alias]
+        del connections.settings[cls.database_alias]
+
+
+class SQLiteReplicaMixin(SQLiteDatabaseMixin):
+    """
+    A second SQLite database, `replica_alias`, standing in for a read replica
+    in TestCase subclasses.
+
+    Nothing replicates into it, so rows written with .using(replica_alias)
+    are only visible through it: a response showing them was read from the
+    replica.
+    """
+    database_alias = replica_alias = 'replica_test'
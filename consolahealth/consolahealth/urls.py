@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from consolahealth.instrumentation import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include('students.urls')),
     path('', include(('users.urls', 'users'), namespace='users')),
     path('health/', include('health.urls')),
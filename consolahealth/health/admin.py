@@ -1,13 +1,53 @@
 from django.contrib import admin
-from .models import HealthRecord
+from django.db.models import Case, IntegerField, Value, When
+from .models import BP_STATUSES, HealthRecord
+from .pagination import EstimatedCountPaginator
+
+
+class HealthCategoryFilter(admin.SimpleListFilter):
+    """Filter on the BMI category annotated by HealthRecordAdmin.get_queryset()"""
+    title = "health category"
+    parameter_name = 'health_category'
+
+    def lookups(self, request, model_admin):
+        return HealthRecord.HEALTH_CATEGORY_CHOICES
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(health_category_value=self.value())
+        return queryset
+
+
+class BloodPressureStatusFilter(admin.SimpleListFilter):
+    """Filter on the blood pressure status annotated by HealthRecordAdmin.get_queryset()"""
+    title = "blood pressure status"
+    parameter_name = 'bp_status'
+
+    def lookups(self, request, model_admin):
+        return [(status, status) for status in BP_STATUSES]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(bp_status_value=self.value())
+        return queryset
+
 
 @admin.register(HealthRecord)
 class HealthRecordAdmin(admin.ModelAdmin):
     list_display = ('student', 'school_year', 'checkup_date', 'bmi', 'health_category', 'bp_status')
-    list_filter = ('school_year', 'urine_test')
+    list_filter = ('school_year', 'urine_test', HealthCategoryFilter, BloodPressureStatusFilter)
+    # __str__ of each row reads its student
+    list_select_related = ('student',)
     search_fields = ('student__first_name', 'student__last_name', 'student__s_id')
     readonly_fields = ('checkup_date', 'last_updated', 'bmi', 'health_category', 'bp_status')
-    
+    # A select listing every student does not scale; pick by ID instead
+    raw_id_fields = ('student',)
+
+    # Large tables: estimate the unfiltered total and skip the second COUNT(*)
+    # of the whole table that filtered changelists show
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     fieldsets = (
         ('Student Information', {
             'fields': ('student',)
@@ -25,15 +65,29 @@ class HealthRecordAdmin(admin.ModelAdmin):
             'fields': ('school_year', 'health_category', 'checkup_date', 'last_updated')
         }),
     )
-    
+
+    def get_queryset(self, request):
+        # BMI, category and BP status are computed by the database, so they can
+        # be displayed, sorted and filtered on without per-row Python work; the
+        # record properties return these annotations
+        return super().get_queryset(request).with_health_category().with_bp_status()
+
     def bmi(self, obj):
         return f"{obj.bmi} kg/m²" if obj.bmi else "N/A"
     bmi.short_description = "BMI"
-    
+    bmi.admin_order_field = 'bmi_value'
+
     def health_category(self, obj):
         return obj.health_category.upper()
     health_category.short_description = "Health Category"
-    
+    # Categories are BMI bands, so BMI order is category order
+    health_category.admin_order_field = 'bmi_value'
+
     def bp_status(self, obj):
         return obj.bp_status
     bp_status.short_description = "Blood Pressure Status"
+    # Least to most severe rather than alphabetical
+    bp_status.admin_order_field = Case(
+        *[When(bp_status_value=status, then=Value(rank)) for rank, status in enumerate(BP_STATUSES)],
+        output_field=IntegerField(),
+    )
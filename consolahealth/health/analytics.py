@@ -0,0 +1,275 @@
+"""
+Population-health statistics computed over whole columns with NumPy.
+
+The needed HealthRecord columns are read once with values_list() into
+arrays; BMI, health category and BP status are then derived for every
+record at once using the same rules as the HealthRecord properties
+(and blood_pressure_status), instead of instantiating one model per row.
+
+NumPy is an optional dependency, listed in requirements-analytics.txt:
+is_available() reports whether it is installed and every computation
+raises ImproperlyConfigured without it.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+from .models import BP_STATUSES, HealthRecord
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CATEGORIES = ['underweight', 'normal', 'overweight', 'obese']
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# |z| above this marks a record as unusually low/high for its cohort
+Z_SCORE_THRESHOLD = 2
+
+
+def is_available():
+    return np is not None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImproperlyConfigured("health.analytics requires the numpy package.")
+
+
+class HealthArrays:
+    """Column arrays for a set of health records, one element per record"""
+
+    FIELDS = [
+        'id', 'student_id', 'student__department', 'student__year_level', 'school_year',
+        'checkup_date', 'weight', 'height', 'systolic_bp', 'diastolic_bp',
+    ]
+
+    def __init__(self, rows):
+        _require_numpy()
+        columns = list(zip(*rows)) or [()] * len(self.FIELDS)
+        (ids, student_ids, departments, year_levels, school_years,
+         dates, weights, heights, systolic, diastolic) = columns
+        self.id = np.array(ids, dtype=np.int64)
+        self.student_id = np.array(student_ids, dtype=np.int64)
+        self.department = np.array(departments, dtype=str)
+        self.year_level = np.array(year_levels, dtype=str)
+        # NULL and blank school years are both '' (str() would make None the year 'None')
+        self.school_year = np.array([year or '' for year in school_years], dtype=str)
+        # Aware datetimes as POSIX timestamps; only their order is used
+        self.checkup_date = np.array([date.timestamp() for date in dates], dtype=float)
+        self.weight = np.array(weights, dtype=float)
+        self.height = np.array(heights, dtype=float)
+        self.systolic_bp = np.array(systolic, dtype=np.int64)
+        self.diastolic_bp = np.array(diastolic, dtype=np.int64)
+
+        self.bmi = bmi(self.weight, self.height)
+        self.health_category = health_category(self.bmi)
+        self.bp_status = bp_status(self.systolic_bp, self.diastolic_bp)
+
+    def __len__(self):
+        return len(self.id)
+
+
+def load_records(records=None):
+    """Read the columns of `records` (default: every record) into a HealthArrays"""
+    if records is None:
+        records = HealthRecord.objects.all()
+    return HealthArrays(records.order_by().values_list(*HealthArrays.FIELDS))
+
+
+def bmi(weight, height):
+    """BMI per element, rounded like HealthRecord.bmi; NaN where the height is zero"""
+    _require_numpy()
+    weight = np.asarray(weight, dtype=float)
+    height_m = np.asarray(height, dtype=float) / 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(height_m > 0, weight / (height_m ** 2), np.nan)
+    return np.round(values, 2)
+
+
+def health_category(bmi_values):
+    """Health category per element, matching HealthRecord.health_category"""
+    _require_numpy()
+    bmi_values = np.asarray(bmi_values, dtype=float)
+    return np.select(
+        [np.isnan(bmi_values), bmi_values < 18.5, bmi_values < 25, bmi_values < 30],
+        ['unknown', 'underweight', 'normal', 'overweight'],
+        default='obese',
+    )
+
+
+def bp_status(systolic, diastolic):
+    """Blood pressure status per element, matching blood_pressure_status()"""
+    _require_numpy()
+    systolic = np.asarray(systolic)
+    diastolic = np.asarray(diastolic)
+    return np.select(
+        [
+            (systolic < 120) & (diastolic < 80),
+            (systolic < 130) & (diastolic < 80),
+            (systolic < 140) & (diastolic < 90),
+        ],
+        BP_STATUSES[:3],
+        default=BP_STATUSES[3],
+    )
+
+
+def percentiles(values, q=PERCENTILES):
+    """{'p5': ..., 'p50': ...} of the non-NaN values, or None for each when there are none"""
+    _require_numpy()
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {f'p{p}': None for p in q}
+    return {f'p{p}': round(float(v), 2) for p, v in zip(q, np.percentile(values, q))}
+
+
+def _group(keys):
+    """Sorted distinct keys and the index of each element's key"""
+    return np.unique(np.asarray(keys), return_inverse=True)
+
+
+def crosstab(labels, groups, choices):
+    """{group: {choice: count}} counting each label per group; labels outside `choices` are ignored"""
+    _require_numpy()
+    labels = np.asarray(labels)
+    keys, inverse = _group(groups)
+    codes = np.select([labels == choice for choice in choices], range(len(choices)), default=-1)
+    known = codes >= 0
+    table = np.zeros((len(keys), len(choices)), dtype=np.int64)
+    np.add.at(table, (inverse[known], codes[known]), 1)
+    return {
+        str(key): {choice: int(count) for choice, count in zip(choices, row)}
+        for key, row in zip(keys, table)
+    }
+
+
+def z_scores(values, groups):
+    """
+    Standard score of each value against the mean and (population) standard
+    deviation of its group. NaN values stay NaN; groups with no spread get 0.
+    Returns (z, {group: {'count', 'mean', 'std'}}).
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=float)
+    keys, inverse = _group(groups)
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+
+    counts = np.bincount(inverse, weights=valid, minlength=len(keys))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.bincount(inverse, weights=filled, minlength=len(keys)) / counts
+        deviations = np.where(valid, values - means[inverse], 0.0)
+        stds = np.sqrt(np.bincount(inverse, weights=deviations ** 2, minlength=len(keys)) / counts)
+        z = np.where(stds[inverse] > 0, (values - means[inverse]) / stds[inverse], 0.0)
+    z = np.where(valid, z, np.nan)
+
+    stats = {
+        str(key): {
+            'count': int(count),
+            'mean': round(float(mean), 2) if count else None,
+            'std': round(float(std), 2) if count else None,
+        }
+        for key, count, mean, std in zip(keys, counts, means, stds)
+    }
+    return z, stats
+
+
+def bmi_for_age(data):
+    """
+    BMI z-scores within year level cohorts, the closest proxy for age the
+    student records have. Returns the per-record z array and, per cohort,
+    its mean/std and how many records fall beyond +/-Z_SCORE_THRESHOLD.
+    """
+    z, cohorts = z_scores(data.bmi, data.year_level)
+    keys, inverse = _group(data.year_level)
+    high = np.bincount(inverse[z > Z_SCORE_THRESHOLD], minlength=len(keys))
+    low = np.bincount(inverse[z < -Z_SCORE_THRESHOLD], minlength=len(keys))
+    for key, above, below in zip(keys, high, low):
+        cohorts[str(key)].update(above=int(above), below=int(below))
+    return z, cohorts
+
+
+def year_over_year(data):
+    """
+    Change in weight and BMI per student between consecutive school years
+    they were checked in, using the latest check-up of each year. Records
+    without a school year are left out.
+    Returns a dict of aligned arrays, one element per student transition.
+    """
+    _require_numpy()
+    dated = np.flatnonzero(data.school_year != '')
+    # lexsort orders by its last key first
+    order = dated[np.lexsort((
+        data.id[dated], data.checkup_date[dated], data.school_year[dated], data.student_id[dated],
+    ))]
+    students, years = data.student_id[order], data.school_year[order]
+    last_of_year = np.ones(len(order), dtype=bool)
+    last_of_year[:-1] = (students[1:] != students[:-1]) | (years[1:] != years[:-1])
+    latest = order[last_of_year]
+
+    same_student = data.student_id[latest][1:] == data.student_id[latest][:-1]
+    previous, current = latest[:-1][same_student], latest[1:][same_student]
+    return {
+        'student_id': data.student_id[current],
+        'from_year': data.school_year[previous],
+        'to_year': data.school_year[current],
+        'weight_delta': np.round(data.weight[current] - data.weight[previous], 2),
+        'bmi_delta': np.round(data.bmi[current] - data.bmi[previous], 2),
+    }
+
+
+def _mean(values):
+    values = values[~np.isnan(values)]
+    return round(float(values.mean()), 2) if len(values) else None
+
+
+def year_over_year_summary(deltas, limit=10):
+    """Average deltas per year transition and the `limit` largest BMI changes"""
+    _require_numpy()
+    transitions = []
+    if len(deltas['student_id']):
+        pairs = np.char.add(np.char.add(deltas['from_year'], '|'), deltas['to_year'])
+        keys, inverse = _group(pairs)
+        for index, key in enumerate(keys):
+            mask = inverse == index
+            from_year, to_year = str(key).split('|')
+            transitions.append({
+                'from_year': from_year,
+                'to_year': to_year,
+                'students': int(mask.sum()),
+                'avg_weight_delta': _mean(deltas['weight_delta'][mask]),
+                'avg_bmi_delta': _mean(deltas['bmi_delta'][mask]),
+            })
+
+    magnitude = np.nan_to_num(np.abs(deltas['bmi_delta']), nan=-1)
+    largest = np.argsort(-magnitude, kind='stable')[:limit]
+    largest_changes = [
+        {
+            'student_id': int(deltas['student_id'][i]),
+            'from_year': str(deltas['from_year'][i]),
+            'to_year': str(deltas['to_year'][i]),
+            'weight_delta': float(deltas['weight_delta'][i]),
+            'bmi_delta': None if np.isnan(deltas['bmi_delta'][i]) else float(deltas['bmi_delta'][i]),
+        }
+        for i in largest
+    ]
+    return {'transitions': transitions, 'largest_changes': largest_changes}
+
+
+def population_report(records=None):
+    """Every statistic of the reports page, as plain (cacheable) Python values"""
+    data = load_records(records)
+    _, cohorts = bmi_for_age(data)
+    departments, inverse = _group(data.department)
+    return {
+        'record_count': len(data),
+        'bmi_percentiles': percentiles(data.bmi),
+        'bmi_percentiles_by_department': {
+            str(key): percentiles(data.bmi[inverse == index]) for index, key in enumerate(departments)
+        },
+        'bmi_for_age': cohorts,
+        'category_by_department': crosstab(data.health_category, data.department, CATEGORIES),
+        'bp_by_department': crosstab(data.bp_status, data.department, BP_STATUSES),
+        'bp_by_year_level': crosstab(data.bp_status, data.year_level, BP_STATUSES),
+        'year_over_year': year_over_year_summary(year_over_year(data)),
+    }
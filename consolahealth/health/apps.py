@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class HealthConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'health'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Project-wide: tunes every new database connection
+        from consolahealth import db  # noqa: F401
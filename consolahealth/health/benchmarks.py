@@ -0,0 +1,171 @@
+"""
+Benchmarks of the main pages against the current database.
+
+Each scenario is one URL (the home page, the dashboard and its widget
+endpoints, the records list with each filter, a student history and the
+reports page). It is requested once "cold", right after the analytics
+cache versions are bumped so nothing cached is reused, then `repeat` times
+"warm". Wall time and query count are recorded for every request.
+
+It also times HealthRecord hydration, building model instances from rows
+already fetched, which the metric descriptors of the measurement fields
+take part in.
+
+The report is a plain dict (written as JSON by the benchmark_views
+command) carrying the commit and data size, so runs from different
+commits can be compared with compare().
+"""
+import platform
+import statistics
+import subprocess
+import time
+import timeit
+
+import django
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from consolahealth import analytics_cache
+from students.models import Student
+from .models import HealthRecord
+
+DASHBOARD_WIDGETS = ['totals', 'categories', 'weight_by_year', 'students_per_year', 'blood_pressure', 'recent']
+
+
+def scenarios():
+    """(name, url) pairs to benchmark, with filter values picked from the data"""
+    records_url = reverse('health:all_records')
+    result = [
+        ('home', reverse('home')),
+        ('dashboard', reverse('health:dashboard')),
+        *[(f'dashboard_{name}', reverse(f'health:dashboard_{name}')) for name in DASHBOARD_WIDGETS],
+        ('all_records', records_url),
+    ]
+
+    latest = HealthRecord.objects.select_related('student').order_by('-checkup_date', '-id').first()
+    if latest is not None:
+        course, year = latest.student.department, latest.school_year
+        result += [
+            ('all_records_search', f'{records_url}?search={latest.student.last_name}'),
+            ('all_records_course', f'{records_url}?course={course}'),
+            ('all_records_year', f'{records_url}?year={year}'),
+            ('all_records_category', f'{records_url}?category=overweight'),
+            ('all_records_bp_status', f'{records_url}?bp_status=Stage+1+Hypertension'),
+            ('all_records_all_filters', f'{records_url}?course={course}&year={year}&category=normal'),
+        ]
+        # The longest history is the worst case for the history page
+        student = (
+            Student.objects.annotate(records=Count('health_records'))
+            .order_by('-records', 'pk').values_list('pk', flat=True).first()
+        )
+        result += [
+            ('student_history', reverse('health:student_history', args=[student])),
+            ('student_history_series', reverse('health:student_history_series', args=[student])),
+        ]
+    result.append(('reports', reverse('health:reports')))
+    return result
+
+
+def measure(client, url):
+    """(status, milliseconds, queries) of one GET, including reading a streamed body"""
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - start
+    return response.status_code, round(elapsed * 1000, 2), len(queries)
+
+
+def run_scenario(client, name, url, repeat):
+    analytics_cache.bump_version('students', 'health')
+    status, cold_ms, cold_queries = measure(client, url)
+    runs = [measure(client, url) for _ in range(repeat)]
+    timings = [ms for _, ms, _ in runs]
+    return {
+        'name': name,
+        'url': url,
+        'status': status,
+        'cold': {'ms': cold_ms, 'queries': cold_queries},
+        'warm': {
+            'min_ms': min(timings),
+            'median_ms': round(statistics.median(timings), 2),
+            'max_ms': max(timings),
+            'queries': max(queries for _, _, queries in runs),
+        },
+    }
+
+
+def hydration(rows=1000, repeat=15):
+    """Best time (microseconds per row) to build HealthRecords from `rows` fetched rows, or None without records"""
+    fields = [field.attname for field in HealthRecord._meta.concrete_fields]
+    fetched = list(HealthRecord.objects.order_by().values_list(*fields)[:rows])
+    if not fetched:
+        return None
+
+    def build():
+        for row in fetched:
+            HealthRecord.from_db(DEFAULT_DB_ALIAS, fields, row)
+
+    best = min(timeit.repeat(build, number=1, repeat=repeat))
+    return {'rows': len(fetched), 'us_per_row': round(best / len(fetched) * 1e6, 3)}
+
+
+def git_commit():
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def environment():
+    return {
+        'created_at': timezone.now().isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'students': Student.objects.count(),
+        'records': HealthRecord.objects.count(),
+    }
+
+
+def run(repeat=5, only=None):
+    """Benchmark every scenario (or those named in `only`) and return the report"""
+    selected = [(name, url) for name, url in scenarios() if not only or name in only]
+    # The test client's host, and no instrumentation overhead in the timings
+    with override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], QUERY_INSTRUMENTATION_SAMPLE_RATE=0,
+    ):
+        client = Client()
+        results = [run_scenario(client, name, url, repeat) for name, url in selected]
+    return {**environment(), 'repeat': repeat, 'results': results, 'hydration': hydration()}
+
+
+def compare(report, baseline):
+    """Per scenario in both reports: warm medians, their change in percent and the query counts"""
+    before = {result['name']: result for result in baseline['results']}
+    rows = []
+    for result in report['results']:
+        old = before.get(result['name'])
+        if old is None:
+            continue
+        old_ms, new_ms = old['warm']['median_ms'], result['warm']['median_ms']
+        rows.append({
+            'name': result['name'],
+            'before_ms': old_ms,
+            'after_ms': new_ms,
+            'change_pct': round((new_ms - old_ms) / old_ms * 100, 1) if old_ms else None,
+            'before_queries': old['warm']['queries'],
+            'after_queries': result['warm']['queries'],
+        })
+    return rows
@@ -0,0 +1,115 @@
+"""
+Conditional GET (ETag/Last-Modified) for pages and endpoints built from
+health and student data.
+
+Each view describes its data scope as "states": (latest modification time,
+row count) pairs read with one cheap aggregate per table. The ETag hashes
+the states, so it changes on every insert and update (newer timestamp) and
+on every delete (lower count). Last-Modified is the newest timestamp; it
+cannot see deletions, which is why Django's rule of letting If-None-Match
+take precedence over If-Modified-Since matters here.
+
+HTML pages also fold the CSRF secret and the user into the ETag, since the
+rendered forms and navigation depend on them, and skip validation entirely
+while flash messages are pending.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from students.models import Student
+from .models import HealthRecord
+
+
+def _state(queryset, field):
+    row = queryset.order_by().aggregate(modified=Max(field), count=Count('pk'))
+    return row['modified'], row['count']
+
+
+async def _astate(queryset, field):
+    row = await queryset.order_by().aaggregate(modified=Max(field), count=Count('pk'))
+    return row['modified'], row['count']
+
+
+def records_state(records=None):
+    return _state(HealthRecord.objects.all() if records is None else records, 'last_updated')
+
+
+def students_state(students=None):
+    return _state(Student.objects.all() if students is None else students, 'updated_at')
+
+
+async def arecords_state(records=None):
+    return await _astate(HealthRecord.objects.all() if records is None else records, 'last_updated')
+
+
+async def astudents_state(students=None):
+    return await _astate(Student.objects.all() if students is None else students, 'updated_at')
+
+
+def student_history_state(student_id):
+    """States of one student and their records from a single query; None if the student does not exist"""
+    row = (
+        Student.objects.filter(pk=student_id)
+        .annotate(records_modified=Max('health_records__last_updated'), record_count=Count('health_records'))
+        .values_list('updated_at', 'records_modified', 'record_count')
+        .first()
+    )
+    if row is None:
+        return None
+    updated_at, records_modified, record_count = row
+    return [(updated_at, 1), (records_modified, record_count)]
+
+
+def validators(states, *extra):
+    """(etag, last_modified timestamp) for a list of states and any request-specific parts"""
+    digest = hashlib.md5(repr((states, extra)).encode(), usedforsecurity=False).hexdigest()
+    timestamps = [modified for modified, _ in states if modified is not None]
+    last_modified = int(max(timestamps).timestamp()) if timestamps else None
+    return f'"{digest}"', last_modified
+
+
+def add_validators(response, etag, last_modified):
+    """Set the validators on a GET response and require clients to revalidate it"""
+    if etag and not response.has_header('ETag'):
+        response['ETag'] = etag
+    if last_modified and not response.has_header('Last-Modified'):
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET/HEAD with 304 Not Modified when get_data_states() is unchanged
+    since the client's copy. Subclasses return a list of states, or None to
+    skip conditional handling (e.g. when the object does not exist).
+    """
+    # get_data_states(self, request, *args, **kwargs), required in subclasses
+    get_data_states = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not callable(cls.get_data_states):
+            raise ImproperlyConfigured(f"{cls.__name__} must define get_data_states().")
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+        states = self.get_data_states(request, *args, **kwargs)
+        if states is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        user = request.user.pk if request.user.is_authenticated else None
+        etag, last_modified = validators(states, request.META.get('CSRF_COOKIE'), user)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            add_validators(response, etag, last_modified)
+            patch_vary_headers(response, ['Cookie'])
+        return response
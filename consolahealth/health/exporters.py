@@ -0,0 +1,90 @@
+import csv
+import json
+
+from django.conf import settings
+
+# Columns written by an export, in order
+EXPORT_COLUMNS = [
+    'checkup_date', 's_id', 'last_name', 'first_name', 'department', 'year_level',
+    'school_year', 'weight', 'height', 'bmi', 'health_category', 'systolic_bp',
+    'diastolic_bp', 'bp_status', 'temperature', 'vision', 'urine_test',
+]
+
+# Database columns fetched for each record; bmi, category and BP status are SQL annotations
+_QUERY_FIELDS = [
+    'checkup_date', 'student__s_id', 'student__last_name', 'student__first_name',
+    'student__department', 'student__year_level', 'school_year', 'weight', 'height',
+    'bmi_value', 'health_category_value', 'systolic_bp', 'diastolic_bp',
+    'bp_status_value', 'temperature', 'vision', 'urine_test',
+]
+
+# Leading characters that make spreadsheet programs evaluate a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """Pseudo-buffer whose write() hands the line back, so csv.writer can feed a generator"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(records, chunk_size=None):
+    """
+    Yield one dict per record of `records`, in EXPORT_COLUMNS order.
+
+    Rows are read with a server-side cursor `chunk_size` at a time as plain
+    tuples, so memory use stays flat however many records are exported.
+    """
+    chunk_size = chunk_size or getattr(settings, 'HEALTH_EXPORT_CHUNK_SIZE', 2000)
+    rows = (
+        records.with_health_category()
+        .with_bp_status()
+        .order_by('-checkup_date', '-id')
+        .values_list(*_QUERY_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        values = dict(zip(_QUERY_FIELDS, row))
+        yield {
+            'checkup_date': values['checkup_date'].isoformat(),
+            's_id': values['student__s_id'],
+            'last_name': values['student__last_name'],
+            'first_name': values['student__first_name'],
+            'department': values['student__department'],
+            'year_level': values['student__year_level'],
+            'school_year': values['school_year'],
+            'weight': str(values['weight']),
+            'height': str(values['height']),
+            'bmi': values['bmi_value'],
+            'health_category': values['health_category_value'],
+            'systolic_bp': values['systolic_bp'],
+            'diastolic_bp': values['diastolic_bp'],
+            'bp_status': values['bp_status_value'],
+            'temperature': str(values['temperature']),
+            'vision': values['vision'],
+            'urine_test': values['urine_test'],
+        }
+
+
+def csv_cell(value):
+    """A value as written to the CSV; text a spreadsheet would evaluate as a formula gets a leading quote"""
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(records, chunk_size=None):
+    """Yield the export as CSV lines, header first"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in export_rows(records, chunk_size):
+        yield writer.writerow([csv_cell(row[column]) for column in EXPORT_COLUMNS])
+
+
+def stream_ndjson(records, chunk_size=None):
+    """Yield the export as newline-delimited JSON, one object per record"""
+    for row in export_rows(records, chunk_size):
+        yield json.dumps(row) + '\n'
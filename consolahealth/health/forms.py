@@ -2,14 +2,29 @@ from django import forms
 from .models import HealthRecord
 from students.models import Student
 
+class StudentPickerWidget(forms.Widget):
+    """Search-as-you-type student picker; only the selected student is ever loaded"""
+    template_name = 'health/widgets/student_picker.html'
+    
+    class Media:
+        js = ('student_picker.js',)
+    
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        student = Student.objects.filter(pk=value).first() if value else None
+        context['widget']['label'] = f"{student.first_name} {student.last_name} ({student.s_id})" if student else ''
+        return context
+
+
 class HealthRecordForm(forms.ModelForm):
     """Form for recording health check-ups with Bootstrap 5 styling"""
     
+    # Validation looks up only the submitted student (queryset.get(pk=...))
     student = forms.ModelChoiceField(
         queryset=Student.objects.all(),
-        widget=forms.Select(attrs={
-            'class': 'form-select',
-            'placeholder': 'Select Student'
+        widget=StudentPickerWidget(attrs={
+            'class': 'form-control',
+            'placeholder': 'Search by name or Student ID'
         }),
         label="Student"
     )
@@ -81,3 +96,20 @@ class StudentSearchForm(forms.Form):
         }),
         label="Search Student"
     )
+
+
+class HealthRecordImportUploadForm(forms.Form):
+    """Upload form for bulk importing check-ups from a CSV or XLSX file"""
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.xlsx',
+        }),
+        label="Check-up file (CSV or XLSX)"
+    )
+    
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError("Upload a .csv or .xlsx file.")
+        return file
@@ -0,0 +1,142 @@
+import csv
+import io
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from consolahealth import analytics_cache
+from students.models import Student
+from .forms import HealthRecordForm
+from .models import HealthRecord, HealthYearSummary
+
+# Columns expected in an import file; `s_id` identifies the student
+IMPORT_COLUMNS = [
+    's_id', 'weight', 'height', 'systolic_bp', 'diastolic_bp',
+    'temperature', 'vision', 'urine_test', 'school_year',
+]
+
+
+class HealthRecordImportForm(HealthRecordForm):
+    """HealthRecordForm's validation rules without the per-row student lookup"""
+
+    # The student is resolved for the whole batch by the importer
+    student = None
+
+    class Meta(HealthRecordForm.Meta):
+        fields = [field for field in HealthRecordForm.Meta.fields if field != 'student']
+
+
+class ImportResult:
+    """Outcome of an import: number of records created and per-row errors"""
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+
+def read_rows(file, filename):
+    """Yield each data row of a CSV or XLSX upload as a dict, without loading the whole file"""
+    if filename.lower().endswith('.xlsx'):
+        yield from _read_xlsx(file)
+        return
+    if isinstance(file, io.TextIOBase):
+        text = file
+    else:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    for row in csv.DictReader(text):
+        yield {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+
+
+def _read_xlsx(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise ValueError("Reading .xlsx files requires the openpyxl package.") from exc
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    header = [str(cell or '').strip().lower() for cell in next(rows, [])]
+    for values in rows:
+        # Numeric cells such as student IDs come back as floats (2024001.0)
+        values = [int(value) if isinstance(value, float) and value.is_integer() else value for value in values]
+        yield {
+            key: '' if value is None else str(value).strip()
+            for key, value in zip(header, values) if key
+        }
+    workbook.close()
+
+
+def import_health_records(rows, batch_size=None):
+    """
+    Validate and insert health records from an iterable of row dicts.
+
+    Rows are processed in batches: students are resolved with one IN query
+    per batch and valid rows are written with bulk_create inside one
+    transaction per batch. Invalid rows are reported in the result and
+    skipped; they never abort the rest of the batch.
+    """
+    batch_size = batch_size or getattr(settings, 'HEALTH_IMPORT_BATCH_SIZE', 500)
+    result = ImportResult()
+    # Row 1 is the header, so data starts on row 2
+    numbered = enumerate(rows, start=2)
+    while True:
+        batch = list(islice(numbered, batch_size))
+        if not batch:
+            break
+        _import_batch(batch, result)
+    if result.created:
+        analytics_cache.bump_version_on_commit('health')
+    return result
+
+
+def _import_batch(batch, result):
+    s_ids = set()
+    for _, row in batch:
+        try:
+            s_ids.add(int(row.get('s_id', '')))
+        except ValueError:
+            pass
+    students = Student.objects.in_bulk(s_ids, field_name='s_id')
+
+    records = []
+    for row_number, row in batch:
+        try:
+            student = students.get(int(row.get('s_id', '')))
+        except ValueError:
+            student = None
+        if student is None:
+            result.add_error(row_number, f"Unknown student ID '{row.get('s_id', '')}'")
+            continue
+
+        data = {field: row.get(field, '') for field in IMPORT_COLUMNS if field != 's_id'}
+        if not data['urine_test']:
+            data['urine_test'] = 'pending'
+        form = HealthRecordImportForm(data)
+        if not form.is_valid():
+            errors = '; '.join(
+                f"{field}: {' '.join(messages)}" for field, messages in form.errors.items()
+            )
+            result.add_error(row_number, errors)
+            continue
+
+        record = form.save(commit=False)
+        record.student = student
+        records.append(record)
+
+    if not records:
+        return
+    # bulk_create sends no signals, so the year summary is updated here
+    with transaction.atomic():
+        HealthRecord.objects.bulk_create(records)
+        HealthYearSummary.objects.apply_many(
+            [HealthYearSummary.objects.snapshot(record) for record in records], 1
+        )
+    result.created += len(records)
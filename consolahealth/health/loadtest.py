@@ -0,0 +1,197 @@
+"""
+Concurrent check-up writes against a chosen database.
+
+Every writer thread stands for a nurse saving check-ups: each save is one
+transaction creating a HealthRecord, whose signals update the year summary
+and the analytics cache versions.
+Reader threads run the dashboard totals query meanwhile. Each thread has
+its own database connection, so the threads contend for locks exactly like
+separate server workers.
+
+The report counts saves and reads, the failed ones per error message
+("database is locked" on an untuned SQLite file) and save latencies. Run
+it once with the default settings and once with SQLITE_TUNING=0 to
+compare, or against PostgreSQL with DATABASE_ENGINE=postgresql.
+
+Everything is written to the database alias passed to run(), summary rows
+included; writes to an alias other than 'default' leave the analytics cache
+versions alone. Writers work on students created for the run, with student
+IDs above every existing one (and at least FIRST_STUDENT_ID). Only those
+students are deleted with their records afterwards, unless `keep` is set.
+
+The run adds and removes rows and holds write locks for its whole length,
+so point it at a test or scratch database (see is_scratch()), not at live
+data.
+"""
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Max
+
+from students.models import Student
+from .models import HealthRecord
+
+FIRST_STUDENT_ID = 9900000
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class LoadTestResult:
+    """Outcome of run(): counts, errors and latencies (seconds) of every thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.saved = 0
+        self.failed = 0
+        self.reads = 0
+        self.failed_reads = 0
+        self.errors = Counter()
+        self.latencies = []
+        self.elapsed = 0
+
+    def add_error(self, exc, write=True):
+        with self.lock:
+            if write:
+                self.failed += 1
+            else:
+                self.failed_reads += 1
+            self.errors[f'{type(exc).__name__}: {exc}'] += 1
+
+    def report(self, using):
+        milliseconds = [latency * 1000 for latency in self.latencies]
+        return {
+            'database': connections[using].vendor,
+            'alias': using,
+            'saved': self.saved,
+            'failed': self.failed,
+            'reads': self.reads,
+            'failed_reads': self.failed_reads,
+            'errors': dict(self.errors),
+            'elapsed_s': round(self.elapsed, 3),
+            'saves_per_s': round(self.saved / self.elapsed, 1) if self.elapsed else None,
+            'latency_ms': {
+                'median': round(statistics.median(milliseconds), 2) if milliseconds else None,
+                'p95': round(_percentile(milliseconds, 0.95), 2) if milliseconds else None,
+                'max': round(max(milliseconds), 2) if milliseconds else None,
+            },
+        }
+
+
+def is_scratch(using):
+    """
+    Whether an alias looks safe to load test: an in-memory SQLite database,
+    or a database whose name (file name for SQLite) starts with "test" or
+    contains "scratch".
+    """
+    connection = connections[using]
+    name = str(connection.settings_dict['NAME'] or '')
+    if connection.vendor == 'sqlite':
+        if connection.is_in_memory_db():
+            return True
+        name = os.path.basename(name)
+    name = name.lower()
+    return name.startswith('test') or 'scratch' in name
+
+
+def _writer(using, student, records, start, result):
+    try:
+        start.wait()
+        for index in range(records):
+            began = time.perf_counter()
+            try:
+                # One transaction per save, so a failed save leaves no record
+                # without its year summary delta
+                with transaction.atomic(using=using):
+                    HealthRecord.objects.db_manager(using).create(
+                        student=student,
+                        weight=Decimal('50') + index % 30,
+                        height=Decimal('160'),
+                        systolic_bp=110 + index % 30,
+                        diastolic_bp=70 + index % 20,
+                        temperature=Decimal('36.6'),
+                        vision='20/20',
+                        urine_test='pending',
+                        school_year='2024-2025',
+                    )
+            except DatabaseError as exc:
+                result.add_error(exc)
+                continue
+            with result.lock:
+                result.saved += 1
+                result.latencies.append(time.perf_counter() - began)
+    finally:
+        # Connections are per thread; close this one before the thread ends
+        connections[using].close()
+
+
+def _reader(using, start, done, result):
+    try:
+        start.wait()
+        while not done.is_set():
+            try:
+                HealthRecord.objects.using(using).health_summary()
+            except DatabaseError as exc:
+                result.add_error(exc, write=False)
+                continue
+            with result.lock:
+                result.reads += 1
+    finally:
+        connections[using].close()
+
+
+def _create_students(using, writers, students):
+    """Create one student per writer, appending each to `students` as soon as it exists"""
+    manager = Student.objects.db_manager(using)
+    highest = manager.aggregate(highest=Max('s_id'))['highest']
+    first = max(FIRST_STUDENT_ID, (highest or 0) + 1)
+    for index in range(writers):
+        students.append(manager.create(
+            s_id=first + index,
+            first_name='Load',
+            last_name=f'Test{index}',
+            address='Load test',
+            department=Student.DEPARTMENT_CHOICES[index % len(Student.DEPARTMENT_CHOICES)][0],
+            year_level='1',
+        ))
+
+
+def run(using, writers=8, records=50, readers=2, keep=False):
+    """Save `records` check-ups from each of `writers` threads at once on `using`; returns the report dict"""
+    students = []
+    result = LoadTestResult()
+    try:
+        _create_students(using, writers, students)
+        start = threading.Barrier(writers + readers + 1)
+        done = threading.Event()
+        writer_threads = [
+            threading.Thread(target=_writer, args=(using, student, records, start, result)) for student in students
+        ]
+        reader_threads = [
+            threading.Thread(target=_reader, args=(using, start, done, result)) for _ in range(readers)
+        ]
+        for thread in writer_threads + reader_threads:
+            thread.start()
+
+        start.wait()
+        began = time.perf_counter()
+        for thread in writer_threads:
+            thread.join()
+        result.elapsed = time.perf_counter() - began
+        done.set()
+        for thread in reader_threads:
+            thread.join()
+    finally:
+        # Only the students of this run, even when it failed halfway
+        if students and not keep:
+            Student.objects.using(using).filter(pk__in=[student.pk for student in students]).delete()
+    return {'writers': writers, 'records': records, 'readers': readers, **result.report(using)}
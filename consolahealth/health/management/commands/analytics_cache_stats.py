@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from consolahealth import analytics_cache
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counters of the analytics cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Reset the counters after printing them")
+
+    def handle(self, *args, **options):
+        stats = analytics_cache.stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}  misses: {stats['misses']}  hit ratio: {stats['hit_ratio']:.2%}"
+        )
+        if options['reset']:
+            analytics_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from health import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Time the main pages (wall time and query count) against the current database and write a JSON report"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Warm requests per scenario (default: 5)")
+        parser.add_argument('--only', action='append', default=[], metavar='NAME', help="Run only this scenario (repeatable)")
+        parser.add_argument('--output', default='benchmark.json', help="Report file, or - for standard output (default: benchmark.json)")
+        parser.add_argument('--compare', metavar='PATH', help="Earlier report to compare the warm medians with")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1.")
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+
+        report = benchmarks.run(repeat=options['repeat'], only=options['only'])
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+
+        self.stderr.write(f"{report['students']} students, {report['records']} records, commit {report['commit'] or 'unknown'}")
+        for result in report['results']:
+            self.stderr.write(
+                f"{result['name']:<28} {result['status']}  cold {result['cold']['ms']:>9.2f} ms "
+                f"{result['cold']['queries']:>3} q   warm median {result['warm']['median_ms']:>9.2f} ms "
+                f"{result['warm']['queries']:>3} q"
+            )
+        if report['hydration']:
+            before = (baseline or {}).get('hydration')
+            self.stderr.write(
+                f"{'hydration':<28} {report['hydration']['us_per_row']:.3f} us/row"
+                + (f" (was {before['us_per_row']:.3f})" if before else "")
+            )
+        if baseline:
+            self.stderr.write(f"Compared with commit {baseline.get('commit') or 'unknown'}:")
+            for row in benchmarks.compare(report, baseline):
+                change = 'n/a' if row['change_pct'] is None else f"{row['change_pct']:+.1f}%"
+                self.stderr.write(
+                    f"{row['name']:<28} {row['before_ms']:>9.2f} -> {row['after_ms']:>9.2f} ms ({change})  "
+                    f"queries {row['before_queries']} -> {row['after_queries']}"
+                )
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from health.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = "Create synthetic students and health records (e.g. --records 50000) for development and benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=1000, help="Health records to create (default: 1000)")
+        parser.add_argument('--students', type=int, default=None, help="Students to create (default: a quarter of --records)")
+        parser.add_argument('--years', type=int, default=4, help="Recent school years the records are spread over (default: 4)")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows per transaction (default: HEALTH_IMPORT_BATCH_SIZE)")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed; the same seed creates the same data")
+
+    def handle(self, *args, **options):
+        records = options['records']
+        students = options['students'] if options['students'] is not None else max(records // 4, 1)
+        if records < 0 or students < 0 or options['years'] < 1:
+            raise CommandError("--records and --students cannot be negative and --years must be at least 1.")
+        try:
+            result = generate(students, records, years=options['years'], batch_size=options['batch_size'], seed=options['seed'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.students} student(s) and {result.records} health record(s) "
+            f"for {', '.join(result.school_years)}."
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from health.importers import import_health_records, read_rows
+
+
+class Command(BaseCommand):
+    help = "Import health check-ups from a CSV or XLSX file (columns: s_id, weight, height, ...)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or XLSX file to import")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows per transaction (default: HEALTH_IMPORT_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                result = import_health_records(read_rows(file, path), batch_size=options['batch_size'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for row_number, message in result.errors:
+            self.stderr.write(f"Row {row_number}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} health record(s); {result.failed} row(s) skipped."
+        ))
@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from consolahealth.routers import replica_alias
+
+from health import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Save check-ups from several threads at once against a test or scratch database "
+        "and report failures and latency"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', help="Database alias to load test (required); it should be a test or scratch database",
+        )
+        parser.add_argument(
+            '--i-know', action='store_true',
+            help="Run even though --database does not look like a test or scratch database",
+        )
+        parser.add_argument('--writers', type=int, default=8, help="Concurrent writer threads (default: 8)")
+        parser.add_argument('--records', type=int, default=50, help="Check-ups saved per writer (default: 50)")
+        parser.add_argument('--readers', type=int, default=2, help="Threads reading the dashboard totals meanwhile (default: 2)")
+        parser.add_argument('--keep', action='store_true', help="Keep the load test students and check-ups")
+        parser.add_argument('--output', help="Also write the report as JSON to this file")
+
+    def handle(self, *args, **options):
+        if options['writers'] < 1 or options['records'] < 1 or options['readers'] < 0:
+            raise CommandError("--writers and --records must be at least 1, --readers at least 0.")
+        using = options['database']
+        if not using:
+            raise CommandError("Name the database to load test with --database.")
+        if using not in connections:
+            raise CommandError(f"Unknown database alias {using!r}.")
+        if using == replica_alias():
+            raise CommandError(f"{using!r} is the read replica; load test the database it replicates.")
+        if not loadtest.is_scratch(using) and not options['i_know']:
+            raise CommandError(
+                f"{using!r} does not look like a test or scratch database; the load test writes to it "
+                "and holds its write locks. Pass --i-know to run it anyway."
+            )
+
+        report = loadtest.run(
+            using,
+            writers=options['writers'], records=options['records'],
+            readers=options['readers'], keep=options['keep'],
+        )
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+
+        latency = report['latency_ms']
+        self.stdout.write(
+            f"{report['database']}: {report['saved']} saved, {report['failed']} failed, "
+            f"{report['reads']} reads ({report['failed_reads']} failed) in {report['elapsed_s']} s ({report['saves_per_s']} saves/s)"
+        )
+        self.stdout.write(f"Save latency: median {latency['median']} ms, p95 {latency['p95']} ms, max {latency['max']} ms")
+        for message, count in report['errors'].items():
+            self.stdout.write(self.style.ERROR(f"{count} x {message}"))
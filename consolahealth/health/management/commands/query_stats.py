@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from consolahealth import instrumentation
+
+
+class Command(BaseCommand):
+    help = "Show per-view query counts, SQL time and slowest statements of sampled requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Reset the figures after printing them")
+
+    def handle(self, *args, **options):
+        stats = instrumentation.stats()
+        if not stats:
+            self.stdout.write("No requests recorded yet.")
+        # Views spending the most time in SQL first
+        for view, values in sorted(stats.items(), key=lambda item: -item[1]['sql_ms']):
+            self.stdout.write(
+                f"{view}: {values['requests']} requests  avg queries: {values['avg_queries']}  "
+                f"max queries: {values['max_queries']}  sql: {values['sql_ms']:.1f} ms  "
+                f"total: {values['total_ms']:.1f} ms"
+            )
+            for duration, sql in values['slowest']:
+                self.stdout.write(f"    {duration:.2f} ms  {sql}")
+        if options['reset']:
+            instrumentation.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Figures reset."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from health.models import HealthYearSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per school year / department health summary from all health records"
+
+    def handle(self, *args, **options):
+        rows = HealthYearSummary.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(rows)} health summary row(s)."))
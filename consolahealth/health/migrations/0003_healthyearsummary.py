@@ -0,0 +1,80 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:38
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def populate_summary(apps, schema_editor):
+    """Fill the summary from the health records that already exist"""
+    HealthRecord = apps.get_model('health', 'HealthRecord')
+    HealthYearSummary = apps.get_model('health', 'HealthYearSummary')
+
+    buckets = {}
+    records = HealthRecord.objects.values_list('school_year', 'student__department', 'student_id', 'weight', 'height')
+    for school_year, department, student_id, weight, height in records.iterator():
+        bucket = buckets.setdefault((school_year, department), {
+            'students': set(), 'record_count': 0, 'weight_sum': Decimal('0'),
+            'bmi_sum': Decimal('0'), 'bmi_count': 0, 'underweight_count': 0,
+            'normal_count': 0, 'overweight_count': 0, 'obese_count': 0,
+        })
+        bucket['students'].add(student_id)
+        bucket['record_count'] += 1
+        bucket['weight_sum'] += weight
+        height_m = float(height) / 100
+        if height_m <= 0:
+            continue
+        bmi = round(float(weight) / (height_m ** 2), 2)
+        if bmi:
+            bucket['bmi_sum'] += Decimal(str(bmi))
+            bucket['bmi_count'] += 1
+        if bmi < 18.5:
+            bucket['underweight_count'] += 1
+        elif bmi < 25:
+            bucket['normal_count'] += 1
+        elif bmi < 30:
+            bucket['overweight_count'] += 1
+        else:
+            bucket['obese_count'] += 1
+
+    HealthYearSummary.objects.bulk_create([
+        HealthYearSummary(
+            school_year=school_year, department=department,
+            student_count=len(bucket.pop('students')), **bucket,
+        )
+        for (school_year, department), bucket in buckets.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0002_alter_healthrecord_school_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthYearSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('school_year', models.CharField(blank=True, max_length=9, null=True)),
+                ('department', models.CharField(choices=[('BSIT', 'Bachelor of Science in Information Technology'), ('BSED', 'Bachelor of Secondary Education'), ('BEED', 'Bachelor of Elementary Education'), ('BSHM', 'Bachelor of Science in Hospitality Management'), ('BPEd', 'Bachelor of Physical Education'), ('BSEntrep', 'Bachelor of Science in Entrepreneurship')], max_length=10)),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('student_count', models.PositiveIntegerField(default=0)),
+                ('weight_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('bmi_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('bmi_count', models.PositiveIntegerField(default=0)),
+                ('underweight_count', models.PositiveIntegerField(default=0)),
+                ('normal_count', models.PositiveIntegerField(default=0)),
+                ('overweight_count', models.PositiveIntegerField(default=0)),
+                ('obese_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Health Year Summary',
+                'verbose_name_plural': 'Health Year Summaries',
+                'ordering': ['school_year', 'department'],
+                'unique_together': {('school_year', 'department')},
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0003_healthyearsummary'),
+        ('students', '0002_student_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['-checkup_date', '-id'], name='health_rec_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['school_year', '-checkup_date', '-id'], name='health_rec_year_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['student', '-checkup_date'], name='health_rec_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['school_year', 'student'], name='health_rec_year_student_idx'),
+        ),
+    ]
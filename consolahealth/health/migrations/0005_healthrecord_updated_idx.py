@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0004_healthrecord_indexes'),
+        ('students', '0004_student_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='healthrecord',
+            index=models.Index(fields=['last_updated'], name='health_rec_updated_idx'),
+        ),
+    ]
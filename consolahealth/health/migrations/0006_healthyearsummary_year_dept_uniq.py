@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:40
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0005_healthrecord_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='healthyearsummary',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('school_year', models.Value('')), models.F('department'), name='health_summary_year_dept_uniq'),
+        ),
+    ]
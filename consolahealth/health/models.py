@@ -1,7 +1,158 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+from django.db.models.query_utils import DeferredAttribute
+from django.utils.functional import cached_property
 from students.models import Student
 from decimal import Decimal
 
+
+def bmi_expression():
+    """BMI computed in SQL, rounded the same way as HealthRecord.bmi"""
+    # Cast to float so SQLite does not fall back to integer division
+    weight = Cast('weight', FloatField())
+    height_m = Cast(NullIf('height', Value(0)), FloatField()) / Value(100.0)
+    return Round(weight / (height_m * height_m), 2, output_field=FloatField())
+
+
+def health_category_expression(bmi='bmi_value'):
+    """Health category computed in SQL from an annotated BMI column"""
+    return Case(
+        When(**{f'{bmi}__isnull': True}, then=Value('unknown')),
+        When(**{f'{bmi}__lt': 18.5}, then=Value('underweight')),
+        When(**{f'{bmi}__lt': 25}, then=Value('normal')),
+        When(**{f'{bmi}__lt': 30}, then=Value('overweight')),
+        default=Value('obese'),
+        output_field=models.CharField(),
+    )
+
+
+BP_STATUSES = ['Normal', 'Elevated', 'Stage 1 Hypertension', 'Stage 2 Hypertension']
+
+
+def blood_pressure_status(systolic, diastolic):
+    """Blood pressure status for a systolic/diastolic reading"""
+    if systolic < 120 and diastolic < 80:
+        return 'Normal'
+    elif systolic < 130 and diastolic < 80:
+        return 'Elevated'
+    elif systolic < 140 and diastolic < 90:
+        return 'Stage 1 Hypertension'
+    else:
+        return 'Stage 2 Hypertension'
+
+
+def blood_pressure_status_expression():
+    """Blood pressure status computed in SQL, with the thresholds of blood_pressure_status()"""
+    return Case(
+        When(systolic_bp__lt=120, diastolic_bp__lt=80, then=Value(BP_STATUSES[0])),
+        When(systolic_bp__lt=130, diastolic_bp__lt=80, then=Value(BP_STATUSES[1])),
+        When(systolic_bp__lt=140, diastolic_bp__lt=90, then=Value(BP_STATUSES[2])),
+        default=Value(BP_STATUSES[3]),
+        output_field=models.CharField(),
+    )
+
+
+class HealthRecordQuerySet(models.QuerySet):
+    """QuerySet exposing the derived health metrics as database annotations"""
+
+    def with_bmi(self):
+        return self.annotate(bmi_value=bmi_expression())
+
+    def with_health_category(self):
+        qs = self if 'bmi_value' in self.query.annotations else self.with_bmi()
+        return qs.annotate(health_category_value=health_category_expression())
+
+    def with_bp_status(self):
+        return self.annotate(bp_status_value=blood_pressure_status_expression())
+
+    def _bp_status_rows(self):
+        return (
+            self.with_bp_status()
+            .order_by()
+            .values('school_year', 'student__department')
+            .annotate(**{
+                f'bp_{index}': Count('pk', filter=Q(bp_status_value=status))
+                for index, status in enumerate(BP_STATUSES)
+            })
+            .order_by('school_year', 'student__department')
+        )
+
+    def _bp_status_row(self, row):
+        return {
+            'school_year': row['school_year'],
+            'department': row['student__department'],
+            'counts': {status: row[f'bp_{index}'] for index, status in enumerate(BP_STATUSES)},
+        }
+
+    def bp_status_distribution(self):
+        """Records per blood pressure status for each school year and department, from a single GROUP BY query"""
+        return [self._bp_status_row(row) for row in self._bp_status_rows()]
+
+    async def abp_status_distribution(self):
+        return [self._bp_status_row(row) async for row in self._bp_status_rows()]
+
+    def _metric_aggregates(self):
+        aggregates = {
+            'avg_bmi': Avg('bmi_value', filter=Q(bmi_value__gt=0)),
+        }
+        for code, _ in HealthRecord.HEALTH_CATEGORY_CHOICES:
+            aggregates[code] = Count('pk', filter=Q(health_category_value=code))
+        return aggregates
+
+    def _summary_row(self, row):
+        return {
+            'avg_bmi': round(row['avg_bmi'], 2) if row['avg_bmi'] else 0,
+            'health_distribution': {
+                code: row[code] for code, _ in HealthRecord.HEALTH_CATEGORY_CHOICES
+            },
+        }
+
+    def health_summary(self):
+        """Average BMI and category distribution in a single aggregate query"""
+        result = self.with_health_category().aggregate(**self._metric_aggregates())
+        return self._summary_row(result)
+
+
+class MeasurementAttribute(DeferredAttribute):
+    """
+    Descriptor of a measurement field. Assignments, including the ones made
+    while loading a row, drop the metrics the model derives from it
+    (METRIC_DEPENDENCIES); assignments to other fields cost nothing extra.
+    """
+
+    def __init__(self, field):
+        super().__init__(field)
+        self.attname = field.attname
+        self.dependents = field.model.METRIC_DEPENDENCIES[field.attname]
+
+    def __set__(self, instance, value):
+        data = instance.__dict__
+        data[self.attname] = value
+        # Nothing is derived yet while a row is being loaded
+        if not data.keys().isdisjoint(self.dependents):
+            for attr in self.dependents:
+                data.pop(attr, None)
+
+
+class MeasurementFieldMixin:
+    """A model field accessed through MeasurementAttribute"""
+    descriptor_class = MeasurementAttribute
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        # Same column as the Django field it extends, so migrations see that field
+        return name, f'django.db.models.{type(self).__bases__[-1].__name__}', args, kwargs
+
+
+class MeasurementDecimalField(MeasurementFieldMixin, models.DecimalField):
+    pass
+
+
+class MeasurementIntegerField(MeasurementFieldMixin, models.IntegerField):
+    pass
+
+
 class HealthRecord(models.Model):
     """Health Record for students with vital signs and measurements"""
     
@@ -22,12 +173,12 @@ class HealthRecord(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='health_records')
     
     # Measurements
-    weight = models.DecimalField(max_digits=5, decimal_places=2, help_text="Weight in kg")
-    height = models.DecimalField(max_digits=5, decimal_places=2, help_text="Height in cm")
+    weight = MeasurementDecimalField(max_digits=5, decimal_places=2, help_text="Weight in kg")
+    height = MeasurementDecimalField(max_digits=5, decimal_places=2, help_text="Height in cm")
     
     # Vital Signs
-    systolic_bp = models.IntegerField(help_text="Systolic Blood Pressure (mmHg)")
-    diastolic_bp = models.IntegerField(help_text="Diastolic Blood Pressure (mmHg)")
+    systolic_bp = MeasurementIntegerField(help_text="Systolic Blood Pressure (mmHg)")
+    diastolic_bp = MeasurementIntegerField(help_text="Diastolic Blood Pressure (mmHg)")
     temperature = models.DecimalField(max_digits=4, decimal_places=1, help_text="Temperature in °C")
     
     # Health Tests
@@ -38,49 +189,278 @@ class HealthRecord(models.Model):
     school_year = models.CharField(max_length=9, blank=True, null=True, help_text="e.g., 2024-2025")
     checkup_date = models.DateTimeField(auto_now_add=True)
     last_updated = models.DateTimeField(auto_now=True)
+
+    objects = HealthRecordQuerySet.as_manager()
     
     class Meta:
         ordering = ['-checkup_date']
         verbose_name = 'Health Record'
         verbose_name_plural = 'Health Records'
+        indexes = [
+            # Newest-first listing and keyset pagination (AllRecordsView, recent check-ups)
+            models.Index(fields=['-checkup_date', '-id'], name='health_rec_date_id_idx'),
+            # School year filter on AllRecordsView, ordered by date
+            models.Index(fields=['school_year', '-checkup_date', '-id'], name='health_rec_year_date_idx'),
+            # Per-student history ordered by date (StudentHealthHistoryView)
+            models.Index(fields=['student', '-checkup_date'], name='health_rec_student_date_idx'),
+            # Covers the distinct-student counts per school year
+            models.Index(fields=['school_year', 'student'], name='health_rec_year_student_idx'),
+            # Latest modification time for conditional GET validators
+            models.Index(fields=['last_updated'], name='health_rec_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.first_name} {self.student.last_name} - {self.school_year}"
     
-    @property
+    # bmi, health_category and bp_status are computed once per instance.
+    # Assigning a measurement drops what was derived from it, including the
+    # annotations of a with_*() queryset, so edits are never stale (see
+    # MeasurementAttribute, the descriptor of these Measurement*Fields).
+    METRIC_DEPENDENCIES = {
+        'weight': ('bmi', 'health_category', 'bmi_value', 'health_category_value'),
+        'height': ('bmi', 'health_category', 'bmi_value', 'health_category_value'),
+        'systolic_bp': ('bp_status', 'bp_status_value'),
+        'diastolic_bp': ('bp_status', 'bp_status_value'),
+    }
+
+    @cached_property
     def bmi(self):
         """Calculate BMI (Body Mass Index) = weight(kg) / (height(m))^2"""
+        # Precomputed by with_bmi() / with_health_category()
+        if 'bmi_value' in self.__dict__:
+            return self.bmi_value
         height_m = float(self.height) / 100  # Convert cm to meters
         if height_m > 0:
             bmi_value = float(self.weight) / (height_m ** 2)
             return round(bmi_value, 2)
         return None
     
-    @property
+    @cached_property
     def health_category(self):
         """Determine health category based on BMI"""
-        if self.bmi is None:
+        if 'health_category_value' in self.__dict__:
+            return self.health_category_value
+        bmi = self.bmi
+        if bmi is None:
             return 'unknown'
-        if self.bmi < 18.5:
+        if bmi < 18.5:
             return 'underweight'
-        elif 18.5 <= self.bmi < 25:
+        elif bmi < 25:
             return 'normal'
-        elif 25 <= self.bmi < 30:
+        elif bmi < 30:
             return 'overweight'
         else:
             return 'obese'
     
-    @property
+    @cached_property
     def bp_status(self):
         """Determine blood pressure status"""
-        systolic = self.systolic_bp
-        diastolic = self.diastolic_bp
-        
-        if systolic < 120 and diastolic < 80:
-            return 'Normal'
-        elif systolic < 130 and diastolic < 80:
-            return 'Elevated'
-        elif systolic < 140 and diastolic < 90:
-            return 'Stage 1 Hypertension'
-        else:
-            return 'Stage 2 Hypertension'
+        if 'bp_status_value' in self.__dict__:
+            return self.bp_status_value
+        return blood_pressure_status(self.systolic_bp, self.diastolic_bp)
+
+
+class HealthYearSummaryQuerySet(models.QuerySet):
+    """Maintenance and read helpers for the precomputed per-year summary"""
+
+    CATEGORY_FIELDS = {
+        'underweight': 'underweight_count',
+        'normal': 'normal_count',
+        'overweight': 'overweight_count',
+        'obese': 'obese_count',
+    }
+
+    @staticmethod
+    def snapshot(record):
+        """The parts of a HealthRecord that contribute to its summary row"""
+        bmi = record.bmi
+        return {
+            'school_year': record.school_year,
+            'department': record.student.department,
+            'student_id': record.student_id,
+            'weight': Decimal(record.weight),
+            'bmi': Decimal(str(bmi)) if bmi else None,
+            'category': record.health_category,
+        }
+
+    @property
+    def _write_db(self):
+        """Alias the maintenance writes go to: the one of db_manager()/using(), else the primary"""
+        return self._db or router.db_for_write(self.model, **self._hints)
+
+    def apply(self, snapshot, sign):
+        """Add (sign=1) or remove (sign=-1) one record's contribution"""
+        self.apply_many([snapshot], sign)
+
+    def apply_many(self, snapshots, sign):
+        """Apply several records' contributions with one UPDATE per affected row"""
+        using = self._write_db
+        with transaction.atomic(using=using):
+            buckets = {}
+            for snapshot in snapshots:
+                delta = buckets.setdefault((snapshot['school_year'], snapshot['department']), {
+                    'record_count': 0, 'weight_sum': Decimal('0'), 'bmi_sum': Decimal('0'), 'bmi_count': 0,
+                    **{field: 0 for field in self.CATEGORY_FIELDS.values()},
+                })
+                delta['record_count'] += 1
+                delta['weight_sum'] += snapshot['weight']
+                if snapshot['bmi']:
+                    delta['bmi_sum'] += snapshot['bmi']
+                    delta['bmi_count'] += 1
+                category_field = self.CATEGORY_FIELDS.get(snapshot['category'])
+                if category_field:
+                    delta[category_field] += 1
+
+            for (school_year, department), delta in buckets.items():
+                if sign > 0:
+                    self.using(using).get_or_create(school_year=school_year, department=department)
+                self.using(using).filter(school_year=school_year, department=department).update(**{
+                    field: F(field) + sign * value for field, value in delta.items() if value
+                })
+                self.using(using).refresh_student_count(school_year, department)
+
+    def refresh_student_count(self, school_year, department):
+        """Distinct students cannot be maintained by deltas; recount the one bucket"""
+        using = self._write_db
+        student_count = (
+            HealthRecord.objects.using(using)
+            .filter(school_year=school_year, student__department=department)
+            .values('student').distinct().count()
+        )
+        rows = self.using(using).filter(school_year=school_year, department=department)
+        rows.update(student_count=student_count)
+        rows.filter(record_count=0).delete()
+
+    def rebuild(self, departments=None, school_years=None):
+        """Recompute the summary from HealthRecord, optionally for some departments and/or school years only"""
+        using = self._write_db
+        with transaction.atomic(using=using):
+            records = HealthRecord.objects.using(using)
+            existing = self.using(using)
+            if departments is not None:
+                records = records.filter(student__department__in=departments)
+                existing = existing.filter(department__in=departments)
+            if school_years is not None:
+                # __in never matches NULL, the year of records saved without one
+                years = Q(school_year__in=[year for year in school_years if year is not None])
+                if None in school_years:
+                    years |= Q(school_year__isnull=True)
+                records = records.filter(years)
+                existing = existing.filter(years)
+            existing.delete()
+
+            aggregates = {
+                field: Count('pk', filter=Q(health_category_value=code))
+                for code, field in self.CATEGORY_FIELDS.items()
+            }
+            rows = (
+                records.with_health_category()
+                .order_by()
+                .values('school_year', 'student__department')
+                .annotate(
+                    record_count=Count('pk'),
+                    student_count=Count('student', distinct=True),
+                    weight_sum=Sum('weight'),
+                    bmi_sum=Sum('bmi_value', filter=Q(bmi_value__gt=0)),
+                    bmi_count=Count('pk', filter=Q(bmi_value__gt=0)),
+                    **aggregates,
+                )
+            )
+            summaries = []
+            for row in rows:
+                row['department'] = row.pop('student__department')
+                row['weight_sum'] = row['weight_sum'] or Decimal('0')
+                row['bmi_sum'] = Decimal(str(round(row['bmi_sum'] or 0, 2)))
+                summaries.append(self.model(**row))
+            return self.using(using).bulk_create(summaries)
+
+    def _totals_aggregates(self):
+        return {
+            'bmi_sum': Sum('bmi_sum'),
+            'bmi_count': Sum('bmi_count'),
+            **{code: Sum(field) for code, field in self.CATEGORY_FIELDS.items()},
+        }
+
+    def _health_summary(self, totals):
+        bmi_count = totals['bmi_count'] or 0
+        return {
+            'avg_bmi': round(float(totals['bmi_sum']) / bmi_count, 2) if bmi_count else 0,
+            'health_distribution': {code: totals[code] or 0 for code in self.CATEGORY_FIELDS},
+        }
+
+    def health_summary(self):
+        """Same shape as HealthRecordQuerySet.health_summary(), read from the summary"""
+        return self._health_summary(self.aggregate(**self._totals_aggregates()))
+
+    async def ahealth_summary(self):
+        return self._health_summary(await self.aaggregate(**self._totals_aggregates()))
+
+    def _year_rows(self):
+        return (
+            self.order_by()
+            .values('school_year')
+            .annotate(
+                records=Sum('record_count'),
+                students=Sum('student_count'),
+                weight_total=Sum('weight_sum'),
+                bmi_total=Sum('bmi_sum'),
+                bmis=Sum('bmi_count'),
+                **{code: Sum(field) for code, field in self.CATEGORY_FIELDS.items()},
+            )
+            .order_by('school_year')
+        )
+
+    def _year_summary(self, row):
+        return {
+            'school_year': row['school_year'],
+            'avg_weight': float(row['weight_total']) / row['records'] if row['records'] else 0,
+            'avg_bmi': round(float(row['bmi_total']) / row['bmis'], 2) if row['bmis'] else 0,
+            'student_count': row['students'],
+            'health_distribution': {code: row[code] for code in self.CATEGORY_FIELDS},
+        }
+
+    def school_year_summary(self):
+        """
+        Per school year: average weight, average BMI, distinct students and
+        category distribution, from a single GROUP BY query over the summary.
+        """
+        return [self._year_summary(row) for row in self._year_rows()]
+
+    async def aschool_year_summary(self):
+        return [self._year_summary(row) async for row in self._year_rows()]
+
+
+class HealthYearSummary(models.Model):
+    """Precomputed health totals per school year and department, kept in sync by signals"""
+
+    school_year = models.CharField(max_length=9, blank=True, null=True)
+    department = models.CharField(max_length=10, choices=Student.DEPARTMENT_CHOICES)
+
+    record_count = models.PositiveIntegerField(default=0)
+    student_count = models.PositiveIntegerField(default=0)
+    weight_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    bmi_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    bmi_count = models.PositiveIntegerField(default=0)
+
+    underweight_count = models.PositiveIntegerField(default=0)
+    normal_count = models.PositiveIntegerField(default=0)
+    overweight_count = models.PositiveIntegerField(default=0)
+    obese_count = models.PositiveIntegerField(default=0)
+
+    objects = HealthYearSummaryQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['school_year', 'department']
+        unique_together = [('school_year', 'department')]
+        constraints = [
+            # unique_together lets NULL years repeat; concurrent first saves of
+            # records without a year would create duplicate rows
+            models.UniqueConstraint(
+                Coalesce('school_year', Value('')), 'department', name='health_summary_year_dept_uniq',
+            ),
+        ]
+        verbose_name = 'Health Year Summary'
+        verbose_name_plural = 'Health Year Summaries'
+
+    def __str__(self):
+        return f"{self.school_year} - {self.department} ({self.record_count} records)"
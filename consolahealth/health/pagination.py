@@ -0,0 +1,163 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# Largest primary key a cursor may carry (BigAutoField); larger values
+# overflow the database driver
+MAX_CURSOR_PK = 2 ** 63 - 1
+
+
+class KeysetPage:
+    """One page of results from KeysetPaginator"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a queryset ordered newest first by a datetime
+    field, with the primary key as a tie-breaker.
+
+    Unlike OFFSET pagination, every page is fetched with an indexed range
+    condition, so deep pages cost the same as the first one.
+    """
+
+    def __init__(self, queryset, page_size, field='checkup_date'):
+        self.queryset = queryset
+        self.page_size = page_size
+        self.field = field
+
+    def encode_cursor(self, obj):
+        raw = f"{getattr(obj, self.field).isoformat()}|{obj.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Return (value, pk) for a cursor, or None if it is malformed"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            value, pk = raw.rsplit('|', 1)
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (ValueError, binascii.Error, UnicodeError):
+            return None
+        if value is None or not 0 <= pk <= MAX_CURSOR_PK:
+            return None
+        return value, pk
+
+    def page(self, after=None, before=None):
+        """Return the page following `after`, preceding `before`, or the first page"""
+        field = self.field
+        before = self.decode_cursor(before) if before else None
+        if before:
+            value, pk = before
+            rows = list(
+                self.queryset.filter(
+                    Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+                ).order_by(field, 'pk')[:self.page_size + 1]
+            )
+            has_more = len(rows) > self.page_size
+            rows = rows[:self.page_size][::-1]
+            return KeysetPage(
+                rows,
+                next_cursor=self.encode_cursor(rows[-1]) if rows else None,
+                previous_cursor=self.encode_cursor(rows[0]) if rows and has_more else None,
+            )
+
+        queryset = self.queryset.order_by(f'-{field}', '-pk')
+        cursor = self.decode_cursor(after) if after else None
+        if cursor:
+            value, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+            )
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if rows and has_more else None,
+            previous_cursor=self.encode_cursor(rows[0]) if rows and cursor else None,
+        )
+
+
+def estimated_row_count(model, using='default'):
+    """
+    Approximate number of rows in a model's table, read from the database's
+    statistics rather than counted; None when no estimate is available.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # -1 until the table has been vacuumed or analyzed
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            # Read from the end of the rowid B-tree; overcounts by the rows deleted
+            cursor.execute(f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}")
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists of large tables. An unfiltered queryset
+    whose table holds more than HEALTH_ADMIN_EXACT_COUNT_LIMIT rows is
+    counted from the table statistics instead of with COUNT(*); filtered
+    querysets are always counted exactly.
+
+    An estimate can exceed the real row count (SQLite's counts deleted
+    rows), leaving the last pages empty. A request for an empty page counts
+    exactly and serves the real last page instead.
+    """
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate > getattr(settings, 'HEALTH_ADMIN_EXACT_COUNT_LIMIT', 100000):
+                self.estimated = True
+                return estimate
+        return super().count
+
+    def page(self, number):
+        page = super().page(number)
+        if self.estimated and page.number > 1 and not page.object_list:
+            self.estimated = False
+            self.__dict__['count'] = self.object_list.count()
+            self.__dict__.pop('num_pages', None)
+            page = super().page(min(page.number, self.num_pages))
+        return page
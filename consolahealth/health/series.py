@@ -0,0 +1,64 @@
+"""
+Chart series for a student's health history.
+
+Series are built in one pass over (checkup_date, weight, bmi) rows and can be
+downsampled for students with long histories. Downsampling uses the
+Largest-Triangle-Three-Buckets algorithm on the weight series, which keeps
+the visual shape (peaks and dips) of the line with a fraction of the points;
+the BMI series is sampled at the same check-ups so both charts share labels.
+"""
+
+
+def health_series(rows):
+    """Dates, weights and BMIs of (checkup_date, weight, bmi) rows, in the order given"""
+    dates, weights, bmis = [], [], []
+    for checkup_date, weight, bmi in rows:
+        dates.append(checkup_date.strftime('%Y-%m-%d'))
+        weights.append(float(weight))
+        bmis.append(bmi)
+    return {'dates': dates, 'weights': weights, 'bmis': bmis}
+
+
+def lttb_indices(values, threshold):
+    """Indices of at most `threshold` points of `values` chosen by Largest-Triangle-Three-Buckets"""
+    length = len(values)
+    # Below three points there is no triangle to measure; keep everything
+    if threshold >= length or threshold < 3:
+        return list(range(length))
+
+    selected = [0]
+    # The first and last points are always kept; the rest are split into buckets
+    bucket_size = (length - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_start, next_end = end, min(int((bucket + 2) * bucket_size) + 1, length)
+        if next_start >= next_end:
+            next_start, next_end = length - 1, length
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = sum(values[next_start:next_end]) / (next_end - next_start)
+
+        best, best_area = start, -1.0
+        for index in range(start, end):
+            area = abs(
+                (previous - avg_x) * (values[index] - values[previous])
+                - (previous - index) * (avg_y - values[previous])
+            )
+            if area > best_area:
+                best, best_area = index, area
+        selected.append(best)
+        previous = best
+
+    selected.append(length - 1)
+    return selected
+
+
+def downsample(series, max_points):
+    """Return `series` reduced to at most `max_points` check-ups"""
+    indices = lttb_indices(series['weights'], max_points)
+    if len(indices) == len(series['weights']):
+        return series
+    return {key: [values[index] for index in indices] for key, values in series.items()}
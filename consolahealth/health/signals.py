@@ -0,0 +1,100 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from consolahealth import analytics_cache
+from students.models import Student, students_being_deleted
+from students.signals import roster_synced
+from .models import HealthRecord, HealthYearSummary
+
+
+# --- HealthYearSummary maintenance ---
+# Each HealthRecord change is applied to the summary as a delta: the old
+# contribution is captured before the write and the new one after it, in
+# the database the record was written to.
+
+@receiver(pre_save, sender=HealthRecord)
+def capture_previous_record(sender, instance, raw=False, using=None, **kwargs):
+    if raw or instance.pk is None:
+        instance._summary_previous = None
+        return
+    previous = HealthRecord.objects.using(using).select_related('student').filter(pk=instance.pk).first()
+    instance._summary_previous = HealthYearSummary.objects.snapshot(previous) if previous else None
+
+
+@receiver(post_save, sender=HealthRecord)
+def apply_record_to_summary(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    summaries = HealthYearSummary.objects.db_manager(using)
+    previous = getattr(instance, '_summary_previous', None)
+    if previous:
+        summaries.apply(previous, -1)
+    summaries.apply(summaries.snapshot(instance), 1)
+    instance._summary_previous = None
+
+
+@receiver(post_delete, sender=HealthRecord)
+def remove_record_from_summary(sender, instance, using=None, **kwargs):
+    # Records cascading from a student deletion are handled once per student
+    deleting = students_being_deleted()
+    if deleting and instance.student_id in deleting:
+        return
+    summaries = HealthYearSummary.objects.db_manager(using)
+    summaries.apply(summaries.snapshot(instance), -1)
+
+
+# Deleting a student cascades to its records. Their post_delete signals are
+# sent after the student's pre_delete, so the student is marked there and
+# its summary groups are rebuilt once afterwards instead of one UPDATE per
+# record. The marks only live as long as the Student/StudentQuerySet
+# delete() call, so a failed cascade cannot leave one behind.
+
+@receiver(pre_delete, sender=Student)
+def capture_deleted_student(sender, instance, using=None, **kwargs):
+    deleting = students_being_deleted()
+    if deleting is None:
+        return
+    instance._summary_years = set(
+        instance.health_records.using(using).order_by().values_list('school_year', flat=True).distinct()
+    )
+    deleting.add(instance.pk)
+
+
+@receiver(post_delete, sender=Student)
+def rebuild_deleted_student_groups(sender, instance, using=None, **kwargs):
+    if getattr(instance, '_summary_years', None):
+        HealthYearSummary.objects.db_manager(using).rebuild(
+            departments=[instance.department], school_years=instance._summary_years,
+        )
+
+
+@receiver(pre_save, sender=Student)
+def capture_previous_department(sender, instance, raw=False, using=None, **kwargs):
+    instance._summary_department = None
+    if not raw and instance.pk is not None:
+        instance._summary_department = (
+            Student.objects.using(using).filter(pk=instance.pk).values_list('department', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Student)
+def move_student_between_departments(sender, instance, raw=False, using=None, **kwargs):
+    previous = getattr(instance, '_summary_department', None)
+    if raw or previous is None or previous == instance.department:
+        return
+    if instance.health_records.using(using).exists():
+        HealthYearSummary.objects.db_manager(using).rebuild(departments=[previous, instance.department])
+
+
+@receiver(roster_synced)
+def rebuild_synced_departments(sender, departments, **kwargs):
+    HealthYearSummary.objects.rebuild(departments=departments)
+    analytics_cache.bump_version_on_commit('health')
+
+
+# --- Analytics cache invalidation ---
+
+@receiver(post_save, sender=HealthRecord)
+@receiver(post_delete, sender=HealthRecord)
+def invalidate_health_analytics(sender, using=None, **kwargs):
+    analytics_cache.bump_version_on_commit('health', using=using)
@@ -0,0 +1,172 @@
+"""
+Synthetic students and check-ups for development and benchmarking.
+
+Each generated student gets a stable body profile (height, build, blood
+pressure) that drifts a little from one school year to the next, so
+histories, year-over-year changes and category distributions look like a
+real school population. Check-ups are written in batches with
+bulk_create; every batch is one mass check-up day of its school year.
+
+bulk_create sends no signals, so search tokens, the year summary and the
+analytics cache versions are updated explicitly.
+"""
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from consolahealth import analytics_cache
+from students.models import Student, StudentSearchToken
+from .models import HealthRecord, HealthYearSummary
+
+FIRST_NAMES = {
+    'M': ['Juan', 'Jose', 'Mark', 'John', 'Paolo', 'Carlo', 'Miguel', 'Angelo', 'Rafael', 'Kenneth',
+          'Joshua', 'Christian', 'Adrian', 'Nathaniel', 'Gabriel', 'Vincent', 'Jerome', 'Renz'],
+    'F': ['Maria', 'Ana', 'Kristine', 'Angelica', 'Jasmine', 'Nicole', 'Camille', 'Patricia', 'Andrea',
+          'Bea', 'Jessa', 'Erika', 'Joanna', 'Princess', 'Trisha', 'Katrina', 'Mae', 'Rhea'],
+}
+LAST_NAMES = [
+    'Santos', 'Reyes', 'Cruz', 'Bautista', 'Ocampo', 'Garcia', 'Mendoza', 'Torres', 'Tomas', 'Andrada',
+    'Castillo', 'Flores', 'Villanueva', 'Ramos', 'Castro', 'Rivera', 'Aquino', 'Navarro', 'Salazar',
+    'Mercado', 'Dela Cruz', 'Gonzales', 'Lopez', 'Morales', 'Aguilar', 'Pascual', 'Domingo', 'Soriano',
+]
+TOWNS = ['Tanauan', 'Lipa', 'Batangas City', 'Santo Tomas', 'Malvar', 'Calamba', 'Talisay', 'Balete']
+VISION_RESULTS = ['20/20', '20/20', '20/20', '20/25', '20/30', '20/40', '20/50']
+URINE_RESULTS = (['normal', 'abnormal', 'pending'], [85, 5, 10])
+
+# Measurements of a typical student, per gender: (mean, standard deviation)
+HEIGHT_CM = {'M': (166, 7), 'F': (155, 6)}
+BMI = (22.5, 4)
+SYSTOLIC = (114, 12)
+DIASTOLIC = (74, 9)
+
+
+class GenerationResult:
+    """Counts of what generate() wrote"""
+
+    def __init__(self):
+        self.students = 0
+        self.records = 0
+        self.school_years = []
+
+
+def school_years(count, today=None):
+    """The `count` most recent school years (June to May), oldest first, e.g. '2024-2025'"""
+    today = today or timezone.localdate()
+    current = today.year if today.month >= 6 else today.year - 1
+    return [f'{year}-{year + 1}' for year in range(current - count + 1, current + 1)]
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def _profile(rng, gender):
+    """Body profile of a new student: (height cm, BMI, systolic, diastolic)"""
+    return (
+        rng.gauss(*HEIGHT_CM[gender]),
+        _clamp(rng.lognormvariate(0, 0.18) * BMI[0], 14, 45),
+        rng.gauss(*SYSTOLIC),
+        rng.gauss(*DIASTOLIC),
+    )
+
+
+def _generate_students(rng, count, batch_size, result):
+    start = (Student.objects.aggregate(last=Max('s_id'))['last'] or 2020000) + 1
+    profiles = []
+    for offset in range(0, count, batch_size):
+        students = []
+        for s_id in range(start + offset, start + min(offset + batch_size, count)):
+            gender = rng.choice('MF')
+            first_name = rng.choice(FIRST_NAMES[gender])
+            last_name = rng.choice(LAST_NAMES)
+            students.append(Student(
+                s_id=s_id,
+                first_name=first_name,
+                middle_initial=rng.choice('ABCDEFGHIJKLMNOPRSTV'),
+                last_name=last_name,
+                gender=gender,
+                address=f'{rng.randint(1, 999)} Purok {rng.randint(1, 9)}, {rng.choice(TOWNS)}, Batangas',
+                email=f"{first_name}.{last_name}{s_id}@example.edu".lower().replace(' ', ''),
+                department=rng.choice(Student.DEPARTMENT_CHOICES)[0],
+                year_level=rng.choice(Student.YEAR_LEVEL_CHOICES)[0],
+            ))
+        with transaction.atomic():
+            Student.objects.bulk_create(students)
+            StudentSearchToken.objects.sync(students)
+        profiles += [(student.pk, _profile(rng, student.gender)) for student in students]
+        result.students += len(students)
+    return profiles
+
+
+def _checkup(rng, student_id, profile, school_year, year_index, day):
+    height, bmi, systolic, diastolic = profile
+    # Students grow a little and drift in build from one school year to the next
+    height += year_index * abs(rng.gauss(0.6, 0.4))
+    bmi = _clamp(bmi + year_index * rng.gauss(0.2, 0.6) + rng.gauss(0, 0.4), 13, 50)
+    weight = bmi * (height / 100) ** 2
+    return HealthRecord(
+        student_id=student_id,
+        weight=Decimal(f'{weight:.2f}'),
+        height=Decimal(f'{height:.2f}'),
+        systolic_bp=round(_clamp(systolic + rng.gauss(0, 6), 85, 190)),
+        diastolic_bp=round(_clamp(diastolic + rng.gauss(0, 5), 50, 120)),
+        temperature=Decimal(f'{_clamp(rng.gauss(36.6, 0.35), 35.5, 39.5):.1f}'),
+        vision=rng.choice(VISION_RESULTS),
+        urine_test=rng.choices(*URINE_RESULTS)[0],
+        school_year=school_year,
+    )
+
+
+def _checkup_days(rng, school_year, count):
+    """`count` random school days of a school year, in order; none in the future"""
+    start = datetime(int(school_year[:4]), 6, 1, 8, tzinfo=timezone.get_current_timezone())
+    # The current school year only has the days elapsed so far
+    days = max(min(300, (timezone.now() - start).days), 1)
+    return sorted(start + timedelta(days=rng.randrange(days), minutes=rng.randrange(480)) for _ in range(count))
+
+
+def _generate_records(rng, profiles, count, years, batch_size, result):
+    per_year = [count // len(years) + (1 if index < count % len(years) else 0) for index in range(len(years))]
+    for year_index, (school_year, year_count) in enumerate(zip(years, per_year)):
+        batches = range(0, year_count, batch_size)
+        for offset, day in zip(batches, _checkup_days(rng, school_year, len(batches))):
+            records = []
+            for _ in range(min(batch_size, year_count - offset)):
+                student_id, profile = rng.choice(profiles)
+                records.append(_checkup(rng, student_id, profile, school_year, year_index, day))
+            with transaction.atomic():
+                created = HealthRecord.objects.bulk_create(records)
+                # checkup_date is auto_now_add, so the check-up day is set afterwards
+                HealthRecord.objects.filter(pk__in=[record.pk for record in created]).update(checkup_date=day)
+            result.records += len(records)
+
+
+def generate(students, records, years=4, batch_size=None, seed=None):
+    """
+    Create `students` students and `records` check-ups spread over the last
+    `years` school years. The same seed produces the same data.
+    """
+    if records and not students and not Student.objects.exists():
+        raise ValueError("Check-ups need students; generate some students too.")
+    batch_size = batch_size or getattr(settings, 'HEALTH_IMPORT_BATCH_SIZE', 500)
+    rng = random.Random(seed)
+    result = GenerationResult()
+    result.school_years = school_years(years)
+
+    # Existing students take part in the check-ups too, with a fresh profile each
+    profiles = [
+        (pk, _profile(rng, gender)) for pk, gender in Student.objects.order_by('pk').values_list('pk', 'gender')
+    ] if records else []
+    profiles += _generate_students(rng, students, batch_size, result)
+    if students:
+        analytics_cache.bump_version('students')
+    if records:
+        _generate_records(rng, profiles, records, result.school_years, batch_size, result)
+        HealthYearSummary.objects.rebuild()
+        analytics_cache.bump_version('health')
+    return result
@@ -1 +1,1478 @@
-from django.test import TestCase
+from decimal import Decimal
+import base64
+import csv
+import json
+import math
+import statistics
+import tempfile
+from collections import Counter
+from io import StringIO
+
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.db.models import Count
+from django.db.models.signals import post_delete
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.views import View
+
+from consolahealth import analytics_cache, db, instrumentation
+from consolahealth.routers import STICKY_COOKIE
+from consolahealth.testing import QueryBudgetMixin, SQLiteDatabaseMixin, SQLiteReplicaMixin
+from students.models import Student
+from students.roster import read_roster, sync_roster
+from . import analytics, benchmarks, conditional, loadtest, views
+from .exporters import EXPORT_COLUMNS, export_rows
+from .forms import HealthRecordForm
+from .importers import import_health_records, read_rows
+from .models import HealthRecord, HealthYearSummary, blood_pressure_status
+from .pagination import EstimatedCountPaginator
+from .series import lttb_indices
+from .synthetic import generate
+
+
+def make_student(s_id, **kwargs):
+    defaults = {
+        'first_name': f'First{s_id}',
+        'last_name': f'Last{s_id}',
+        'address': 'Toledo City',
+        'department': 'BSIT',
+        'year_level': '1',
+    }
+    defaults.update(kwargs)
+    return Student.objects.create(s_id=s_id, **defaults)
+
+
+def make_record(student, weight, height, **kwargs):
+    defaults = {
+        'systolic_bp': 110,
+        'diastolic_bp': 70,
+        'temperature': Decimal('36.5'),
+        'school_year': '2024-2025',
+    }
+    defaults.update(kwargs)
+    return HealthRecord.objects.create(
+        student=student, weight=Decimal(weight), height=Decimal(height), **defaults
+    )
+
+
+class HealthMetricAnnotationTests(TestCase):
+    """Database-side BMI/category must agree with the model properties"""
+
+    @classmethod
+    def setUpTestData(cls):
+        student = make_student(1001)
+        # Covers every category plus the rounding boundaries between them
+        samples = [
+            ('45', '170'), ('53.46', '170'), ('53.45', '170'), ('65', '170'),
+            ('72.25', '170'), ('72.24', '170'), ('86.70', '170'), ('120', '165'),
+            ('65', '0'),
+        ]
+        for weight, height in samples:
+            make_record(student, weight, height)
+
+    def test_annotations_match_properties(self):
+        # Annotated instances return the annotations, so compare with plain ones
+        plain = {record.pk: record for record in HealthRecord.objects.all()}
+        for record in HealthRecord.objects.with_health_category():
+            self.assertEqual(record.bmi_value, plain[record.pk].bmi)
+            self.assertEqual(record.health_category_value, plain[record.pk].health_category)
+
+    def test_health_summary_matches_python_computation(self):
+        records = list(HealthRecord.objects.all())
+        bmis = [record.bmi for record in records if record.bmi]
+        expected_distribution = {'underweight': 0, 'normal': 0, 'overweight': 0, 'obese': 0}
+        for record in records:
+            if record.health_category in expected_distribution:
+                expected_distribution[record.health_category] += 1
+
+        with self.assertNumQueries(1):
+            summary = HealthRecord.objects.health_summary()
+
+        self.assertEqual(summary['avg_bmi'], round(sum(bmis) / len(bmis), 2))
+        self.assertEqual(summary['health_distribution'], expected_distribution)
+
+    def test_health_summary_empty_table(self):
+        HealthRecord.objects.all().delete()
+        summary = HealthRecord.objects.health_summary()
+        self.assertEqual(summary['avg_bmi'], 0)
+        self.assertEqual(sum(summary['health_distribution'].values()), 0)
+
+    def test_dashboard_renders(self):
+        response = self.client.get(reverse('health:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, reverse('health:dashboard_totals'))
+
+
+class HealthRecordMetricTests(TestCase):
+    """Memoized bmi/health_category/bp_status and their invalidation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = make_student(1101)
+        cls.record = make_record(cls.student, '65', '170')
+
+    def form_data(self, **changes):
+        data = {
+            'student': self.student.pk, 'weight': '65', 'height': '170', 'systolic_bp': 110,
+            'diastolic_bp': 70, 'temperature': '36.5', 'vision': '', 'urine_test': 'pending',
+            'school_year': '2024-2025',
+        }
+        data.update(changes)
+        return data
+
+    def test_metrics_are_computed_once(self):
+        record = HealthRecord.objects.get(pk=self.record.pk)
+        self.assertEqual(record.bmi, 22.49)
+        self.assertIn('bmi', record.__dict__)
+        record.__dict__['bmi'] = 40.0
+        # health_category reads the memoized BMI instead of recomputing it
+        self.assertEqual(record.health_category, 'obese')
+
+    def test_assignment_invalidates_metrics(self):
+        record = HealthRecord.objects.get(pk=self.record.pk)
+        self.assertEqual((record.bmi, record.health_category, record.bp_status), (22.49, 'normal', 'Normal'))
+        record.weight = Decimal('90')
+        self.assertEqual((record.bmi, record.health_category), (31.14, 'obese'))
+        record.systolic_bp = 135
+        self.assertEqual(record.bp_status, 'Stage 1 Hypertension')
+
+    def test_annotated_values_are_used(self):
+        record = HealthRecord.objects.with_health_category().with_bp_status().get(pk=self.record.pk)
+        record.bmi_value, record.health_category_value, record.bp_status_value = 99.0, 'obese', 'Elevated'
+        self.assertEqual((record.bmi, record.health_category, record.bp_status), (99.0, 'obese', 'Elevated'))
+
+    def test_assignment_discards_stale_annotations(self):
+        record = HealthRecord.objects.with_health_category().with_bp_status().get(pk=self.record.pk)
+        record.height = Decimal('150')
+        record.diastolic_bp = 95
+        self.assertEqual((record.bmi, record.health_category), (28.89, 'overweight'))
+        self.assertEqual(record.bp_status, 'Stage 2 Hypertension')
+        self.assertFalse(hasattr(record, 'bmi_value'))
+
+    def test_form_edit_is_never_stale(self):
+        record = HealthRecord.objects.with_health_category().with_bp_status().get(pk=self.record.pk)
+        self.assertEqual((record.health_category, record.bp_status), ('normal', 'Normal'))
+        form = HealthRecordForm(self.form_data(weight='45', systolic_bp=125), instance=record)
+        self.assertTrue(form.is_valid(), form.errors)
+        # Validation assigned the new measurements to the instance
+        self.assertEqual((record.bmi, record.health_category, record.bp_status), (15.57, 'underweight', 'Elevated'))
+        form.save()
+        summary = HealthYearSummary.objects.get(school_year='2024-2025', department='BSIT')
+        self.assertEqual((summary.normal_count, summary.underweight_count), (0, 1))
+
+    def test_invalid_form_edit_keeps_metrics_consistent(self):
+        record = HealthRecord.objects.get(pk=self.record.pk)
+        self.assertEqual(record.bmi, 22.49)
+        form = HealthRecordForm(self.form_data(height='180', systolic_bp='high'), instance=record)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(record.bmi, round(65 / 1.8 ** 2, 2))
+
+    def test_loading_rows_keeps_annotations(self):
+        record = HealthRecord.objects.with_health_category().with_bp_status().get(pk=self.record.pk)
+        self.assertEqual(
+            (record.bmi_value, record.health_category_value, record.bp_status_value), (22.49, 'normal', 'Normal'),
+        )
+        # The measurement fields migrate as the plain Django fields
+        self.assertEqual(HealthRecord._meta.get_field('weight').deconstruct()[1], 'django.db.models.DecimalField')
+        self.assertEqual(HealthRecord._meta.get_field('systolic_bp').deconstruct()[1], 'django.db.models.IntegerField')
+
+    def test_edit_view_shows_updated_metrics(self):
+        self.client.post(
+            reverse('health:edit_record', args=[self.record.pk]), self.form_data(weight='95'),
+        )
+        response = self.client.get(reverse('health:all_records'))
+        self.assertContains(response, '32.87')
+        self.assertNotContains(response, '22.49')
+
+
+class AllRecordsViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        student = make_student(2001, department='BSED')
+        for _ in range(7):
+            make_record(student, '65', '170')
+        make_record(student, '45', '170')
+        make_record(student, '120', '165')
+
+    def test_category_filter_runs_in_database(self):
+        response = self.client.get(reverse('health:all_records'), {'category': 'normal'})
+        self.assertEqual(response.context['total_records'], 7)
+        self.assertTrue(all(r.health_category == 'normal' for r in response.context['health_records']))
+
+        response = self.client.get(reverse('health:all_records'), {'category': 'obese'})
+        self.assertEqual(response.context['total_records'], 1)
+
+    def test_bp_status_filter_runs_in_database(self):
+        record = HealthRecord.objects.first()
+        record.systolic_bp, record.diastolic_bp = 135, 85
+        record.save()
+        response = self.client.get(reverse('health:all_records'), {'bp_status': 'Stage 1 Hypertension'})
+        self.assertEqual(response.context['total_records'], 1)
+        self.assertEqual([r.pk for r in response.context['health_records']], [record.pk])
+
+        response = self.client.get(reverse('health:export_records'), {'bp_status': 'Normal', 'format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 8)
+        self.assertTrue(all(row['bp_status'] == 'Normal' for row in rows))
+
+    def test_keyset_pagination_walks_every_record_once(self):
+        url = reverse('health:all_records')
+        seen = []
+        params = {'page_size': 4}
+        while True:
+            response = self.client.get(url, params)
+            page = response.context['page']
+            seen.extend(record.pk for record in page)
+            if not page.has_next:
+                break
+            params = {'page_size': 4, 'after': page.next_cursor}
+        expected = list(HealthRecord.objects.order_by('-checkup_date', '-pk').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+        # Stepping back from the last page returns the page before it
+        response = self.client.get(url, {'page_size': 4, 'before': page.previous_cursor})
+        self.assertEqual([record.pk for record in response.context['page']], expected[4:8])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('health:all_records'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['health_records']), 9)
+
+    def test_out_of_range_cursor_falls_back_to_first_page(self):
+        for pk in (2 ** 64, -1):
+            cursor = base64.urlsafe_b64encode(f'2024-06-01T00:00:00+00:00|{pk}'.encode()).decode()
+            for direction in ('after', 'before'):
+                response = self.client.get(reverse('health:all_records'), {direction: cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['health_records']), 9)
+
+
+class SchoolYearSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        first, second = make_student(3001), make_student(3002)
+        make_record(first, '50', '170', school_year='2023-2024')
+        make_record(first, '52', '170', school_year='2024-2025')
+        make_record(second, '90', '170', school_year='2024-2025')
+        make_record(second, '91', '170', school_year='2024-2025')
+
+    def test_single_grouped_query(self):
+        with self.assertNumQueries(1):
+            summary = HealthYearSummary.objects.school_year_summary()
+        self.assertEqual([year['school_year'] for year in summary], ['2023-2024', '2024-2025'])
+
+    def test_matches_per_year_computation(self):
+        for year in HealthYearSummary.objects.school_year_summary():
+            records = list(HealthRecord.objects.filter(school_year=year['school_year']))
+            bmis = [record.bmi for record in records]
+            self.assertAlmostEqual(year['avg_weight'], sum(float(r.weight) for r in records) / len(records))
+            self.assertAlmostEqual(year['avg_bmi'], sum(bmis) / len(bmis), delta=0.011)
+            self.assertEqual(year['student_count'], len({record.student_id for record in records}))
+            self.assertEqual(sum(year['health_distribution'].values()), len(records))
+
+
+class HealthYearSummaryTests(TestCase):
+    """The incrementally maintained summary must always equal a full recomputation"""
+
+    def setUp(self):
+        self.first = make_student(4001, department='BSIT')
+        self.second = make_student(4002, department='BEED')
+        self.record = make_record(self.first, '50', '170', school_year='2023-2024')
+        make_record(self.first, '70', '170', school_year='2024-2025')
+        make_record(self.second, '95', '170', school_year='2024-2025')
+
+    def assertSummaryConsistent(self):
+        expected = {
+            (row.school_year, row.department): row for row in HealthYearSummary.objects.all()
+        }
+        HealthYearSummary.objects.rebuild()
+        rebuilt = {
+            (row.school_year, row.department): row for row in HealthYearSummary.objects.all()
+        }
+        self.assertEqual(expected.keys(), rebuilt.keys())
+        fields = [
+            'record_count', 'student_count', 'weight_sum', 'bmi_sum', 'bmi_count',
+            'underweight_count', 'normal_count', 'overweight_count', 'obese_count',
+        ]
+        for key, row in rebuilt.items():
+            for field in fields:
+                self.assertEqual(getattr(expected[key], field), getattr(row, field), (key, field))
+
+    def test_create_updates_summary(self):
+        make_record(self.second, '45', '160', school_year='2023-2024')
+        self.assertSummaryConsistent()
+
+    def test_edit_view_moves_record_between_years(self):
+        response = self.client.post(reverse('health:edit_record', args=[self.record.pk]), {
+            'student': self.first.pk, 'weight': '90', 'height': '170', 'systolic_bp': 120,
+            'diastolic_bp': 80, 'temperature': '36.6', 'vision': '20/20',
+            'urine_test': 'normal', 'school_year': '2024-2025',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(HealthYearSummary.objects.filter(school_year='2023-2024').exists())
+        self.assertSummaryConsistent()
+
+    def test_delete_view_updates_summary(self):
+        self.client.post(reverse('health:delete_record', args=[self.record.pk]))
+        self.assertSummaryConsistent()
+
+    def test_student_changes_and_deletion(self):
+        self.first.department = 'BSHM'
+        self.first.save()
+        self.assertSummaryConsistent()
+        self.second.delete()
+        self.assertSummaryConsistent()
+
+    def test_student_deletion_rebuilds_its_groups_once(self):
+        make_record(self.first, '60', '170', school_year='2023-2024')
+        make_record(self.first, '61', '170', school_year='2024-2025')
+        make_record(self.first, '62', '170')
+        make_record(self.first, '63', '170', school_year=None)
+        summary_updates = lambda queries: [
+            query for query in queries if query['sql'].startswith('UPDATE "health_healthyearsummary"')
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.first.delete()
+        self.assertEqual(summary_updates(queries.captured_queries), [])
+        self.assertFalse(HealthYearSummary.objects.filter(department='BSIT').exists())
+        self.assertSummaryConsistent()
+        # Later record deletions update the summary again
+        self.client.post(reverse('health:delete_record', args=[HealthRecord.objects.get().pk]))
+        self.assertFalse(HealthYearSummary.objects.exists())
+
+    def test_failed_student_deletion_leaves_no_mark(self):
+        first = make_record(self.first, '60', '170')
+        second = make_record(self.first, '61', '170')
+
+        def fail(sender, instance, **kwargs):
+            raise RuntimeError("cascade failed")
+
+        post_delete.connect(fail, sender=HealthRecord)
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.first.delete()
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Student.objects.filter(pk=self.first.pk).delete()
+        finally:
+            post_delete.disconnect(fail, sender=HealthRecord)
+
+        # Nothing was deleted, and the student's records update the summary again
+        self.assertEqual(self.first.health_records.count(), 4)
+        HealthRecord.objects.get(pk=first.pk).delete()
+        summary = HealthYearSummary.objects.get(school_year='2024-2025', department='BSIT')
+        self.assertEqual(summary.record_count, 2)
+        self.assertSummaryConsistent()
+        Student.objects.filter(pk=self.first.pk).delete()
+        self.assertFalse(HealthRecord.objects.filter(pk=second.pk).exists())
+        self.assertSummaryConsistent()
+
+    def test_summary_rows_are_unique_for_records_without_a_year(self):
+        make_record(self.first, '60', '170', school_year=None)
+        make_record(self.first, '61', '170', school_year=None)
+        self.assertEqual(HealthYearSummary.objects.filter(school_year=None, department='BSIT').get().record_count, 2)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            HealthYearSummary.objects.create(school_year=None, department='BSIT')
+        self.assertSummaryConsistent()
+
+    def test_roster_sync_moves_students_between_departments(self):
+        sync_roster(read_roster(StringIO('s_id,department\n4001,BSED\n4002,BSED\n')))
+        self.assertEqual(
+            set(HealthYearSummary.objects.values_list('department', flat=True)), {'BSED'}
+        )
+        self.assertSummaryConsistent()
+
+    def test_summary_matches_live_aggregation(self):
+        # The summary sums exact decimals, so a .xx5 tie may round one cent the other way
+        live, summary = HealthRecord.objects.health_summary(), HealthYearSummary.objects.health_summary()
+        self.assertAlmostEqual(live['avg_bmi'], summary['avg_bmi'], delta=0.011)
+        self.assertEqual(live['health_distribution'], summary['health_distribution'])
+
+    def test_rebuild_command(self):
+        HealthYearSummary.objects.all().delete()
+        call_command('rebuild_health_summary', stdout=StringIO())
+        self.assertEqual(HealthYearSummary.objects.count(), 3)
+
+
+class AnalyticsCacheTests(TestCase):
+
+    def setUp(self):
+        analytics_cache.get_cache().clear()
+        self.student = make_student(5001)
+        make_record(self.student, '65', '170')
+
+    def test_dashboard_payload_is_cached_until_data_changes(self):
+        url = reverse('health:dashboard_totals')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(analytics_cache.stats()['hits'], 1)
+        self.assertEqual(analytics_cache.stats()['misses'], 1)
+        self.assertEqual(response.json()['total_students'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_record(make_student(5002), '45', '170')
+        response = self.client.get(url)
+        self.assertEqual(analytics_cache.stats()['misses'], 2)
+        self.assertEqual(response.json()['total_students'], 2)
+
+    def test_home_payload_invalidated_by_student_changes(self):
+        self.client.get(reverse('home'))
+        self.student.department = 'BSED'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.save()
+        response = self.client.get(reverse('home'))
+        self.assertEqual(analytics_cache.stats()['misses'], 2)
+        self.assertEqual(response.context['dept_data'], '[0, 1, 0, 0, 0, 0]')
+
+    def test_versions_are_bumped_only_on_commit(self):
+        health_version = analytics_cache.get_version('health')
+        with self.captureOnCommitCallbacks() as callbacks:
+            make_record(self.student, '70', '170')
+            self.assertEqual(analytics_cache.get_version('health'), health_version)
+        self.assertEqual(analytics_cache.get_version('health'), health_version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(analytics_cache.get_version('health'), health_version)
+
+    def test_per_entry_timeout(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'value': len(calls)}
+
+        analytics_cache.get_or_compute('test:ttl', compute, scopes=('health',), timeout=0)
+        analytics_cache.get_or_compute('test:ttl', compute, scopes=('health',), timeout=0)
+        self.assertEqual(len(calls), 2)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+class QueryPlanTests(TestCase):
+    """The key list/dashboard queries must be served by an index, not a full scan or sort"""
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' / '.join(row[-1] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = self.query_plan(queryset)
+        self.assertIn(f'INDEX {index_name}', plan)
+        self.assertNotIn('TEMP B-TREE FOR ORDER BY', plan)
+        self.assertNotIn('TEMP B-TREE FOR RIGHT PART OF ORDER BY', plan)
+
+    def test_recent_records_and_keyset_pages(self):
+        self.assertUsesIndex(
+            HealthRecord.objects.order_by('-checkup_date', '-pk')[:10], 'health_rec_date_id_idx'
+        )
+
+    def test_all_records_school_year_filter(self):
+        self.assertUsesIndex(
+            HealthRecord.objects.filter(school_year='2024-2025').order_by('-checkup_date', '-pk')[:50],
+            'health_rec_year_date_idx',
+        )
+
+    def test_student_history(self):
+        self.assertUsesIndex(
+            HealthRecord.objects.filter(student_id=1).order_by('-checkup_date'),
+            'health_rec_student_date_idx',
+        )
+
+    def test_students_per_year_uses_covering_index(self):
+        queryset = HealthRecord.objects.order_by().values('school_year').annotate(
+            count=Count('student', distinct=True)
+        )
+        self.assertIn('COVERING INDEX health_rec_year_student_idx', self.query_plan(queryset))
+
+    def test_student_filters_and_sorting(self):
+        self.assertUsesIndex(Student.objects.filter(department='BSIT'), 'student_dept_year_idx')
+        self.assertUsesIndex(Student.objects.filter(year_level='2'), 'student_year_level_idx')
+        self.assertUsesIndex(Student.objects.sorted_by('name')[:25], 'student_name_idx')
+
+    def test_student_search_uses_token_index(self):
+        plan = self.query_plan(Student.objects.search('dela cruz'))
+        self.assertIn('COVERING INDEX student_token_idx', plan)
+        self.assertNotIn('SCAN students_student', plan)
+
+
+class StudentPickerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [make_student(6000 + index) for index in range(30)]
+
+    def form_data(self, student):
+        return {
+            'student': student.pk, 'weight': '60', 'height': '165', 'systolic_bp': 110,
+            'diastolic_bp': 70, 'temperature': '36.5', 'vision': '20/20',
+            'urine_test': 'normal', 'school_year': '2024-2025',
+        }
+
+    def test_form_renders_without_loading_the_roster(self):
+        form = HealthRecordForm(initial={'student': self.students[3].pk})
+        with self.assertNumQueries(1):
+            html = form['student'].as_widget()
+        self.assertIn('First6003 Last6003 (6003)', html)
+        self.assertNotIn('First6004', html)
+
+    def test_validation_looks_up_only_the_submitted_student(self):
+        form = HealthRecordForm(self.form_data(self.students[5]))
+        # The field lookup plus the model's foreign key existence check
+        with self.assertNumQueries(2) as captured:
+            self.assertTrue(form.is_valid())
+        for query in captured.captured_queries:
+            self.assertIn(f'"students_student"."id" = {self.students[5].pk}', query['sql'])
+        self.assertEqual(form.cleaned_data['student'], self.students[5])
+
+        data = self.form_data(self.students[5])
+        data['student'] = 999999
+        self.assertIn('student', HealthRecordForm(data).errors)
+
+    def test_add_record_without_a_valid_student_reports_an_error(self):
+        url = reverse('health:add_record')
+        for student in ('', 'abc', 999999):
+            data = {**self.form_data(self.students[0]), 'student': student}
+            response = self.client.post(url, data, follow=True)
+            self.assertRedirects(response, reverse('health:dashboard'))
+            self.assertIn('Select a student', [str(m) for m in response.context['messages']][0])
+        self.assertFalse(HealthRecord.objects.exists())
+
+        response = self.client.post(url, self.form_data(self.students[0]))
+        self.assertRedirects(response, reverse('health:dashboard'))
+        self.assertEqual(HealthRecord.objects.get().student, self.students[0])
+
+    def test_dashboard_no_longer_lists_students(self):
+        response = self.client.get(reverse('health:dashboard'))
+        self.assertNotIn('students', response.context)
+        self.assertNotContains(response, 'First6010')
+
+    def test_typeahead_pages(self):
+        url = reverse('student_typeahead')
+        first = self.client.get(url, {'q': 'first', 'limit': 20}).json()
+        second = self.client.get(url, {'q': 'first', 'limit': 20, 'page': 2}).json()
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(len(first['results']) + len(second['results']), 30)
+
+
+IMPORT_CSV = """s_id,weight,height,systolic_bp,diastolic_bp,temperature,vision,urine_test,school_year
+7001,60,165,110,70,36.5,20/20,normal,2024-2025
+7002,80,170,125,75,36.7,,,2024-2025
+9999,60,165,110,70,36.5,,normal,2024-2025
+7001,abc,165,110,70,36.5,,normal,2024-2025
+7002,70,170,120,80,36.6,20/30,invalid,2024-2025
+7003,50,160,100,60,36.4,,pending,2024-2025
+"""
+
+
+class HealthRecordImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for s_id in (7001, 7002, 7003):
+            make_student(s_id)
+
+    def rows(self):
+        return read_rows(StringIO(IMPORT_CSV), 'session.csv')
+
+    def test_valid_rows_are_imported_and_errors_reported(self):
+        result = import_health_records(self.rows(), batch_size=4)
+        self.assertEqual(result.created, 3)
+        self.assertEqual([row for row, _ in result.errors], [4, 5, 6])
+        self.assertIn('9999', result.errors[0][1])
+        self.assertIn('weight', result.errors[1][1])
+        self.assertIn('urine_test', result.errors[2][1])
+        self.assertEqual(HealthRecord.objects.get(student__s_id=7002).urine_test, 'pending')
+
+    def test_summary_is_kept_in_sync(self):
+        import_health_records(self.rows())
+        summary = HealthYearSummary.objects.get(school_year='2024-2025', department='BSIT')
+        self.assertEqual(summary.record_count, 3)
+        self.assertEqual(summary.student_count, 3)
+
+    def test_queries_per_batch_do_not_grow_with_rows(self):
+        valid_row = '7001,60,165,110,70,36.5,20/20,normal,2024-2025\n'
+        header = IMPORT_CSV.splitlines(keepends=True)[0]
+        counts = []
+        for row_count in (2, 20):
+            HealthYearSummary.objects.all().delete()
+            rows = read_rows(StringIO(header + valid_row * row_count), 'session.csv')
+            with CaptureQueriesContext(connection) as queries:
+                import_health_records(rows, batch_size=100)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_upload_view(self):
+        upload = SimpleUploadedFile('session.csv', IMPORT_CSV.encode(), content_type='text/csv')
+        response = self.client.post(reverse('health:import_records'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 3)
+        self.assertContains(response, 'Unknown student ID')
+
+        upload = SimpleUploadedFile('session.txt', b'x', content_type='text/plain')
+        response = self.client.post(reverse('health:import_records'), {'file': upload})
+        self.assertIsNone(response.context['result'])
+
+
+class HealthRecordExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        ana = make_student(8001, first_name='Ana', department='BSIT')
+        ben = make_student(8002, first_name='Ben', department='BSED')
+        make_record(ana, '65', '170', systolic_bp=125, diastolic_bp=75)
+        make_record(ana, '120', '165', school_year='2023-2024')
+        make_record(ben, '45', '170', systolic_bp=145, diastolic_bp=95)
+
+    def export(self, **params):
+        response = self.client.get(reverse('health:export_records'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_rows_match_model_properties(self):
+        rows = list(csv.DictReader(StringIO(self.export(format='csv'))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(list(rows[0]), EXPORT_COLUMNS)
+        records = {record.pk: record for record in HealthRecord.objects.all()}
+        expected = sorted(records.values(), key=lambda r: (r.checkup_date, r.pk), reverse=True)
+        for row, record in zip(rows, expected):
+            self.assertEqual(int(row['s_id']), record.student.s_id)
+            self.assertEqual(float(row['bmi']), record.bmi)
+            self.assertEqual(row['health_category'], record.health_category)
+            self.assertEqual(row['bp_status'], record.bp_status)
+
+    def test_export_applies_all_records_filters(self):
+        rows = list(csv.DictReader(StringIO(self.export(course='BSED'))))
+        self.assertEqual([row['first_name'] for row in rows], ['Ben'])
+
+        rows = list(csv.DictReader(StringIO(self.export(search='ana', year='2023-2024'))))
+        self.assertEqual([row['health_category'] for row in rows], ['obese'])
+
+        lines = self.export(format='ndjson', category='normal').splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['bp_status'], 'Elevated')
+
+    def test_csv_neutralizes_formula_cells(self):
+        student = make_student(8003, first_name='=HYPERLINK("http://example.com")', last_name='@SUM(A1)')
+        make_record(student, '60', '165', vision='-1+1', urine_test='+normal', school_year='2022-2023')
+        rows = list(csv.DictReader(StringIO(self.export(format='csv', year='2022-2023'))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['first_name'], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(rows[0]['last_name'], "'@SUM(A1)")
+        self.assertEqual((rows[0]['vision'], rows[0]['urine_test']), ("'-1+1", "'+normal"))
+        self.assertEqual(rows[0]['weight'], '60.00')
+
+        # NDJSON is not opened by spreadsheets and keeps the stored values
+        line = json.loads(self.export(format='ndjson', year='2022-2023'))
+        self.assertEqual(line['last_name'], '@SUM(A1)')
+
+    def test_rows_stream_from_a_single_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(export_rows(HealthRecord.objects.all(), chunk_size=1))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len(queries), 1)
+
+
+@skipUnless(analytics.is_available(), "numpy is not installed")
+class PopulationAnalyticsTests(TestCase):
+    """Vectorized statistics must agree with the scalar HealthRecord properties"""
+
+    @classmethod
+    def setUpTestData(cls):
+        ana = make_student(9001, department='BSIT', year_level='1')
+        ben = make_student(9002, department='BSIT', year_level='2')
+        carla = make_student(9003, department='BSED', year_level='2')
+        # BP readings on both sides of every threshold
+        make_record(ana, '53.46', '170', systolic_bp=119, diastolic_bp=79, school_year='2023-2024')
+        make_record(ana, '72.25', '170', systolic_bp=120, diastolic_bp=79, school_year='2024-2025')
+        make_record(ana, '75', '170', systolic_bp=129, diastolic_bp=80, school_year='2024-2025')
+        make_record(ben, '86.70', '170', systolic_bp=139, diastolic_bp=89, school_year='2023-2024')
+        make_record(ben, '80', '170', systolic_bp=140, diastolic_bp=70, school_year='2024-2025')
+        make_record(carla, '120', '165', systolic_bp=110, diastolic_bp=90, school_year='2024-2025')
+        make_record(carla, '65', '0', systolic_bp=130, diastolic_bp=79, school_year='2024-2025')
+
+    def setUp(self):
+        self.data = analytics.load_records()
+        self.records = {record.pk: record for record in HealthRecord.objects.select_related('student')}
+
+    def test_arrays_match_scalar_properties(self):
+        self.assertEqual(len(self.data), len(self.records))
+        for i, pk in enumerate(self.data.id):
+            record = self.records[int(pk)]
+            if record.bmi is None:
+                self.assertTrue(math.isnan(self.data.bmi[i]))
+            else:
+                self.assertAlmostEqual(float(self.data.bmi[i]), record.bmi, places=2)
+            self.assertEqual(self.data.health_category[i], record.health_category)
+            self.assertEqual(self.data.bp_status[i], record.bp_status)
+
+    def test_percentiles_match_linear_interpolation(self):
+        values = sorted(record.bmi for record in self.records.values() if record.bmi is not None)
+        expected = statistics.quantiles(values, n=4, method='inclusive')
+        result = analytics.percentiles(self.data.bmi)
+        self.assertAlmostEqual(result['p25'], expected[0], places=2)
+        self.assertAlmostEqual(result['p50'], expected[1], places=2)
+        self.assertAlmostEqual(result['p75'], expected[2], places=2)
+        self.assertEqual(analytics.percentiles([]), {f'p{p}': None for p in analytics.PERCENTILES})
+
+    def test_distributions_match_properties(self):
+        by_department = Counter((r.student.department, r.bp_status) for r in self.records.values())
+        by_year_level = Counter((r.student.year_level, r.bp_status) for r in self.records.values())
+        report = analytics.population_report()
+        for (department, status), count in by_department.items():
+            self.assertEqual(report['bp_by_department'][department][status], count)
+        for (year_level, status), count in by_year_level.items():
+            self.assertEqual(report['bp_by_year_level'][year_level][status], count)
+        self.assertEqual(sum(report['bp_by_department']['BSIT'].values()), 5)
+        self.assertEqual(report['category_by_department']['BSED']['obese'], 1)
+
+    def test_z_scores_per_year_level(self):
+        z, cohorts = analytics.bmi_for_age(self.data)
+        for year_level in ('1', '2'):
+            values = [
+                r.bmi for r in self.records.values()
+                if r.student.year_level == year_level and r.bmi is not None
+            ]
+            mean, std = statistics.mean(values), statistics.pstdev(values)
+            self.assertEqual(cohorts[year_level]['count'], len(values))
+            self.assertAlmostEqual(cohorts[year_level]['mean'], mean, places=2)
+            for i, pk in enumerate(self.data.id):
+                record = self.records[int(pk)]
+                if record.student.year_level == year_level and record.bmi is not None:
+                    self.assertAlmostEqual(float(z[i]), (record.bmi - mean) / std, places=6)
+        self.assertTrue(all(math.isnan(z[i]) for i, pk in enumerate(self.data.id) if self.records[int(pk)].bmi is None))
+
+    def test_year_over_year_uses_latest_checkup_per_year(self):
+        deltas = analytics.year_over_year(self.data)
+        rows = {
+            int(student): (str(from_year), str(to_year), float(weight), float(bmi))
+            for student, from_year, to_year, weight, bmi in zip(
+                deltas['student_id'], deltas['from_year'], deltas['to_year'],
+                deltas['weight_delta'], deltas['bmi_delta'],
+            )
+        }
+        ana = HealthRecord.objects.filter(student__s_id=9001).order_by('school_year', 'checkup_date', 'pk')
+        first, latest = ana[0], ana.last()
+        ana_id = first.student_id
+        self.assertEqual(rows[ana_id][:2], ('2023-2024', '2024-2025'))
+        self.assertAlmostEqual(rows[ana_id][2], float(latest.weight - first.weight))
+        self.assertAlmostEqual(rows[ana_id][3], latest.bmi - first.bmi, places=2)
+        # Carla was only checked in one school year
+        self.assertEqual(len(rows), 2)
+
+        summary = analytics.year_over_year_summary(deltas)
+        self.assertEqual(summary['transitions'][0]['students'], 2)
+        self.assertEqual(summary['largest_changes'][0]['student_id'], ana_id)
+
+    def test_year_over_year_skips_records_without_school_year(self):
+        ben = Student.objects.get(s_id=9002)
+        make_record(ben, '95', '170', school_year=None)
+        data = analytics.load_records()
+        self.assertEqual(set(data.school_year), {'2023-2024', '2024-2025', ''})
+
+        deltas = analytics.year_over_year(data)
+        transitions = {
+            int(student): (str(from_year), str(to_year))
+            for student, from_year, to_year in zip(deltas['student_id'], deltas['from_year'], deltas['to_year'])
+        }
+        self.assertEqual(transitions[ben.pk], ('2023-2024', '2024-2025'))
+        self.assertEqual(len(deltas['student_id']), 2)
+        self.assertEqual(
+            [row['to_year'] for row in analytics.year_over_year_summary(deltas)['transitions']], ['2024-2025'],
+        )
+
+    def test_report_is_cacheable(self):
+        report = analytics.population_report()
+        self.assertEqual(json.loads(json.dumps(report))['record_count'], 7)
+
+
+class ReportsViewTests(TestCase):
+
+    def test_reports_page_renders(self):
+        student = make_student(9101, year_level='3')
+        make_record(student, '65', '170', school_year='2023-2024')
+        make_record(student, '70', '170', school_year='2024-2025')
+        response = self.client.get(reverse('health:reports'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['analytics_available'], analytics.is_available())
+        if analytics.is_available():
+            self.assertEqual(response.context['largest_changes'][0]['student'], student)
+
+
+class StudentHealthHistoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = make_student(9201)
+        for i in range(30):
+            make_record(cls.student, str(60 + i % 5), '170', systolic_bp=110 + i)
+        # A spike the downsampled series must keep
+        cls.spike = make_record(cls.student, '95', '170')
+        for i in range(19):
+            make_record(cls.student, str(60 + i % 5), '0' if i == 5 else '170')
+
+    def test_history_page_queries_records_once(self):
+        # Conditional GET state, student, records
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('health:student_history', args=[self.student.pk]))
+        records = list(HealthRecord.objects.filter(student=self.student).order_by('-checkup_date', '-id'))
+        self.assertEqual(response.context['latest_record'].pk, records[0].pk)
+        self.assertEqual(json.loads(response.context['bmis_data']), [record.bmi for record in records])
+        self.assertEqual(json.loads(response.context['weights_data']), [float(record.weight) for record in records])
+        self.assertContains(response, 'Complete Health Records (50)')
+
+    def test_series_endpoint_downsamples(self):
+        url = reverse('health:student_history_series', args=[self.student.pk])
+        data = self.client.get(url).json()
+        self.assertEqual((data['total'], data['downsampled'], len(data['dates'])), (50, False, 50))
+
+        data = self.client.get(url, {'points': 10}).json()
+        self.assertTrue(data['downsampled'])
+        self.assertEqual(len(data['dates']), len(data['weights']), len(data['bmis']))
+        self.assertEqual(len(data['weights']), 10)
+        self.assertIn(95.0, data['weights'])
+        self.assertEqual(self.client.get(url, {'points': 'x'}).json()['total'], 50)
+
+    def test_lttb_keeps_endpoints(self):
+        values = [0, 1, 0, 1, 0, 9, 0, 1, 0, 1]
+        indices = lttb_indices(values, 4)
+        self.assertEqual((indices[0], indices[-1], len(indices)), (0, 9, 4))
+        self.assertIn(5, indices)
+        self.assertEqual(lttb_indices(values, 20), list(range(10)))
+
+
+class DashboardWidgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        first = make_student(9301, first_name='Ana')
+        second = make_student(9302, department='BSED')
+        make_record(first, '65', '170', school_year='2023-2024')
+        make_record(first, '45', '170', systolic_bp=145, diastolic_bp=95)
+        make_record(second, '120', '165')
+
+    def setUp(self):
+        analytics_cache.get_cache().clear()
+
+    def get(self, name):
+        response = self.client.get(reverse(f'health:dashboard_{name}'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.json()
+
+    def test_widgets_match_the_summaries(self):
+        summary = HealthRecord.objects.health_summary()
+        weights = {}
+        for record in HealthRecord.objects.all():
+            weights.setdefault(record.school_year, []).append(float(record.weight))
+
+        totals = self.get('totals')
+        self.assertEqual(totals['total_students'], 2)
+        self.assertAlmostEqual(totals['avg_bmi'], summary['avg_bmi'], delta=0.011)
+        # Percentiles need every record; the reports page computes them
+        self.assertNotIn('bmi_percentiles', totals)
+        self.assertEqual(self.get('categories'), summary['health_distribution'])
+        self.assertEqual(
+            self.get('weight_by_year'), {year: sum(values) / len(values) for year, values in weights.items()}
+        )
+        self.assertEqual(self.get('students_per_year'), {'2023-2024': 1, '2024-2025': 2})
+
+    def test_recent_widget(self):
+        records = self.get('recent')['records']
+        latest = HealthRecord.objects.order_by('-checkup_date', '-id').first()
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['id'], latest.pk)
+        self.assertEqual(records[0]['bmi'], latest.bmi)
+        self.assertEqual(records[0]['health_category'], latest.health_category)
+        self.assertEqual(records[0]['bp_status'], latest.bp_status)
+
+    def test_blood_pressure_widget(self):
+        data = self.get('blood_pressure')
+        self.assertEqual(data['statuses'], ['Normal', 'Elevated', 'Stage 1 Hypertension', 'Stage 2 Hypertension'])
+        self.assertEqual(data['by_department']['BSIT'], [1, 0, 0, 1])
+        self.assertEqual(data['by_department']['BSED'], [1, 0, 0, 0])
+        self.assertEqual(data['by_department']['BSHM'], [0, 0, 0, 0])
+        self.assertEqual(data['by_school_year'], {'2023-2024': [1, 0, 0, 0], '2024-2025': [1, 0, 0, 1]})
+
+        rows = HealthRecord.objects.bp_status_distribution()
+        expected = Counter(
+            (record.school_year, record.student.department, record.bp_status)
+            for record in HealthRecord.objects.select_related('student')
+        )
+        counted = Counter({
+            (row['school_year'], row['department'], status): count
+            for row in rows for status, count in row['counts'].items() if count
+        })
+        self.assertEqual(counted, expected)
+
+    async def test_widgets_are_async_views(self):
+        client = AsyncClient()
+        for name in ('totals', 'categories', 'weight_by_year', 'students_per_year', 'blood_pressure', 'recent'):
+            response = await client.get(reverse(f'health:dashboard_{name}'))
+            self.assertEqual(response.status_code, 200, name)
+
+    def test_widget_without_compute_fails_at_definition(self):
+        with self.assertRaises(ImproperlyConfigured):
+            class MissingCompute(views.DashboardWidgetView):
+                widget = 'missing'
+
+        with self.assertRaises(ImproperlyConfigured):
+            class SyncCompute(views.DashboardWidgetView):
+                widget = 'sync'
+
+                def compute(self):
+                    return {}
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.student = make_student(9401)
+        self.record = make_record(self.student, '65', '170')
+
+    def revalidate(self, url):
+        # The first visit sets the CSRF cookie, which is part of a page's ETag
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return etag, again
+
+    def test_unchanged_pages_answer_304(self):
+        urls = [
+            reverse('health:all_records') + '?course=BSIT',
+            reverse('health:student_history', args=[self.student.pk]),
+            reverse('health:student_history_series', args=[self.student.pk]),
+            reverse('health:dashboard_totals'),
+            reverse('health:dashboard_recent'),
+        ]
+        for url in urls:
+            _, response = self.revalidate(url)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b'')
+
+    def test_validators_change_with_the_data(self):
+        url = reverse('health:student_history', args=[self.student.pk])
+        etag, _ = self.revalidate(url)
+
+        self.record.weight = Decimal('70')
+        self.record.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        make_record(self.student, '66', '170').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.record.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_student_changes_invalidate_records_list(self):
+        url = reverse('health:all_records')
+        etag, _ = self.revalidate(url)
+        self.student.first_name = 'Renamed'
+        self.student.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_last_modified_and_missing_student(self):
+        response = self.client.get(reverse('health:all_records'))
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(
+            reverse('health:all_records'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(reverse('health:student_history', args=[999999])).status_code, 404)
+
+    def test_view_without_data_states_fails_at_definition(self):
+        with self.assertRaises(ImproperlyConfigured):
+            class MissingStates(conditional.ConditionalGetMixin, View):
+                pass
+
+
+@override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=1, QUERY_INSTRUMENTATION_METRICS_TOKEN='scrape-token')
+class QueryInstrumentationTests(TestCase):
+
+    def setUp(self):
+        analytics_cache.get_cache().clear()
+        self.student = make_student(9001)
+        make_record(self.student, '65', '170')
+
+    def test_server_timing_and_per_view_stats(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('health:all_records'))
+        query_count = len(queries)
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{query_count} queries"', timing)
+        self.assertIn('total;dur=', timing)
+
+        self.client.get(reverse('health:all_records'))
+        stats = instrumentation.stats()['health:all_records']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['max_queries'], query_count)
+        self.assertGreater(stats['sql_ms'], 0)
+        self.assertLessEqual(len(stats['slowest']), 5)
+        # Statements are kept with placeholders, never their parameters
+        self.assertTrue(all('9001' not in sql for _, sql in stats['slowest']))
+
+    async def test_async_views_are_recorded(self):
+        response = await AsyncClient().get(reverse('health:dashboard_totals'))
+        self.assertIn('Server-Timing', response)
+        stats = instrumentation.stats()['health:dashboard_totals']
+        self.assertEqual(stats['requests'], 1)
+        # Queries run by the view in worker threads are seen too
+        self.assertGreater(stats['queries'], 0)
+
+    @override_settings(QUERY_INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_untouched(self):
+        response = self.client.get(reverse('health:all_records'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(instrumentation.stats(), {})
+
+    def test_metrics_endpoint_access_and_format(self):
+        self.client.get(reverse('health:all_records'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-tokem')
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('consolahealth_view_requests_total{view="health:all_records"} 1', body)
+        self.assertIn('consolahealth_analytics_cache_hits_total', body)
+        # The test settings use LocMemCache: these totals are this process's only
+        self.assertIn('consolahealth_instrumentation_per_process 1', body)
+
+        self.client.force_login(User.objects.create_user('nurse', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_query_stats_command(self):
+        self.client.get(reverse('health:all_records'))
+        out = StringIO()
+        call_command('query_stats', '--reset', stdout=out)
+        self.assertIn('health:all_records: 1 requests', out.getvalue())
+        self.assertEqual(instrumentation.stats(), {})
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_generate_is_consistent_and_reproducible(self):
+        result = generate(students=20, records=60, years=3, batch_size=25, seed=7)
+        self.assertEqual((result.students, result.records), (20, 60))
+        self.assertEqual(Student.objects.count(), 20)
+        self.assertEqual(HealthRecord.objects.count(), 60)
+        self.assertEqual(
+            set(HealthRecord.objects.values_list('school_year', flat=True)), set(result.school_years)
+        )
+        # Signals were bypassed, so search tokens and the summary are maintained explicitly
+        student = Student.objects.first()
+        self.assertIn(student, Student.objects.search(student.last_name))
+        self.assertEqual(
+            HealthYearSummary.objects.health_summary(), HealthRecord.objects.all().health_summary()
+        )
+        # One check-up day per batch
+        self.assertEqual(HealthRecord.objects.values('checkup_date').distinct().count(), 3)
+        self.assertFalse(HealthRecord.objects.filter(checkup_date__gt=timezone.now()).exists())
+
+        first = list(HealthRecord.objects.order_by('pk').values_list('weight', 'height', 'systolic_bp'))
+        HealthRecord.objects.all().delete()
+        Student.objects.all().delete()
+        generate(students=20, records=60, years=3, batch_size=25, seed=7)
+        self.assertEqual(list(HealthRecord.objects.order_by('pk').values_list('weight', 'height', 'systolic_bp')), first)
+
+    def test_records_need_students(self):
+        with self.assertRaises(ValueError):
+            generate(students=0, records=10)
+
+
+class BenchmarkTests(TestCase):
+
+    def test_report_covers_every_view(self):
+        generate(students=10, records=30, years=2, seed=1)
+        report = benchmarks.run(repeat=2)
+        names = {result['name'] for result in report['results']}
+        self.assertTrue({
+            'home', 'dashboard', 'dashboard_totals', 'all_records', 'all_records_search',
+            'all_records_course', 'all_records_year', 'all_records_category',
+            'student_history', 'reports',
+        } <= names)
+        self.assertTrue(all(result['status'] == 200 for result in report['results']))
+        self.assertEqual(report['records'], 30)
+        self.assertEqual(report['hydration']['rows'], 30)
+        self.assertGreater(report['hydration']['us_per_row'], 0)
+        totals = next(result for result in report['results'] if result['name'] == 'dashboard_totals')
+        # The cold run misses the analytics cache, the warm runs do not
+        self.assertGreater(totals['cold']['queries'], totals['warm']['queries'])
+
+        rows = benchmarks.compare(report, json.loads(json.dumps(report)))
+        self.assertEqual(len(rows), len(report['results']))
+        self.assertTrue(all(row['change_pct'] in (0, None) for row in rows))
+
+    def test_command_writes_report(self):
+        out = StringIO()
+        call_command('benchmark_views', '--repeat', '1', '--only', 'home', '--output', '-', stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual([result['name'] for result in report['results']], ['home'])
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Every health view and the admin stay within a fixed number of queries, whatever the data size"""
+
+    def setUp(self):
+        self.add_rows(1)
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def add_rows(self, count):
+        # Two check-ups per new student, in two departments and school years
+        start = 30000 + Student.objects.count()
+        for offset in range(count):
+            self.student = make_student(start + offset, department=('BSIT', 'BSED')[offset % 2])
+            make_record(self.student, '60', '170', school_year='2023-2024')
+            self.record = make_record(self.student, '80', '170')
+
+    def get(self, name, *args, query=''):
+        return lambda: self.client.get(reverse(name, args=args) + query)
+
+    def test_mixin_requires_add_rows(self):
+        with self.assertRaises(TypeError):
+            class MissingAddRows(QueryBudgetMixin, TestCase):
+                pass
+
+    def test_dashboard(self):
+        self.assertQueryBudget(0, self.get('health:dashboard'))
+
+    def test_dashboard_widgets(self):
+        # Cold cache: each request follows a write, which bumps the cache versions
+        budgets = {
+            'totals': 4, 'categories': 2, 'weight_by_year': 2, 'students_per_year': 2,
+            'blood_pressure': 3, 'recent': 3,
+        }
+        for name, budget in budgets.items():
+            with self.subTest(widget=name):
+                self.assertQueryBudget(budget, self.get(f'health:dashboard_{name}'))
+
+    def test_all_records(self):
+        queries = [
+            '', '?search=Last', '?course=BSIT', '?year=2024-2025', '?category=overweight',
+            '?bp_status=Normal', '?search=Last&course=BSIT&year=2024-2025&category=normal&bp_status=Elevated',
+            '?page_size=200',
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertQueryBudget(5, self.get('health:all_records', query=query))
+
+    def test_exports(self):
+        self.assertQueryBudget(1, self.get('health:export_records'))
+        self.assertQueryBudget(1, self.get('health:export_records', query='?format=ndjson&category=normal'))
+
+    def test_student_history(self):
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('health:student_history', args=[self.student.pk])))
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('health:student_history_series', args=[self.student.pk])))
+
+    def test_reports_and_import_pages(self):
+        self.assertQueryBudget(2, self.get('health:reports'))
+        self.assertQueryBudget(0, self.get('health:import_records'))
+
+    def test_record_writes(self):
+        data = {
+            'weight': '65', 'height': '170', 'systolic_bp': '110', 'diastolic_bp': '70',
+            'temperature': '36.5', 'urine_test': 'normal', 'school_year': '2024-2025',
+        }
+        self.assertQueryBudget(12, lambda: self.client.post(
+            reverse('health:add_record'), {**data, 'student': self.student.pk}
+        ))
+        self.assertQueryBudget(18, lambda: self.client.post(
+            reverse('health:edit_record', args=[self.record.pk]), {**data, 'student': self.student.pk}
+        ))
+        self.assertQueryBudget(9, lambda: self.client.post(reverse('health:delete_record', args=[self.record.pk])))
+
+    def test_admin(self):
+        self.client.force_login(self.admin)
+        # Content types are cached per process; load this one before counting
+        ContentType.objects.get_for_model(HealthRecord)
+        self.assertQueryBudget(6, self.get('admin:health_healthrecord_changelist'))
+        self.assertQueryBudget(5, self.get('admin:health_healthrecord_changelist', query='?q=Last&school_year=2024-2025'))
+        self.assertQueryBudget(5, lambda: self.client.get(
+            reverse('admin:health_healthrecord_change', args=[self.record.pk])
+        ))
+
+
+class HealthRecordAdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        student = make_student(31001)
+        cls.obese = make_record(student, '95', '170', systolic_bp=145, diastolic_bp=95)
+        cls.normal = make_record(student, '65', '170', systolic_bp=125, diastolic_bp=75)
+        cls.underweight = make_record(student, '45', '170', systolic_bp=110, diastolic_bp=70)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, **params):
+        return self.client.get(reverse('admin:health_healthrecord_changelist'), params)
+
+    def test_bp_status_expression_matches_the_model(self):
+        student = make_student(31002)
+        for systolic in (110, 119, 120, 125, 129, 130, 135, 139, 140, 160):
+            for diastolic in (70, 79, 80, 85, 89, 90, 100):
+                make_record(student, '60', '170', systolic_bp=systolic, diastolic_bp=diastolic)
+        for record in HealthRecord.objects.with_bp_status():
+            self.assertEqual(record.bp_status_value, blood_pressure_status(record.systolic_bp, record.diastolic_bp))
+
+    def test_rows_use_the_annotations(self):
+        response = self.changelist()
+        results = list(response.context['cl'].result_list)
+        self.assertEqual(results[0].bmi_value, self.underweight.bmi)
+        self.assertContains(response, 'Stage 2 Hypertension')
+        self.assertContains(response, 'OBESE')
+
+    def test_sort_and_filter_by_category_and_bp_status(self):
+        # The category and BP columns are the 5th and 6th of list_display
+        results = self.changelist(o='5').context['cl'].result_list
+        self.assertEqual(list(results), [self.underweight, self.normal, self.obese])
+        results = self.changelist(o='-6').context['cl'].result_list
+        self.assertEqual(list(results), [self.obese, self.normal, self.underweight])
+
+        results = self.changelist(health_category='obese').context['cl'].result_list
+        self.assertEqual(list(results), [self.obese])
+        results = self.changelist(bp_status='Elevated').context['cl'].result_list
+        self.assertEqual(list(results), [self.normal])
+
+    def test_large_tables_use_an_estimated_count(self):
+        self.obese.delete()
+        records = HealthRecord.objects.all()
+        with self.settings(HEALTH_ADMIN_EXACT_COUNT_LIMIT=1):
+            # SQLite estimates from the highest rowid, which still counts the deleted row
+            self.assertEqual(EstimatedCountPaginator(records, 10).count, 3)
+            self.assertEqual(EstimatedCountPaginator(records.filter(school_year='2024-2025'), 10).count, 2)
+            self.assertEqual(self.changelist().context['cl'].result_count, 3)
+        self.assertEqual(EstimatedCountPaginator(records, 10).count, 2)
+
+    def test_pages_past_an_overestimate_serve_the_last_page(self):
+        self.obese.delete()
+        records = HealthRecord.objects.order_by('pk')
+        with self.settings(HEALTH_ADMIN_EXACT_COUNT_LIMIT=1):
+            paginator = EstimatedCountPaginator(records, 1)
+            self.assertEqual(paginator.num_pages, 3)
+            page = paginator.page(3)
+            self.assertEqual((page.number, paginator.count, paginator.num_pages), (2, 2, 2))
+            self.assertEqual(list(page.object_list), list(records.all())[1:])
+
+            # Pages within the real rows keep the estimate, without counting
+            paginator = EstimatedCountPaginator(records.all(), 1)
+            with self.assertNumQueries(2):
+                self.assertEqual(len(paginator.page(2).object_list), 1)
+            self.assertEqual(paginator.count, 3)
+
+
+class SQLiteTuningTests(TestCase):
+    """Pragmas applied by the connection_created hook to a new SQLite file"""
+
+    def connect(self, directory):
+        wrapper = SQLiteDatabaseWrapper(
+            {**connection.settings_dict, 'NAME': f'{directory}/tuning.sqlite3'}, alias='tuning',
+        )
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 20000})
+    def test_pragmas_are_applied_to_new_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pragmas = db.sqlite_pragmas(self.connect(directory))
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000})
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'DELETE'})
+    def test_untuned_connections_use_the_rollback_journal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pragmas = db.sqlite_pragmas(self.connect(directory))
+        self.assertEqual(pragmas, {'journal_mode': 'delete'})
+
+
+class WriteLoadTestTests(SQLiteDatabaseMixin, TransactionTestCase):
+    """loadtest.run() from threads with their own connections, on a scratch SQLite file"""
+    database_alias = 'scratch_test'
+
+    def setUp(self):
+        analytics_cache.get_cache().clear()
+
+    def test_writes_and_cleanup(self):
+        scratch = self.database_alias
+        # Students already in the database keep their rows, whatever their IDs
+        existing = Student.objects.using(scratch).create(
+            s_id=loadtest.FIRST_STUDENT_ID + 5, first_name='Kept', last_name='Student', address='Toledo City',
+            department='BSIT', year_level='1',
+        )
+        live = make_student(loadtest.FIRST_STUDENT_ID)
+        versions = [analytics_cache.get_version(scope) for scope in ('students', 'health')]
+
+        report = loadtest.run(scratch, writers=1, records=3, readers=0)
+
+        self.assertEqual((report['saved'], report['failed'], report['alias']), (3, 0, scratch), report['errors'])
+        self.assertGreater(report['latency_ms']['max'], 0)
+        # Only the load test students and their check-ups are removed again
+        self.assertEqual(list(Student.objects.using(scratch).all()), [existing])
+        self.assertFalse(HealthRecord.objects.using(scratch).exists())
+        self.assertFalse(HealthYearSummary.objects.using(scratch).exclude(record_count=0).exists())
+        # The default database and the analytics cache are left alone
+        self.assertEqual(list(Student.objects.all()), [live])
+        self.assertEqual([analytics_cache.get_version(scope) for scope in ('students', 'health')], versions)
+
+    def test_summary_is_kept_in_the_load_tested_database(self):
+        loadtest.run(self.database_alias, writers=2, records=2, readers=0, keep=True)
+        summary = HealthYearSummary.objects.using(self.database_alias).get(school_year='2024-2025', department='BSIT')
+        self.assertEqual((summary.record_count, summary.student_count), (2, 1))
+        self.assertFalse(HealthYearSummary.objects.exists())
+
+    def test_concurrent_writes(self):
+        report = loadtest.run(self.database_alias, writers=4, records=10, readers=2)
+
+        self.assertEqual((report['saved'], report['failed']), (40, 0), report['errors'])
+        self.assertEqual(report['failed_reads'], 0)
+        self.assertFalse(HealthRecord.objects.using(self.database_alias).exists())
+
+    def test_keep(self):
+        existing = Student.objects.using(self.database_alias).create(
+            s_id=loadtest.FIRST_STUDENT_ID + 5, first_name='Kept', last_name='Student', address='Toledo City',
+            department='BSIT', year_level='1',
+        )
+        loadtest.run(self.database_alias, writers=1, records=2, readers=0, keep=True)
+        # IDs continue after the highest existing one
+        records = HealthRecord.objects.using(self.database_alias).filter(student__s_id=existing.s_id + 1)
+        self.assertEqual(records.count(), 2)
+
+    def test_command_requires_a_scratch_database(self):
+        with self.assertRaisesMessage(CommandError, '--database'):
+            call_command('load_test_writes', '--records', '1', stdout=StringIO())
+        # A file named like live data; refused without connecting to it
+        connections.settings['live'] = {**connections.settings[self.database_alias], 'NAME': '/srv/consolahealth/db.sqlite3'}
+        self.addCleanup(connections.settings.pop, 'live')
+        self.assertFalse(loadtest.is_scratch('live'))
+        self.addCleanup(connections.__delitem__, 'live')
+        with self.assertRaisesMessage(CommandError, '--i-know'):
+            call_command('load_test_writes', '--database', 'live', stdout=StringIO())
+
+        self.assertTrue(loadtest.is_scratch(self.database_alias))
+        self.assertTrue(loadtest.is_scratch(DEFAULT_DB_ALIAS))
+        out = StringIO()
+        call_command(
+            'load_test_writes', '--database', self.database_alias, '--writers', '1', '--records', '2',
+            '--readers', '0', stdout=out,
+        )
+        self.assertIn('2 saved, 0 failed', out.getvalue())
+
+
+@override_settings(ANALYTICS_READ_DATABASE=SQLiteReplicaMixin.replica_alias)
+class ReplicaRoutingTests(SQLiteReplicaMixin, TestCase):
+    """Replica views read the replica database; writes and other views use the primary"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Different rows on each database show which one a response read
+        cls.student = make_student(5001, last_name='Primary')
+        cls.record = make_record(cls.student, '60', '170')
+        # A primary key the primary does not have
+        replica_student, = Student.objects.using(cls.replica_alias).bulk_create([Student(
+            pk=cls.student.pk + 1000, s_id=5002, first_name='First5002', last_name='Replica', address='Toledo City',
+            department='BSIT', year_level='1',
+        )])
+        HealthRecord.objects.using(cls.replica_alias).bulk_create([HealthRecord(
+            student_id=replica_student.pk, weight=Decimal('55'), height=Decimal('160'), systolic_bp=115,
+            diastolic_bp=75, temperature=Decimal('36.6'), school_year='2024-2025',
+        )])
+        cls.replica_student = replica_student
+
+    def setUp(self):
+        analytics_cache.get_cache().clear()
+
+    def record_data(self, **changes):
+        return {
+            'student': self.student.pk, 'weight': '65', 'height': '170', 'systolic_bp': '110',
+            'diastolic_bp': '70', 'temperature': '36.5', 'urine_test': 'normal', 'school_year': '2024-2025',
+            **changes,
+        }
+
+    def test_analytics_views_read_the_replica(self):
+        response = self.client.get(reverse('health:all_records'))
+        self.assertContains(response, 'Replica')
+        self.assertNotContains(response, 'Primary')
+        # Only the replica has this student
+        response = self.client.get(reverse('health:student_history', args=[self.replica_student.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(self.client.get(reverse('student_list_api')), 'Replica')
+
+    def test_export_streams_from_the_replica(self):
+        response = self.client.get(reverse('health:export_records'))
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('Replica', body)
+        self.assertNotIn('Primary', body)
+
+    def test_async_widget_reads_the_replica(self):
+        response = self.client.get(reverse('health:dashboard_recent'))
+        names = [record['student_name'] for record in response.json()['records']]
+        self.assertEqual(names, ['First5002 Replica'])
+
+    async def test_asgi_requests_read_the_replica(self):
+        response = await AsyncClient().get(reverse('health:all_records'))
+        self.assertContains(response, 'Replica')
+        self.assertNotContains(response, 'Primary')
+
+    def test_other_views_read_the_primary(self):
+        response = self.client.get(reverse('edit', args=[self.student.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('edit', args=[self.replica_student.pk])).status_code, 404)
+
+    def test_writes_go_to_the_primary_and_pin_the_browser(self):
+        response = self.client.post(reverse('health:edit_record', args=[self.record.pk]), self.record_data(weight='70'))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(HealthRecord.objects.get(pk=self.record.pk).weight, Decimal('70'))
+        self.assertEqual(HealthRecord.objects.using(self.replica_alias).count(), 1)
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 10)
+
+        # The browser that wrote reads its change from the primary...
+        response = self.client.get(reverse('health:all_records'))
+        self.assertContains(response, 'Primary')
+        self.assertNotContains(response, 'Replica')
+        # ...everyone else keeps reading the replica
+        self.assertContains(Client().get(reverse('health:all_records')), 'Replica')
+
+    def test_replica_payloads_are_not_served_to_pinned_browsers(self):
+        url = reverse('health:dashboard_recent')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('health:edit_record', args=[self.record.pk]), self.record_data(weight='70'))
+        # Another browser caches what the lagging replica returns under the new version...
+        names = [record['student_name'] for record in Client().get(url).json()['records']]
+        self.assertEqual(names, ['First5002 Replica'])
+        # ...which the browser that wrote must not get with the primary's validators
+        response = self.client.get(url)
+        self.assertEqual([record['student_name'] for record in response.json()['records']], ['First5001 Primary'])
+        self.assertEqual(response.json()['records'][0]['weight'], '70.00')
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_reads_do_not_pin(self):
+        response = self.client.get(reverse('health:all_records'))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    @override_settings(ANALYTICS_READ_DATABASE='replica')
+    def test_unconfigured_replica_reads_the_primary(self):
+        response = self.client.get(reverse('health:all_records'))
+        self.assertContains(response, 'Primary')
+        self.assertNotContains(response, 'Replica')
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(HealthRecord.objects.db, 'default')
+        self.assertEqual(Student.objects.get(pk=self.student.pk).last_name, 'Primary')
@@ -5,9 +5,19 @@ app_name = 'health'
 
 urlpatterns = [
     path('dashboard/', views.HealthDashboardView.as_view(), name='dashboard'),
+    path('dashboard/api/totals/', views.DashboardTotalsView.as_view(), name='dashboard_totals'),
+    path('dashboard/api/categories/', views.DashboardCategoriesView.as_view(), name='dashboard_categories'),
+    path('dashboard/api/weight-by-year/', views.DashboardWeightByYearView.as_view(), name='dashboard_weight_by_year'),
+    path('dashboard/api/students-per-year/', views.DashboardStudentsPerYearView.as_view(), name='dashboard_students_per_year'),
+    path('dashboard/api/blood-pressure/', views.DashboardBloodPressureView.as_view(), name='dashboard_blood_pressure'),
+    path('dashboard/api/recent/', views.DashboardRecentView.as_view(), name='dashboard_recent'),
     path('add-record/', views.CreateHealthRecordView.as_view(), name='add_record'),
+    path('reports/', views.ReportsView.as_view(), name='reports'),
+    path('import/', views.ImportHealthRecordsView.as_view(), name='import_records'),
     path('all-records/', views.AllRecordsView.as_view(), name='all_records'),
+    path('all-records/export/', views.ExportHealthRecordsView.as_view(), name='export_records'),
     path('student/<int:student_id>/history/', views.StudentHealthHistoryView.as_view(), name='student_history'),
+    path('student/<int:student_id>/history/series/', views.StudentHealthSeriesView.as_view(), name='student_history_series'),
     path('record/<int:record_id>/edit/', views.EditHealthRecordView.as_view(), name='edit_record'),
     path('record/<int:record_id>/delete/', views.DeleteHealthRecordView.as_view(), name='delete_record'),
 ]
@@ -1,162 +1,378 @@
+from asgiref.sync import iscoroutinefunction
+from django.core.exceptions import ImproperlyConfigured
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.views.generic import TemplateView
-from django.http import JsonResponse
-from django.db.models import Avg, Count, Q, F
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db.models import Avg, Count, Exists, OuterRef, Q, F
 from django.contrib import messages
+from django.conf import settings
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from consolahealth import analytics_cache
+from consolahealth.routers import ReplicaReadMixin
+from . import analytics as health_analytics
 from students.models import Student
-from .models import HealthRecord
-from .forms import HealthRecordForm, StudentSearchForm
+from .models import BP_STATUSES, HealthRecord, HealthYearSummary
+from .forms import HealthRecordForm, HealthRecordImportUploadForm, StudentSearchForm
+from . import conditional
+from .conditional import ConditionalGetMixin
+from .exporters import stream_csv, stream_ndjson
+from .importers import IMPORT_COLUMNS, import_health_records, read_rows
+from .pagination import KeysetPaginator
+from .series import downsample, health_series
 import json
 from datetime import datetime, timedelta
 
 class HealthDashboardView(TemplateView):
-    """Dashboard view with summary statistics and data for graphs"""
+    """Dashboard page; its statistics and charts are loaded from the widget endpoints below"""
     template_name = 'health/dashboard.html'
+
+
+# --- Dashboard widgets ---
+# Each widget is an async JSON endpoint so the page can load them in parallel
+# and a slow aggregate only delays its own card. Payloads are served from the
+# analytics cache and recomputed after writes to the scopes they depend on.
+
+class DashboardWidgetView(ReplicaReadMixin, View):
+    """
+    Base for the async dashboard widget endpoints. Subclasses set `widget`,
+    the cache key name, and define `async def compute(self)` returning the payload.
+    """
+    widget = None
+    scopes = ('health',)
+    compute = None
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.widget is None or not iscoroutinefunction(cls.compute):
+            raise ImproperlyConfigured(f"{cls.__name__} must set `widget` and define `async def compute(self)`.")
+    
+    async def get(self, request):
+        # Revalidation costs one aggregate per scope instead of the widget's queries
+        states = [await conditional.arecords_state()]
+        if 'students' in self.scopes:
+            states.append(await conditional.astudents_state())
+        etag, last_modified = conditional.validators(states)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        
+        if response is None:
+            payload = await analytics_cache.aget_or_compute(
+                f'dashboard:widget:{self.widget}', self.compute, scopes=self.scopes
+            )
+            response = JsonResponse(payload)
+        return conditional.add_validators(response, etag, last_modified)
+
+
+class DashboardTotalsView(DashboardWidgetView):
+    """Students checked and average BMI (percentiles read every record; they are on the reports page)"""
+    widget = 'totals'
+    scopes = ('students', 'health')
+    
+    async def compute(self):
+        total_students = await Student.objects.filter(
+            Exists(HealthRecord.objects.filter(student=OuterRef('pk')))
+        ).acount()
+        summary = await HealthYearSummary.objects.ahealth_summary()
+        return {
+            'total_students': total_students,
+            'avg_bmi': summary['avg_bmi'],
+        }
+
+
+class DashboardCategoriesView(DashboardWidgetView):
+    """Number of records per health category"""
+    widget = 'categories'
+    
+    async def compute(self):
+        summary = await HealthYearSummary.objects.ahealth_summary()
+        return summary['health_distribution']
+
+
+class DashboardWeightByYearView(DashboardWidgetView):
+    """Average weight per school year"""
+    widget = 'weight_by_year'
+    
+    async def compute(self):
+        years = await HealthYearSummary.objects.aschool_year_summary()
+        return {year['school_year']: year['avg_weight'] for year in years}
+
+
+class DashboardStudentsPerYearView(DashboardWidgetView):
+    """Distinct students checked per school year"""
+    widget = 'students_per_year'
+    
+    async def compute(self):
+        years = await HealthYearSummary.objects.aschool_year_summary()
+        return {year['school_year']: year['student_count'] for year in years}
+
+
+class DashboardBloodPressureView(DashboardWidgetView):
+    """Records per blood pressure status by department and by school year, counted in SQL"""
+    widget = 'blood_pressure'
+    scopes = ('students', 'health')
+    
+    async def compute(self):
+        by_department = {code: [0] * len(BP_STATUSES) for code, _ in Student.DEPARTMENT_CHOICES}
+        by_school_year = {}
+        for row in await HealthRecord.objects.abp_status_distribution():
+            counts = [row['counts'][status] for status in BP_STATUSES]
+            department = by_department.setdefault(row['department'], [0] * len(BP_STATUSES))
+            year = by_school_year.setdefault(row['school_year'] or '', [0] * len(BP_STATUSES))
+            for index, count in enumerate(counts):
+                department[index] += count
+                year[index] += count
+        return {
+            'statuses': BP_STATUSES,
+            'by_department': by_department,
+            'by_school_year': dict(sorted(by_school_year.items())),
+        }
+
+
+class DashboardRecentView(DashboardWidgetView):
+    """The latest check-ups"""
+    widget = 'recent'
+    scopes = ('students', 'health')
+    
+    async def compute(self):
+        limit = getattr(settings, 'HEALTH_DASHBOARD_RECENT', 10)
+        records = (
+            HealthRecord.objects.select_related('student')
+            .with_health_category()
+            .with_bp_status()
+            .order_by('-checkup_date', '-id')[:limit]
+        )
+        return {
+            'records': [
+                {
+                    'id': record.pk,
+                    'student_id': record.student.pk,
+                    's_id': record.student.s_id,
+                    'student_name': f"{record.student.first_name} {record.student.last_name}",
+                    'checkup_date': record.checkup_date.isoformat(),
+                    'weight': str(record.weight),
+                    'height': str(record.height),
+                    'bmi': record.bmi_value,
+                    'health_category': record.health_category_value,
+                    'bp_status': record.bp_status_value,
+                    'temperature': str(record.temperature),
+                }
+                async for record in records
+            ]
+        }
+
+
+class ReportsView(ReplicaReadMixin, TemplateView):
+    """Population-health reports: BMI percentiles and z-scores, BP distributions, year-over-year changes"""
+    template_name = 'health/reports.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['analytics_available'] = health_analytics.is_available()
+        if not context['analytics_available']:
+            return context
+        
+        report = analytics_cache.get_or_compute(
+            'reports:population', health_analytics.population_report, scopes=('students', 'health')
+        )
+        departments = dict(Student.DEPARTMENT_CHOICES)
+        year_levels = dict(Student.YEAR_LEVEL_CHOICES)
         
-        # Get all students for the modal dropdown
-        all_students = Student.objects.all().order_by('last_name', 'first_name')
-        context['students'] = all_students
-        
-        # Get all health records
-        all_records = HealthRecord.objects.all()
-        
-        # Total students with health records
-        total_students = all_records.values('student').distinct().count()
-        context['total_students'] = total_students
-        
-        # Average BMI
-        avg_bmi = 0
-        if all_records.exists():
-            bmi_sum = sum([record.bmi for record in all_records if record.bmi])
-            bmi_count = len([record.bmi for record in all_records if record.bmi])
-            avg_bmi = round(bmi_sum / bmi_count, 2) if bmi_count > 0 else 0
-        context['avg_bmi'] = avg_bmi
-        
-        # Health Category Distribution
-        health_distribution = {'underweight': 0, 'normal': 0, 'overweight': 0, 'obese': 0}
-        for record in all_records:
-            category = record.health_category
-            if category in health_distribution:
-                health_distribution[category] += 1
-        
-        context['health_distribution_data'] = json.dumps(health_distribution)
-        
-        # Average Weight per School Year
-        school_years = all_records.values('school_year').distinct().order_by('school_year')
-        weight_by_year = {}
-        for year_data in school_years:
-            year = year_data['school_year']
-            avg_weight = all_records.filter(school_year=year).aggregate(
-                avg=Avg('weight')
-            )['avg']
-            weight_by_year[year] = float(avg_weight) if avg_weight else 0
-        
-        context['weight_by_year_data'] = json.dumps(weight_by_year)
-        
-        # Recent Check-ups
-        recent_records = HealthRecord.objects.select_related('student').order_by('-checkup_date')[:10]
-        context['recent_records'] = recent_records
-        
-        # Student count per year
-        students_per_year = {}
-        for year_data in school_years:
-            year = year_data['school_year']
-            count = all_records.filter(school_year=year).values('student').distinct().count()
-            students_per_year[year] = count
-        
-        context['students_per_year'] = json.dumps(students_per_year)
+        context['report'] = report
+        context['bp_statuses'] = health_analytics.BP_STATUSES
+        context['categories'] = health_analytics.CATEGORIES
+        context['percentile_rows'] = [
+            (departments.get(code, code), values)
+            for code, values in report['bmi_percentiles_by_department'].items()
+        ]
+        context['cohort_rows'] = [
+            (year_levels.get(code, code), cohort) for code, cohort in report['bmi_for_age'].items()
+        ]
+        context['category_rows'] = [
+            (code, [counts[category] for category in health_analytics.CATEGORIES])
+            for code, counts in report['category_by_department'].items()
+        ]
+        context['bp_department_rows'] = [
+            (code, [counts[status] for status in health_analytics.BP_STATUSES])
+            for code, counts in report['bp_by_department'].items()
+        ]
+        context['bp_year_level_rows'] = [
+            (year_levels.get(code, code), [counts[status] for status in health_analytics.BP_STATUSES])
+            for code, counts in report['bp_by_year_level'].items()
+        ]
+        
+        # Names of the students with the largest changes
+        changes = report['year_over_year']['largest_changes']
+        students = Student.objects.in_bulk([change['student_id'] for change in changes])
+        context['largest_changes'] = [
+            dict(change, student=students.get(change['student_id'])) for change in changes
+        ]
         
         return context
 
 
+def get_history_chart_points(request):
+    """Maximum points per history chart series, from ?points= capped by the settings"""
+    default = getattr(settings, 'HEALTH_HISTORY_CHART_POINTS', 200)
+    maximum = getattr(settings, 'HEALTH_HISTORY_MAX_CHART_POINTS', 1000)
+    try:
+        points = int(request.GET.get('points', default))
+    except ValueError:
+        points = default
+    return max(3, min(points, maximum))
 
 
-class StudentHealthHistoryView(View):
+class StudentHealthHistoryView(ReplicaReadMixin, ConditionalGetMixin, View):
     """View showing a specific student's health progress over time"""
     template_name = 'health/student_health_history.html'
     
+    def get_data_states(self, request, student_id):
+        return conditional.student_history_state(student_id)
+    
     def get(self, request, student_id):
         student = get_object_or_404(Student, pk=student_id)
-        health_records = HealthRecord.objects.filter(student=student).order_by('-checkup_date')
+        
+        # One query; BMI and category come from SQL instead of the per-row properties
+        health_records = list(
+            HealthRecord.objects.filter(student=student)
+            .with_health_category()
+            .order_by('-checkup_date', '-id')
+        )
         
         # Prepare data for charts
-        weights = [float(record.weight) for record in health_records]
-        bmis = [record.bmi for record in health_records]
-        dates = [record.checkup_date.strftime('%Y-%m-%d') for record in health_records]
+        series = health_series(
+            (record.checkup_date, record.weight, record.bmi_value) for record in health_records
+        )
+        series = downsample(series, getattr(settings, 'HEALTH_HISTORY_CHART_POINTS', 200))
         
         context = {
             'student': student,
             'health_records': health_records,
-            'weights_data': json.dumps(weights),
-            'bmis_data': json.dumps(bmis),
-            'dates_data': json.dumps(dates),
-            'latest_record': health_records.first() if health_records.exists() else None,
+            'weights_data': json.dumps(series['weights']),
+            'bmis_data': json.dumps(series['bmis']),
+            'dates_data': json.dumps(series['dates']),
+            'latest_record': health_records[0] if health_records else None,
         }
         
         return render(request, self.template_name, context)
 
 
-class AllRecordsView(TemplateView):
-    """View showing all health records with filtering and search"""
-    template_name = 'health/all_records.html'
+class StudentHealthSeriesView(ReplicaReadMixin, ConditionalGetMixin, View):
+    """JSON chart series of a student's history, downsampled to ?points= check-ups"""
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        
-        # Get search and filter parameters
-        search_query = self.request.GET.get('search', '')
-        course_filter = self.request.GET.get('course', '')
-        year_filter = self.request.GET.get('year', '')
-        category_filter = self.request.GET.get('category', '')
+    def get_data_states(self, request, student_id):
+        return conditional.student_history_state(student_id)
+    
+    def get(self, request, student_id):
+        student = get_object_or_404(Student, pk=student_id)
+        rows = (
+            HealthRecord.objects.filter(student=student)
+            .with_bmi()
+            .order_by('-checkup_date', '-id')
+            .values_list('checkup_date', 'weight', 'bmi_value')
+        )
+        series = health_series(rows)
+        total = len(series['dates'])
+        series = downsample(series, get_history_chart_points(request))
         
+        return JsonResponse({
+            'student_id': student.pk,
+            'total': total,
+            'downsampled': len(series['dates']) < total,
+            **series,
+        })
+
+
+class HealthRecordFilterMixin:
+    """Search/course/year/category/BP status filtering shared by the records list and its exports"""
+    
+    def get_filters(self):
+        return {
+            'search': self.request.GET.get('search', ''),
+            'course': self.request.GET.get('course', ''),
+            'year': self.request.GET.get('year', ''),
+            'category': self.request.GET.get('category', ''),
+            'bp_status': self.request.GET.get('bp_status', ''),
+        }
+    
+    def get_filtered_records(self, filters):
         # Start with all records
         records = HealthRecord.objects.select_related('student').order_by('-checkup_date')
         
         # Apply filters
-        if search_query:
-            records = records.filter(
-                Q(student__first_name__icontains=search_query) |
-                Q(student__last_name__icontains=search_query) |
-                Q(student__s_id__icontains=search_query)
-            )
+        if filters['search']:
+            # Prefix match on the indexed student search tokens
+            records = records.filter(student__in=Student.objects.search(filters['search']))
         
-        if course_filter:
-            records = records.filter(student__department=course_filter)
+        if filters['course']:
+            records = records.filter(student__department=filters['course'])
         
-        if year_filter:
-            records = records.filter(school_year=year_filter)
+        if filters['year']:
+            records = records.filter(school_year=filters['year'])
         
-        if category_filter:
-            records = records.filter(
-                weight__isnull=False,
-                height__isnull=False
-            )
-            # Filter by health category in Python
-            filtered_records = []
-            for record in records:
-                if record.health_category == category_filter:
-                    filtered_records.append(record)
-            records = filtered_records
+        if filters['category']:
+            records = records.with_health_category().filter(health_category_value=filters['category'])
+        
+        if filters['bp_status']:
+            records = records.with_bp_status().filter(bp_status_value=filters['bp_status'])
+        
+        return records
+
+
+class AllRecordsView(ReplicaReadMixin, ConditionalGetMixin, HealthRecordFilterMixin, TemplateView):
+    """View showing all health records with filtering and search"""
+    template_name = 'health/all_records.html'
+    
+    def get_data_states(self, request):
+        return [conditional.records_state(), conditional.students_state()]
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        
+        # Get search and filter parameters
+        filters = self.get_filters()
+        records = self.get_filtered_records(filters)
+        
+        # Keyset pagination: each page is a range query on (checkup_date, id)
+        paginator = KeysetPaginator(records, page_size=self.get_page_size())
+        page = paginator.page(
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
         
         # Get available options for filters
         all_courses = Student.DEPARTMENT_CHOICES
         all_years = HealthRecord.objects.values_list('school_year', flat=True).distinct().order_by('-school_year')
         
-        context['health_records'] = records
-        context['total_records'] = len(records) if isinstance(records, list) else records.count()
+        # Query string of the active filters, reused by the pagination links
+        filter_params = self.request.GET.copy()
+        for key in ('after', 'before'):
+            filter_params.pop(key, None)
+        
+        context['health_records'] = page.object_list
+        context['page'] = page
+        context['filter_query'] = filter_params.urlencode()
+        context['total_records'] = records.count()
         context['courses'] = all_courses
         context['school_years'] = all_years
-        context['current_search'] = search_query
-        context['current_course_filter'] = course_filter
-        context['current_year_filter'] = year_filter
-        context['current_category_filter'] = category_filter
+        context['current_search'] = filters['search']
+        context['current_course_filter'] = filters['course']
+        context['current_year_filter'] = filters['year']
+        context['current_category_filter'] = filters['category']
+        context['bp_statuses'] = BP_STATUSES
+        context['current_bp_status_filter'] = filters['bp_status']
         
         return context
+    
+    def get_page_size(self):
+        """Page size from ?page_size=, bounded by the configured maximum"""
+        default = getattr(settings, 'HEALTH_RECORDS_PAGE_SIZE', 50)
+        maximum = getattr(settings, 'HEALTH_RECORDS_MAX_PAGE_SIZE', 200)
+        try:
+            page_size = int(self.request.GET.get('page_size', default))
+        except ValueError:
+            page_size = default
+        return max(1, min(page_size, maximum))
 
 
 class CreateHealthRecordView(View):
@@ -174,9 +390,12 @@ class CreateHealthRecordView(View):
         vision = request.POST.get('vision')
         urine_test = request.POST.get('urine_test')
         
+        student = Student.objects.filter(pk=student_id).first() if student_id and student_id.isdigit() else None
+        if student is None:
+            messages.error(request, "Select a student from the search results before saving the health record.")
+            return redirect('health:dashboard')
+
         try:
-            student = get_object_or_404(Student, pk=student_id)
-            
             # Create health record
             health_record = HealthRecord.objects.create(
                 student=student,
@@ -223,3 +442,55 @@ class DeleteHealthRecordView(View):
         record.delete()
         messages.success(request, "Health record deleted successfully!")
         return redirect('health:student_history', student_id=student_id)
+
+
+class ExportHealthRecordsView(ReplicaReadMixin, HealthRecordFilterMixin, View):
+    """Stream the records matching the All Records filters as CSV or NDJSON"""
+    
+    def get(self, request):
+        records = self.get_filtered_records(self.get_filters())
+        # The body is streamed after the routing middleware has returned, so
+        # pick the database (possibly the replica) while the request is routed
+        records = records.using(records.db)
+        stamp = timezone.localdate().strftime('%Y%m%d')
+        
+        if request.GET.get('format') == 'ndjson':
+            response = StreamingHttpResponse(stream_ndjson(records), content_type='application/x-ndjson')
+            filename = f'health_records_{stamp}.ndjson'
+        else:
+            response = StreamingHttpResponse(stream_csv(records), content_type='text/csv')
+            filename = f'health_records_{stamp}.csv'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ImportHealthRecordsView(View):
+    """View to bulk import a session of check-ups from a CSV/XLSX file"""
+    template_name = 'health/import_records.html'
+    
+    def get(self, request):
+        return render(request, self.template_name, {
+            'form': HealthRecordImportUploadForm(),
+            'columns': IMPORT_COLUMNS,
+        })
+    
+    def post(self, request):
+        form = HealthRecordImportUploadForm(request.POST, request.FILES)
+        result = None
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_health_records(read_rows(upload.file, upload.name))
+            except (ValueError, UnicodeDecodeError) as e:
+                messages.error(request, f"Could not read the file: {str(e)}")
+            else:
+                if result.created:
+                    messages.success(request, f"Imported {result.created} health record(s).")
+                if result.failed:
+                    messages.error(request, f"{result.failed} row(s) were skipped. See the details below.")
+        
+        return render(request, self.template_name, {
+            'form': form,
+            'columns': IMPORT_COLUMNS,
+            'result': result,
+        })
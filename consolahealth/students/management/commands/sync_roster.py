@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from students.roster import read_roster, sync_roster
+
+
+class Command(BaseCommand):
+    help = "Create or update students from a registrar roster CSV (columns: s_id, first_name, last_name, ...)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Roster CSV file")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows per transaction (default: STUDENT_ROSTER_BATCH_SIZE)")
+        parser.add_argument('--dry-run', action='store_true', help="Report the changes without writing them")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as file:
+                result = sync_roster(read_roster(file), batch_size=options['batch_size'], dry_run=options['dry_run'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for row_number, message in result.errors:
+            self.stderr.write(f"Row {row_number}: {message}")
+        for field, count in sorted(result.changed_fields.items()):
+            self.stdout.write(f"  {field}: {count} student(s)")
+        prefix = "Dry run, nothing written:" if options['dry_run'] else "Roster synced:"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {result.created} created, {result.updated} updated, "
+            f"{result.unchanged} unchanged; {result.failed} row(s) skipped."
+        ))
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from students.search import student_tokens
+
+
+def populate_tokens(apps, schema_editor):
+    Student = apps.get_model('students', 'Student')
+    StudentSearchToken = apps.get_model('students', 'StudentSearchToken')
+    students = Student.objects.values_list('pk', 'first_name', 'last_name', 's_id')
+    StudentSearchToken.objects.bulk_create(
+        (
+            StudentSearchToken(student_id=pk, token=token)
+            for pk, first_name, last_name, s_id in students.iterator()
+            for token in student_tokens(first_name, last_name, s_id)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_student_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='students.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'student'], name='student_token_idx')],
+            },
+        ),
+        migrations.RunPython(populate_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_studentsearchtoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['updated_at'], name='student_updated_idx'),
+        ),
+    ]
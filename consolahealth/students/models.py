@@ -1,6 +1,83 @@
+import contextvars
+from contextlib import contextmanager
+
 from django.db import models
 from django.utils import timezone
 
+from .search import prefix_upper_bound, student_tokens, tokenize
+
+
+# Primary keys of the students the delete() in progress removes, marked by
+# pre_delete receivers that handle the cascade per student (the health
+# summary); None outside a delete
+_deleting = contextvars.ContextVar('deleting_students', default=None)
+
+
+def students_being_deleted():
+    """The set of deleting_students(), or None when no student delete() is running"""
+    return _deleting.get()
+
+
+@contextmanager
+def deleting_students():
+    """
+    Scope of one delete(): a fresh students_being_deleted() set, discarded
+    when the delete returns or raises so no mark outlives it
+    """
+    if _deleting.get() is not None:
+        yield
+        return
+    token = _deleting.set(set())
+    try:
+        yield
+    finally:
+        _deleting.reset(token)
+
+
+class StudentQuerySet(models.QuerySet):
+    # Sort keys accepted from the UI and the columns they order by
+    SORT_FIELDS = {
+        's_id': ('s_id',),
+        'name': ('last_name', 'first_name'),
+        'department': ('department',),
+        'year_level': ('year_level',),
+        'email': ('email',),
+    }
+    DEFAULT_SORT = 'name'
+
+    def search(self, term):
+        """
+        Match students whose name words or student ID start with every word of
+        `term`, using the indexed StudentSearchToken table (no LIKE '%..%' scan).
+        A term without any word (e.g. only punctuation) matches nothing.
+        """
+        words = set(tokenize(term))
+        if not words:
+            return self.none()
+        queryset = self
+        for word in words:
+            # A range on the token index is a prefix match on any database
+            matching = StudentSearchToken.objects.filter(
+                token__gte=word, token__lt=prefix_upper_bound(word)
+            ).values('student_id')
+            queryset = queryset.filter(pk__in=matching)
+        return queryset
+
+    def delete(self):
+        with deleting_students():
+            return super().delete()
+
+    def sorted_by(self, sort_key):
+        """Order by a SORT_FIELDS key, '-' prefixed for descending; unknown keys use the default"""
+        descending = sort_key.startswith('-') if sort_key else False
+        fields = self.SORT_FIELDS.get((sort_key or '').lstrip('-'))
+        if fields is None:
+            descending, fields = False, self.SORT_FIELDS[self.DEFAULT_SORT]
+        prefix = '-' if descending else ''
+        # The primary key keeps the order stable across pages
+        return self.order_by(*[prefix + field for field in fields], prefix + 'pk')
+
+
 class Student(models.Model):
     # --- CHOICES CONFIGURATION ---
     # The first item is stored in DB, the second is what users see in the form
@@ -54,5 +131,52 @@ class Student(models.Model):
     created_at = models.DateTimeField(auto_now_add=True) # Sets time only when created
     updated_at = models.DateTimeField(auto_now=True)     # Updates time every save
 
+    objects = StudentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Department filters and the department/year level charts
+            models.Index(fields=['department', 'year_level'], name='student_dept_year_idx'),
+            models.Index(fields=['year_level'], name='student_year_level_idx'),
+            # Default sort of the student list and the dashboard picker
+            models.Index(fields=['last_name', 'first_name'], name='student_name_idx'),
+            # Latest modification time for conditional GET validators
+            models.Index(fields=['updated_at'], name='student_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.last_name}, {self.first_name} ({self.s_id})"
+
+    def delete(self, *args, **kwargs):
+        with deleting_students():
+            return super().delete(*args, **kwargs)
+
+
+class StudentSearchTokenQuerySet(models.QuerySet):
+
+    def sync(self, students):
+        """Replace the search tokens of the given students"""
+        students = list(students)
+        self.filter(student__in=students).delete()
+        return self.bulk_create([
+            StudentSearchToken(student=student, token=token)
+            for student in students
+            for token in student_tokens(student.first_name, student.last_name, student.s_id)
+        ])
+
+
+class StudentSearchToken(models.Model):
+    """Normalized name/ID words of a student, kept in sync on save for prefix search"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+
+    objects = StudentSearchTokenQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Covers the prefix range lookup and returns the student without touching the table
+            models.Index(fields=['token', 'student'], name='student_token_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.last_name}, {self.first_name} ({self.s_id})"
\ No newline at end of file
+        return f"{self.token} -> {self.student_id}"
@@ -0,0 +1,199 @@
+import csv
+import io
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from consolahealth import analytics_cache
+from .models import Student, StudentSearchToken
+from .signals import roster_synced
+
+# Columns read from a registrar roster; `s_id` identifies the student
+ROSTER_COLUMNS = [
+    's_id', 'first_name', 'middle_initial', 'last_name', 'gender',
+    'address', 'email', 'department', 'year_level',
+]
+
+# Nullable columns stored as NULL rather than '' when left empty
+NULLABLE_COLUMNS = {'middle_initial', 'email'}
+
+# Changes to these fields require new search tokens
+TOKEN_FIELDS = {'first_name', 'last_name'}
+
+
+class RosterSyncResult:
+    """Outcome of a roster sync: counts per kind of change and per-row errors"""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+        self.changed_fields = {}
+        # Departments that gained or lost students with existing records
+        self.departments = set()
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    def count_changes(self, fields):
+        for field in fields:
+            self.changed_fields[field] = self.changed_fields.get(field, 0) + 1
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+
+def read_roster(file):
+    """Yield each data row of a roster CSV as a dict, without loading the whole file"""
+    if isinstance(file, io.TextIOBase):
+        text = file
+    else:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    for row in csv.DictReader(text):
+        yield {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+
+
+def sync_roster(rows, batch_size=None, dry_run=False):
+    """
+    Create or update students from an iterable of roster row dicts.
+
+    Rows are matched to existing students by `s_id`: one IN query per batch
+    loads the current rows, new students are written with bulk_create and
+    changed ones with bulk_update, one transaction per batch. Columns missing
+    from the file are left untouched. Students absent from the roster are
+    never deleted, since that would cascade to their health records.
+    With `dry_run`, the changes are counted but nothing is written.
+    """
+    batch_size = batch_size or getattr(settings, 'STUDENT_ROSTER_BATCH_SIZE', 1000)
+    result = RosterSyncResult()
+    seen = set()
+    # Row 1 is the header, so data starts on row 2
+    numbered = enumerate(rows, start=2)
+    while True:
+        batch = list(islice(numbered, batch_size))
+        if not batch:
+            break
+        _sync_batch(batch, result, seen, batch_size, dry_run)
+    result.errors.sort()
+
+    if not dry_run and (result.created or result.updated):
+        # bulk_create/bulk_update send no signals
+        analytics_cache.bump_version_on_commit('students')
+        if result.departments:
+            roster_synced.send(sender=Student, departments=result.departments)
+    return result
+
+
+def _parse_row(row):
+    """Return (s_id, field values) for a row, raising ValidationError on bad input"""
+    try:
+        s_id = int(row.get('s_id', ''))
+    except ValueError:
+        raise ValidationError(f"Invalid student ID '{row.get('s_id', '')}'")
+    values = {}
+    for field in ROSTER_COLUMNS[1:]:
+        if field not in row:
+            continue
+        value = row[field]
+        if field in NULLABLE_COLUMNS and not value:
+            value = None
+        values[field] = value
+    return s_id, values
+
+
+def _validate(student):
+    # Field checks only: uniqueness of s_id is settled by the batch lookup
+    student.full_clean(validate_unique=False, validate_constraints=False)
+
+
+def _format_error(error):
+    if hasattr(error, 'message_dict'):
+        return '; '.join(f"{field}: {' '.join(messages)}" for field, messages in error.message_dict.items())
+    return ' '.join(error.messages)
+
+
+def _sync_batch(batch, result, seen, batch_size, dry_run):
+    parsed = []
+    for row_number, row in batch:
+        try:
+            s_id, values = _parse_row(row)
+        except ValidationError as e:
+            result.add_error(row_number, _format_error(e))
+            continue
+        if s_id in seen:
+            result.add_error(row_number, f"Duplicate student ID '{s_id}' in the roster")
+            continue
+        seen.add(s_id)
+        parsed.append((row_number, s_id, values))
+
+    existing = Student.objects.in_bulk([s_id for _, s_id, _ in parsed], field_name='s_id')
+
+    to_create, to_update, retokenize = [], [], []
+    # Students sharing the same new values (e.g. a year level bump) are
+    # updated together with one UPDATE ... WHERE id IN (...)
+    updates = defaultdict(list)
+    now = timezone.now()
+    for row_number, s_id, values in parsed:
+        student = existing.get(s_id)
+        if student is None:
+            student = Student(s_id=s_id, **values)
+            changed = None
+        else:
+            previous_department = student.department
+            changed = [field for field, value in values.items() if getattr(student, field) != value]
+            for field in changed:
+                setattr(student, field, values[field])
+        try:
+            _validate(student)
+        except ValidationError as e:
+            result.add_error(row_number, _format_error(e))
+            continue
+
+        if changed is None:
+            to_create.append(student)
+        elif changed:
+            student.updated_at = now
+            to_update.append(student)
+            updates[tuple((field, values[field]) for field in sorted(changed))].append(student)
+            result.count_changes(changed)
+            if TOKEN_FIELDS.intersection(changed):
+                retokenize.append(student)
+            if 'department' in changed:
+                result.departments.update({previous_department, student.department})
+        else:
+            result.unchanged += 1
+
+    if not dry_run and (to_create or to_update):
+        with transaction.atomic():
+            if to_create:
+                Student.objects.bulk_create(to_create, batch_size=batch_size)
+                if all(student.pk for student in to_create):
+                    retokenize.extend(to_create)
+                else:
+                    # Backends without RETURNING leave the primary keys unset
+                    retokenize.extend(Student.objects.filter(s_id__in=[s.s_id for s in to_create]))
+            _apply_updates(updates, now, batch_size)
+            if retokenize:
+                StudentSearchToken.objects.sync(retokenize)
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def _apply_updates(updates, now, batch_size):
+    singles, fields = [], set()
+    for changes, students in updates.items():
+        if len(students) == 1:
+            singles.extend(students)
+            fields.update(field for field, _ in changes)
+            continue
+        for start in range(0, len(students), batch_size):
+            pks = [student.pk for student in students[start:start + batch_size]]
+            Student.objects.filter(pk__in=pks).update(updated_at=now, **dict(changes))
+    if singles:
+        Student.objects.bulk_update(singles, [*fields, 'updated_at'], batch_size=batch_size)
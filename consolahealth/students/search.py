@@ -0,0 +1,27 @@
+import re
+import unicodedata
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Lowercase and strip accents so 'Peña' and 'pena' match the same token"""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+def student_tokens(first_name, last_name, s_id):
+    """The distinct search tokens of a student: name words and the student ID"""
+    tokens = set(tokenize(first_name)) | set(tokenize(last_name))
+    if s_id is not None and s_id != '':
+        tokens.add(str(s_id))
+    return sorted(token[:64] for token in tokens)
+
+
+def prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with `prefix`"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from consolahealth import analytics_cache
+from .models import Student, StudentSearchToken
+
+# Sent after a bulk roster sync moved students between `departments`,
+# which bulk_update does not report through post_save
+roster_synced = Signal()
+
+
+@receiver(post_save, sender=Student)
+def sync_search_tokens(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        StudentSearchToken.objects.db_manager(using).sync([instance])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_analytics(sender, using=None, **kwargs):
+    analytics_cache.bump_version_on_commit('students', using=using)
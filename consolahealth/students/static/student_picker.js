@@ -0,0 +1,130 @@
+/* --- STUDENT PICKER ---
+ * Lazy replacement for a <select> listing every student. Markup:
+ *
+ *   <div class="student-picker" data-student-picker data-url="/students/api/typeahead/">
+ *       <input type="hidden" name="student">
+ *       <input type="text" class="form-control student-picker-search">
+ *       <div class="list-group student-picker-results"></div>
+ *   </div>
+ *
+ * Typing queries the typeahead endpoint one page at a time; choosing a result
+ * stores its id in the hidden input. Only the latest request's response is shown.
+ * If the hidden input is required, the enclosing form is not submitted until
+ * a student is chosen. Call StudentPicker.select(container, id, label) to
+ * preselect a student from other scripts.
+ */
+(function () {
+    const DEBOUNCE_MS = 200;
+
+    function escapeHtml(value) {
+        const div = document.createElement('div');
+        div.textContent = value === null || value === undefined ? '' : String(value);
+        return div.innerHTML;
+    }
+
+    function parts(container) {
+        return {
+            hidden: container.querySelector('input[type="hidden"]'),
+            search: container.querySelector('.student-picker-search'),
+            results: container.querySelector('.student-picker-results'),
+        };
+    }
+
+    function select(container, id, label) {
+        const { hidden, search, results } = parts(container);
+        // Drop the response of any request still in flight
+        container.studentPickerRequest = (container.studentPickerRequest || 0) + 1;
+        hidden.value = id || '';
+        search.value = label || '';
+        search.classList.remove('is-invalid');
+        results.innerHTML = '';
+    }
+
+    function load(container, query, page) {
+        const { results } = parts(container);
+        const request = (container.studentPickerRequest || 0) + 1;
+        container.studentPickerRequest = request;
+        const url = container.dataset.url + '?q=' + encodeURIComponent(query) + '&page=' + page;
+        fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json())
+            .then(data => {
+                // A later keystroke or selection has made this response stale
+                if (request !== container.studentPickerRequest) {
+                    return;
+                }
+                if (page === 1) {
+                    results.innerHTML = '';
+                }
+                const more = results.querySelector('.student-picker-more');
+                if (more) {
+                    more.remove();
+                }
+                data.results.forEach(student => {
+                    const item = document.createElement('button');
+                    item.type = 'button';
+                    item.className = 'list-group-item list-group-item-action';
+                    item.dataset.id = student.id;
+                    item.dataset.label = `${student.name} (${student.s_id})`;
+                    item.innerHTML = `${escapeHtml(student.name)} <small class="text-muted">${escapeHtml(student.s_id)} &middot; ${escapeHtml(student.department)}</small>`;
+                    results.appendChild(item);
+                });
+                if (!data.results.length && page === 1) {
+                    results.innerHTML = '<div class="list-group-item text-muted">No matching students</div>';
+                }
+                if (data.has_more) {
+                    const button = document.createElement('button');
+                    button.type = 'button';
+                    button.className = 'list-group-item list-group-item-action text-primary student-picker-more';
+                    button.dataset.page = page + 1;
+                    button.textContent = 'Load more...';
+                    results.appendChild(button);
+                }
+            });
+    }
+
+    function init(container) {
+        const { hidden, search, results } = parts(container);
+        let timer = null;
+
+        search.addEventListener('input', function () {
+            hidden.value = '';
+            clearTimeout(timer);
+            container.studentPickerRequest = (container.studentPickerRequest || 0) + 1;
+            const query = search.value.trim();
+            if (!query) {
+                results.innerHTML = '';
+                return;
+            }
+            timer = setTimeout(() => load(container, query, 1), DEBOUNCE_MS);
+        });
+
+        results.addEventListener('click', function (event) {
+            const item = event.target.closest('.list-group-item-action');
+            if (!item) {
+                return;
+            }
+            if (item.classList.contains('student-picker-more')) {
+                load(container, search.value.trim(), parseInt(item.dataset.page, 10));
+            } else {
+                select(container, item.dataset.id, item.dataset.label);
+            }
+        });
+
+        const form = container.closest('form');
+        if (form && hidden.required) {
+            form.addEventListener('submit', function (event) {
+                if (!hidden.value) {
+                    event.preventDefault();
+                    search.classList.add('is-invalid');
+                    search.focus();
+                }
+            });
+        }
+    }
+
+    window.StudentPicker = { select: select };
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('[data-student-picker]').forEach(init);
+    });
+})();
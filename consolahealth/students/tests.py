@@ -1,3 +1,226 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from consolahealth import analytics_cache
+from consolahealth.testing import QueryBudgetMixin
+from .models import Student
+from .roster import read_roster, sync_roster
+from .views import student_distributions
+
+
+def make_student(s_id, **kwargs):
+    defaults = {
+        'first_name': f'First{s_id}',
+        'last_name': f'Last{s_id}',
+        'address': 'Toledo City',
+    }
+    defaults.update(kwargs)
+    return Student.objects.create(s_id=s_id, **defaults)
+
+
+class StudentDistributionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        make_student(1, department='BSIT', year_level='1')
+        make_student(2, department='BSIT', year_level='3')
+        make_student(3, department='BSHM', year_level='3')
+
+    def test_one_query_per_dimension(self):
+        with self.assertNumQueries(2):
+            student_distributions()
+
+    def test_zero_count_choices_keep_their_labels(self):
+        data = student_distributions()
+        self.assertEqual(json.loads(data['dept_labels']), [code for code, _ in Student.DEPARTMENT_CHOICES])
+        self.assertEqual(json.loads(data['dept_data']), [2, 0, 0, 1, 0, 0])
+        self.assertEqual(json.loads(data['year_labels']), [name for _, name in Student.YEAR_LEVEL_CHOICES])
+        self.assertEqual(json.loads(data['year_data']), [1, 0, 2, 0])
+
+
+@override_settings(STUDENTS_PAGE_SIZE=2)
+class StudentListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        make_student(103, first_name='Carla', last_name='Reyes', department='BSED')
+        make_student(101, first_name='Ana', last_name='Santos')
+        make_student(102, first_name='Ben', last_name='Abad')
+
+    def test_home_renders_one_page(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual([s.last_name for s in response.context['students']], ['Abad', 'Reyes'])
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+        self.assertEqual(response.context['total_students'], 3)
+
+    def test_api_sorts_and_searches(self):
+        response = self.client.get(reverse('student_list_api'), {'sort': '-s_id'})
+        data = response.json()
+        self.assertEqual([s['s_id'] for s in data['results']], [103, 102])
+        self.assertTrue(data['has_next'])
+        self.assertEqual(data['num_pages'], 2)
+
+        data = self.client.get(reverse('student_list_api'), {'search': 'san'}).json()
+        self.assertEqual([s['last_name'] for s in data['results']], ['Santos'])
+        self.assertEqual(data['results'][0]['department_display'], 'Bachelor of Science in Information Technology')
+
+        data = self.client.get(reverse('student_list_api'), {'search': '102'}).json()
+        self.assertEqual(data['total'], 1)
+
+    def test_unknown_sort_and_page_fall_back(self):
+        data = self.client.get(reverse('student_list_api'), {'sort': 'address', 'page': 99}).json()
+        self.assertEqual(data['page'], 2)
+        self.assertEqual(data['sort'], 'address')
+        self.assertEqual([s['last_name'] for s in data['results']], ['Santos'])
+
+
+class StudentSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.juan = make_student(2024001, first_name='Juan', last_name='Dela Cruz')
+        cls.maria = make_student(2024002, first_name='María', last_name='Peña')
+        make_student(2023999, first_name='Jose', last_name='Rizal')
+
+    def search(self, term):
+        return set(Student.objects.search(term).values_list('s_id', flat=True))
+
+    def test_prefix_matches_names_and_ids(self):
+        self.assertEqual(self.search('cru'), {2024001})
+        self.assertEqual(self.search('juan dela'), {2024001})
+        self.assertEqual(self.search('2024'), {2024001, 2024002})
+        self.assertEqual(self.search('ruz'), set())
+
+    def test_term_without_words_matches_nothing(self):
+        self.assertEqual(self.search('-- ,'), set())
+        self.assertEqual(self.search(''), set())
+
+    def test_accents_are_ignored(self):
+        self.assertEqual(self.search('pena'), {2024002})
+        self.assertEqual(self.search('MARÍA'), {2024002})
+
+    def test_tokens_follow_student_changes(self):
+        self.juan.last_name = 'Santos'
+        self.juan.save()
+        self.assertEqual(self.search('cruz'), set())
+        self.assertEqual(self.search('santos'), {2024001})
+
+    def test_typeahead_endpoint(self):
+        data = self.client.get(reverse('student_typeahead'), {'q': 'j'}).json()
+        self.assertEqual([s['name'] for s in data['results']], ['Juan Dela Cruz', 'Jose Rizal'])
+        data = self.client.get(reverse('student_typeahead'), {'q': 'j', 'limit': 1}).json()
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(self.client.get(reverse('student_typeahead')).json()['results'], [])
+
+
+class StudentQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Every student view stays within a fixed number of queries, whatever the data size"""
+
+    def setUp(self):
+        self.add_rows(1)
+
+    def add_rows(self, count):
+        start = 40000 + Student.objects.count()
+        for offset in range(count):
+            self.student = make_student(start + offset, department=('BSIT', 'BSED')[offset % 2])
+
+    def get(self, name, *args, query=''):
+        return lambda: self.client.get(reverse(name, args=args) + query)
+
+    def test_list_views(self):
+        # Cold chart cache: each request follows a write, which bumps its version
+        self.assertQueryBudget(4, self.get('home', query='?search=Last&sort=-s_id'))
+        self.assertQueryBudget(2, self.get('student_list_api', query='?search=Last&page=2'))
+        self.assertQueryBudget(1, self.get('student_typeahead', query='?q=Last'))
+
+    def test_form_pages(self):
+        self.assertQueryBudget(0, self.get('create'))
+        self.assertQueryBudget(0, self.get('background'))
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('edit', args=[self.student.pk])))
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('delete', args=[self.student.pk])))
+
+    def test_writes(self):
+        data = {'first_name': 'New', 'last_name': 'Student', 'department': 'BSIT', 'year_level': '1'}
+        new_ids = iter(range(50000, 50002))
+        self.assertQueryBudget(3, lambda: self.client.post(reverse('create_student'), {**data, 's_id': next(new_ids)}))
+        self.assertQueryBudget(6, lambda: self.client.post(reverse('edit_student', args=[self.student.pk]), data))
+        # Includes reading the school years of the student's check-ups, whose
+        # summary groups are rebuilt once instead of updated per record
+        self.assertQueryBudget(5, lambda: self.client.post(reverse('delete_student', args=[self.student.pk])))
+
+
+ROSTER_CSV = """s_id,first_name,middle_initial,last_name,gender,address,email,department,year_level
+5001,Ana,,Santos,F,Toledo City,,BSIT,2
+5002,Ben,C,Abad,M,Cebu City,ben@example.com,BSED,1
+5003,Carla,,Reyes,F,Toledo City,,BSHM,4
+abc,Bad,,Id,M,Toledo City,,BSIT,1
+5004,Dan,,Lim,X,Toledo City,,BSIT,1
+5002,Ben,,Again,M,Cebu City,,BSED,1
+"""
+
+
+class RosterSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        make_student(5001, first_name='Ana', last_name='Santos', gender='F', department='BSIT', year_level='1')
+        make_student(5003, first_name='Carla', last_name='Reyes', gender='F', address='Toledo City', department='BSHM', year_level='4')
+
+    def rows(self, text=ROSTER_CSV):
+        return read_roster(StringIO(text))
+
+    def test_diff_creates_updates_and_reports(self):
+        version = analytics_cache.get_version('students')
+        with self.captureOnCommitCallbacks(execute=True):
+            result = sync_roster(self.rows(), batch_size=2)
+        self.assertEqual((result.created, result.updated, result.unchanged), (1, 1, 1))
+        self.assertEqual([row for row, _ in result.errors], [5, 6, 7])
+        self.assertIn('gender', result.errors[1][1])
+        self.assertIn('Duplicate', result.errors[2][1])
+        self.assertEqual(result.changed_fields, {'year_level': 1})
+
+        self.assertEqual(Student.objects.get(s_id=5001).year_level, '2')
+        ben = Student.objects.get(s_id=5002)
+        self.assertEqual((ben.last_name, ben.email, ben.middle_initial), ('Abad', 'ben@example.com', 'C'))
+        self.assertNotEqual(analytics_cache.get_version('students'), version)
+
+    def test_search_tokens_follow_bulk_writes(self):
+        sync_roster(self.rows())
+        sync_roster(self.rows("s_id,last_name\n5001,Garcia\n"))
+        self.assertEqual(list(Student.objects.search('abad').values_list('s_id', flat=True)), [5002])
+        self.assertEqual(list(Student.objects.search('garcia').values_list('s_id', flat=True)), [5001])
+        self.assertFalse(Student.objects.search('santos').exists())
+
+    def test_dry_run_writes_nothing(self):
+        result = sync_roster(self.rows(), dry_run=True)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertFalse(Student.objects.filter(s_id=5002).exists())
+        self.assertEqual(Student.objects.get(s_id=5001).year_level, '1')
+
+    def test_queries_per_batch_do_not_grow_with_rows(self):
+        header = 's_id,first_name,last_name,address\n'
+        counts = []
+        for start, row_count in ((10000, 5), (20000, 50)):
+            text = header + ''.join(f'{start + i},First,Last,Toledo City\n' for i in range(row_count))
+            with CaptureQueriesContext(connection) as queries:
+                sync_roster(self.rows(text), batch_size=100)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Student.objects.count(), 57)
+
+    def test_command_prints_summary(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write(ROSTER_CSV)
+        self.addCleanup(os.remove, file.name)
+        out, err = StringIO(), StringIO()
+        call_command('sync_roster', file.name, stdout=out, stderr=err)
+        self.assertIn('1 created, 1 updated, 1 unchanged; 3 row(s) skipped', out.getvalue())
+        self.assertIn('Row 5:', err.getvalue())
@@ -3,6 +3,8 @@ from . import views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('students/api/', views.student_list_api, name='student_list_api'),
+    path('students/api/typeahead/', views.student_typeahead, name='student_typeahead'),
     path('background/', views.background_view, name='background'),
     path('create/', views.create_view, name='create'),
     path('create_student/', views.create_student, name='create_student'),
@@ -1,31 +1,105 @@
 from django.shortcuts import redirect, render, get_object_or_404
+from django.conf import settings
 from django.contrib import messages
-from .models import Student
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.http import JsonResponse
+from consolahealth import analytics_cache
+from consolahealth.routers import replica_reads
+from .models import Student, StudentQuerySet
 import json
 
 # 1. The Home View (Displaying the List)
+@replica_reads
 def home(request):
     # We use lowercase 'students' to match your template loop: {% for x in students %}
+    page_obj, search_query, sort_key = paginate_students(request)
+    
+    # Chart data only changes when students change, so it is served from the analytics cache
+    chart_data = analytics_cache.get_or_compute(
+        'home:distributions', student_distributions, scopes=('students',)
+    )
+    
+    context = {
+        'students': page_obj.object_list,
+        'page_obj': page_obj,
+        'current_search': search_query,
+        'current_sort': sort_key,
+        **chart_data,
+    }
+    return render(request, 'home.html', context)
+
+def paginate_students(request):
+    """Search, sort and paginate the student list from the request's query string"""
+    search_query = request.GET.get('search', '').strip()
+    sort_key = request.GET.get('sort', '') or StudentQuerySet.DEFAULT_SORT
+    default_size = getattr(settings, 'STUDENTS_PAGE_SIZE', 25)
+    try:
+        page_size = int(request.GET.get('page_size', default_size))
+    except ValueError:
+        page_size = default_size
+    page_size = max(1, min(page_size, getattr(settings, 'STUDENTS_MAX_PAGE_SIZE', 100)))
+    
     students = Student.objects.all()
+    if search_query:
+        students = students.search(search_query)
+    students = students.sorted_by(sort_key)
+    page_obj = Paginator(students, page_size).get_page(request.GET.get('page'))
+    return page_obj, search_query, sort_key
+
+# JSON endpoint returning one page of the student list, used to load the table lazily
+@replica_reads
+def student_list_api(request):
+    page_obj, search_query, sort_key = paginate_students(request)
+    departments = dict(Student.DEPARTMENT_CHOICES)
+    results = [
+        {
+            'id': student.id,
+            's_id': student.s_id,
+            'first_name': student.first_name,
+            'last_name': student.last_name,
+            'email': student.email,
+            'department': student.department,
+            'department_display': departments.get(student.department, student.department),
+            'year_level': student.year_level,
+        }
+        for student in page_obj.object_list
+    ]
+    return JsonResponse({
+        'results': results,
+        'page': page_obj.number,
+        'num_pages': page_obj.paginator.num_pages,
+        'total': page_obj.paginator.count,
+        'has_next': page_obj.has_next(),
+        'has_previous': page_obj.has_previous(),
+        'search': search_query,
+        'sort': sort_key,
+    })
+
+def student_distributions():
+    """Department and year level chart data for the home page"""
+    # One grouped COUNT per dimension; choices with no students default to 0
+    dept_totals = dict(
+        Student.objects.order_by().values_list('department').annotate(count=Count('pk'))
+    )
+    year_totals = dict(
+        Student.objects.order_by().values_list('year_level').annotate(count=Count('pk'))
+    )
     
     # Calculate department distribution
-    departments = dict(Student.DEPARTMENT_CHOICES)
     dept_counts = {}
     for code, name in Student.DEPARTMENT_CHOICES:
-        count = students.filter(department=code).count()
         dept_counts[code] = {
             'name': name,
-            'count': count
+            'count': dept_totals.get(code, 0)
         }
     
     # Calculate year level distribution
-    year_levels = dict(Student.YEAR_LEVEL_CHOICES)
     year_counts = {}
     for code, name in Student.YEAR_LEVEL_CHOICES:
-        count = students.filter(year_level=code).count()
         year_counts[code] = {
             'name': name,
-            'count': count
+            'count': year_totals.get(code, 0)
         }
     
     # Prepare chart data
@@ -35,14 +109,44 @@ def home(request):
     year_labels = [year_counts[code]['name'] for code, _ in Student.YEAR_LEVEL_CHOICES]
     year_data = [year_counts[code]['count'] for code, _ in Student.YEAR_LEVEL_CHOICES]
     
-    context = {
-        'students': students,
+    return {
+        'total_students': sum(dept_totals.values()),
         'dept_labels': json.dumps(dept_labels),
         'dept_data': json.dumps(dept_data),
         'year_labels': json.dumps(year_labels),
         'year_data': json.dumps(year_data),
     }
-    return render(request, 'home.html', context)
+
+# Typeahead lookup by name or student ID prefix, used by the search boxes and
+# the student picker. Results are paged with ?page= so the picker can load more.
+def student_typeahead(request):
+    query = request.GET.get('q', '').strip()
+    default_limit = getattr(settings, 'STUDENT_TYPEAHEAD_LIMIT', 10)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', default_limit)), 50))
+    except ValueError:
+        limit = default_limit
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    
+    results = []
+    has_more = False
+    if query:
+        offset = (page - 1) * limit
+        students = list(Student.objects.search(query).sorted_by('name')[offset:offset + limit + 1])
+        has_more = len(students) > limit
+        results = [
+            {
+                'id': student.id,
+                's_id': student.s_id,
+                'name': f'{student.first_name} {student.last_name}',
+                'department': student.department,
+            }
+            for student in students[:limit]
+        ]
+    return JsonResponse({'query': query, 'page': page, 'has_more': has_more, 'results': results})
 
 # 2. The View to show the Create Form
 def create_view(request):
@@ -1,3 +1,10 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+
+class UserPagesQueryTests(TestCase):
+
+    def test_static_pages_run_no_queries(self):
+        for name in ('users:users', 'users:profile'):
+            with self.subTest(page=name), self.assertNumQueries(0):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)